@@ -4,144 +4,703 @@
 """
 import librosa
 import numpy as np
+import soundfile as sf
+import argparse
+import gzip
+import io
 import json
-import sys
+import logging
+import os
+import struct
+import tempfile
+import zipfile
 
-def analyze_track(audio_file):
-    """Анализирует трек и находит все ритмические моменты"""
-    print(f"🎵 Загружаем: {audio_file}")
+from beatmap_profile import LOG_LEVELS, StageTimer, format_report, profiled, save_report
+
+log = logging.getLogger('beatmap.analyzer')
+
+# Частотные диапазоны в Гц: низкие частоты = kick, средние = snare, высокие = hi-hat.
+# Исторически заданы бинами 0/50/150/300 STFT при sr=44100, n_fft=2048 (~1.1/3.2/6.5 кГц)
+BAND_HZ = tuple((lo * 44100 / 2048, hi * 44100 / 2048) for lo, hi in ((0, 50), (50, 150), (150, 300)))
+
+
+def round_half_up(value):
+    """Округление .5 вверх (round() округляет .5 к чётному: 2.5 -> 2)"""
+    return int(value + 0.5)
+
+
+def band_bins(sr, n_fft, bands_hz=BAND_HZ):
+    """Границы полос в бинах STFT для данных sr и n_fft (частоты полос не меняются)
+
+    Полоса выше частоты Найквиста (sr / 2) не обрезается, а даёт ошибку:
+    обрезанная полоса hi-hat меряла бы другие частоты, чем в полном режиме,
+    и классификация нот тихо сдвинулась бы.
+    """
+    if max(hi for _, hi in bands_hz) > sr / 2:
+        raise ValueError(f"Полосы до {max(hi for _, hi in bands_hz):.0f} Гц выше частоты Найквиста "
+                         f"{sr / 2:.0f} Гц при sr={sr}")
+    return tuple((round_half_up(lo * n_fft / sr), round_half_up(hi * n_fft / sr)) for lo, hi in bands_hz)
+
+
+# Индексы бинов при полной частоте (sr=44100, n_fft=2048)
+BAND_BINS = band_bins(44100, 2048)
+
+NOTE_TYPES = np.array(['kick', 'snare', 'hihat', 'note'])
+
+# Параметры DSP-анализа. Всё, что влияет на признаки трека, должно быть здесь:
+# по ним считается ключ кэша анализа
+ANALYSIS_PARAMS = {
+    'sr': 44100,
+    'n_fft': 2048,
+    'hop_length': 512,
+    'bands': BAND_BINS,
+    # Strong onsets (основные удары - kick, snare)
+    'strong': {'pre_max': 20, 'post_max': 20, 'pre_avg': 100, 'post_avg': 100,
+               'delta': 0.2, 'wait': 10},
+    # Weak onsets (hi-hats, перкуссия)
+    'weak': {'pre_max': 10, 'post_max': 10, 'pre_avg': 50, 'post_avg': 50,
+             'delta': 0.1, 'wait': 5},
+}
+
+
+
+def analysis_params(sr, n_fft, hop_length, base=ANALYSIS_PARAMS):
+    """Параметры анализа для другой частоты дискретизации и шага.
+
+    Полосы пересчитываются в бины для нового sr / n_fft, окна пиков
+    onset_detect (в кадрах) - под новый шаг, чтобы в секундах они остались
+    прежними.
+    """
+    scale = (base['hop_length'] / base['sr']) / (hop_length / sr)
+    params = {'sr': sr, 'n_fft': n_fft, 'hop_length': hop_length, 'bands': band_bins(sr, n_fft)}
+    for strength in ('strong', 'weak'):
+        params[strength] = {key: value if key == 'delta' else max(1, round_half_up(value * scale))
+                            for key, value in base[strength].items()}
+    return params
+
+
+# Режимы анализа: full - эталон; fast - вдвое меньшая частота дискретизации
+# (кадр ~23 мс вместо ~12 мс), STFT и onset'ы в ~4 раза дешевле. Ниже 22.05 кГц
+# полоса hi-hat (до 6.5 кГц) упирается в частоту Найквиста: режим на 11.025 кГц
+# на "Infernal Pulse" находил 35% нот полного и был не быстрее fast
+ANALYSIS_MODES = {
+    'full': ANALYSIS_PARAMS,
+    'fast': analysis_params(22050, 1024, 512),
+}
+
+# Слабый onset ближе этого окна (сек) к уже добавленной ноте считается дублем
+DEDUP_TOLERANCE = 0.05
+
+
+def band_energies(S, bands=BAND_BINS):
+    """Средняя энергия каждого частотного диапазона для каждого кадра.
+
+    Возвращает массив (n_frames, 3): low, mid, high. Каждая полоса
+    транспонируется в непрерывный массив, чтобы усреднение шло по той же
+    схеме суммирования, что и np.mean по одному столбцу спектра.
+    """
+    return np.stack(
+        [np.ascontiguousarray(S[lo:hi].T).mean(axis=1) for lo, hi in bands],
+        axis=1,
+    )
+
+
+def classify_onsets(times, bands, sr, hop_length=512):
+    """Классифицирует все onset'ы за один проход по частотному спектру.
+
+    times - время onset'ов в секундах, bands - результат band_energies().
+    Возвращает массив меток 'kick' / 'snare' / 'hihat' / 'note'.
+    """
+    frames = librosa.time_to_frames(np.asarray(times), sr=sr, hop_length=hop_length)
+    frames = np.minimum(frames, bands.shape[0] - 1)
+    
+    low, mid, high = bands[frames].T
+    total = low + mid + high
+    
+    # Определяем доминирующую частоту
+    choice = np.select(
+        [
+            total == 0,
+            (low > mid * 1.5) & (low > high * 1.5),
+            (mid > low * 1.2) & (mid > high * 1.2),
+            (high > low * 1.2) & (high > mid * 1.2),
+        ],
+        [3, 0, 1, 2],
+        default=3,
+    )
+    return NOTE_TYPES[choice]
+
+
+def dedup_onsets(onsets_strong, onsets_weak, tolerance=DEDUP_TOLERANCE):
+    """Отбирает слабые onset'ы, которые не дублируют уже добавленные ноты.
+
+    Повторяет правило "слабый удар добавляется, если он дальше tolerance от
+    любой сильной ноты и от ранее принятых слабых", но за O(n log n):
+    ближайшая сильная нота ищется через np.searchsorted, а среди
+    отсортированных слабых достаточно сравнить с последним принятым.
+    Возвращает булеву маску по onsets_weak.
+    """
+    strong = np.sort(np.asarray(onsets_strong, dtype=float))
+    weak = np.asarray(onsets_weak, dtype=float)
+    keep = np.ones(len(weak), dtype=bool)
+    
+    # 1. Убираем слабые onset'ы рядом с сильными
+    if len(strong) and len(weak):
+        idx = np.searchsorted(strong, weak)
+        left = strong[np.maximum(idx - 1, 0)]
+        right = strong[np.minimum(idx, len(strong) - 1)]
+        keep &= (np.abs(left - weak) >= tolerance) & (np.abs(right - weak) >= tolerance)
+    
+    # 2. Убираем слабые onset'ы рядом с предыдущим принятым слабым
+    candidates = np.flatnonzero(keep)
+    if len(candidates) > 1 and np.any(np.diff(weak[candidates]) < tolerance):
+        last = None
+        for i, t in zip(candidates.tolist(), weak[candidates].tolist()):
+            if last is not None and abs(last - t) < tolerance:
+                keep[i] = False
+            else:
+                last = t
+    
+    return keep
+
+
+def extract_features(audio_file, params=ANALYSIS_PARAMS, timer=None):
+    """Декодирует трек и считает все DSP-признаки, нужные для beatmap
+
+    Возвращает словарь компактных массивов: огибающая onset'ов, beats,
+    strong/weak onset'ы и энергия полос по кадрам. Именно его хранит кэш.
+    timer (beatmap_profile.StageTimer) получает время каждого этапа.
+    """
+    timer = timer if timer is not None else StageTimer()
+    log.info(f"🎵 Загружаем: {audio_file}")
     
     # Загружаем аудио
-    y, sr = librosa.load(audio_file, sr=44100)
+    with timer.stage('decode'):
+        y, sr = librosa.load(audio_file, sr=params['sr'])
     duration = librosa.get_duration(y=y, sr=sr)
-    print(f"⏱️  Длительность: {duration:.2f}s")
+    log.info(f"⏱️  Длительность: {duration:.2f}s")
     
     # 1. Определяем BPM (темп)
-    tempo, beats = librosa.beat.beat_track(y=y, sr=sr, units='time')
+    hop_length = params['hop_length']
+    with timer.stage('beat_track'):
+        tempo, beats = librosa.beat.beat_track(y=y, sr=sr, hop_length=hop_length, units='time')
     tempo = float(np.mean(tempo)) if isinstance(tempo, np.ndarray) else float(tempo)
-    print(f"🎼 BPM: {tempo:.1f}")
-    print(f"🥁 Найдено beats: {len(beats)}")
+    log.info(f"🎼 BPM: {tempo:.1f}")
+    log.info(f"🥁 Найдено beats: {len(beats)}")
     
     # 2. Onset detection - находим все атаки/удары
     # Используем разные методы для разных типов событий
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    with timer.stage('onset_strength'):
+        onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)
     
     # Strong onsets (основные удары - kick, snare)
-    onsets_strong = librosa.onset.onset_detect(
-        onset_envelope=onset_env,
-        sr=sr,
-        units='time',
-        backtrack=True,
-        pre_max=20,
-        post_max=20,
-        pre_avg=100,
-        post_avg=100,
-        delta=0.2,
-        wait=10
-    )
+    with timer.stage('onset_detect_strong'):
+        onsets_strong = librosa.onset.onset_detect(
+            onset_envelope=onset_env, sr=sr, hop_length=hop_length, units='time',
+            backtrack=True, **params['strong']
+        )
     
     # Weak onsets (hi-hats, перкуссия)
-    onsets_weak = librosa.onset.onset_detect(
-        onset_envelope=onset_env,
-        sr=sr,
-        units='time',
-        backtrack=True,
-        pre_max=10,
-        post_max=10,
-        pre_avg=50,
-        post_avg=50,
-        delta=0.1,
-        wait=5
-    )
+    with timer.stage('onset_detect_weak'):
+        onsets_weak = librosa.onset.onset_detect(
+            onset_envelope=onset_env, sr=sr, hop_length=hop_length, units='time',
+            backtrack=True, **params['weak']
+        )
     
-    print(f"💥 Strong onsets: {len(onsets_strong)}")
-    print(f"✨ Weak onsets: {len(onsets_weak)}")
+    log.info(f"💥 Strong onsets: {len(onsets_strong)}")
+    log.info(f"✨ Weak onsets: {len(onsets_weak)}")
     
     # 3. Спектральный анализ для определения типов ударов
     # Низкие частоты = kick, средние = snare, высокие = hi-hat
-    S = np.abs(librosa.stft(y))
-    
-    def classify_onset(time_sec):
-        """Классифицирует тип удара по частотному спектру"""
-        frame = librosa.time_to_frames(time_sec, sr=sr)
-        if frame >= S.shape[1]:
-            frame = S.shape[1] - 1
-            
-        spectrum = S[:, frame]
+    with timer.stage('stft'):
+        S = np.abs(librosa.stft(y, n_fft=params['n_fft'], hop_length=hop_length))
+    # Энергия полос считается один раз для всех кадров
+    with timer.stage('band_energies'):
+        bands = band_energies(S, params['bands'])
+    
+    return {
+        'sr': sr,
+        'hop_length': hop_length,
+        'duration': duration,
+        'tempo': tempo,
+        'beats': beats,
+        'onset_env': onset_env,
+        'onsets_strong': onsets_strong,
+        'onsets_weak': onsets_weak,
+        'bands': bands,
+    }
+
+
+def _stream_mono(audio_file, sr, block_size):
+    """Читает файл блоками, сводит в моно и ресемплирует на лету до sr"""
+    info = sf.info(audio_file)
+    blocks = (
+        np.mean(block.T, axis=0)
+        for block in sf.blocks(audio_file, blocksize=block_size, dtype='float32', always_2d=True)
+    )
+    if info.samplerate == sr:
+        yield from blocks
+        return
+    
+    import soxr
+    resampler = soxr.ResampleStream(info.samplerate, sr, 1, dtype='float32', quality='HQ')
+    # Длина как у librosa.resample: ceil(n * sr / native)
+    remaining = int(np.ceil(info.frames * sr / info.samplerate))
+    for mono in blocks:
+        chunk = resampler.resample_chunk(mono)[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+    tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)[:remaining]
+    yield np.concatenate([tail, np.zeros(remaining - len(tail), dtype=np.float32)])
+
+
+def _stream_spectra(audio_file, sr, n_fft, hop_length, block_frames):
+    """Генерирует |STFT| блоками по block_frames кадров.
+
+    Эмулирует librosa.stft(center=True): сигнал мысленно дополняется
+    n_fft // 2 нулями с обеих сторон, поэтому кадры совпадают с полной STFT.
+    Между блоками хранится только перекрытие n_fft - hop_length сэмплов.
+    Последним значением возвращает число сэмплов трека.
+    """
+    span = n_fft + (block_frames - 1) * hop_length
+    buf = np.zeros(n_fft // 2, dtype=np.float32)
+    n_samples = 0
+    
+    for chunk in _stream_mono(audio_file, sr, block_frames * hop_length):
+        n_samples += len(chunk)
+        buf = np.concatenate([buf, chunk])
+        while len(buf) >= span:
+            yield np.abs(librosa.stft(buf[:span], n_fft=n_fft, hop_length=hop_length, center=False))
+            buf = buf[block_frames * hop_length:]
+    
+    buf = np.concatenate([buf, np.zeros(n_fft // 2, dtype=np.float32)])
+    if len(buf) >= n_fft:
+        yield np.abs(librosa.stft(buf, n_fft=n_fft, hop_length=hop_length, center=False))
+    yield n_samples
+
+
+def _tempo_chunked(onset_env, sr, hop_length, chunk_frames=4096, ac_size=8.0):
+    """Оценка темпа как в librosa.beat.beat_track, но без полной темпограммы
+
+    librosa строит автокорреляционную темпограмму (ac_size секунд x все кадры)
+    целиком - на часовом треке это гигабайты. Здесь она считается кусками и
+    сразу усредняется по времени, результат передаётся в librosa.feature.tempo.
+    """
+    win_length = librosa.time_to_frames(ac_size, sr=sr, hop_length=hop_length).item()
+    window = librosa.filters.get_window('hann', win_length, fftbins=True)[:, np.newaxis]
+    n = len(onset_env)
+    
+    padded = np.pad(onset_env, (win_length // 2, win_length // 2),
+                    mode='linear_ramp', end_values=[0, 0])
+    frames = librosa.util.frame(padded, frame_length=win_length, hop_length=1)
+    
+    total = np.zeros(win_length)
+    for start in range(0, n, chunk_frames):
+        tg = librosa.autocorrelate(frames[:, start:min(start + chunk_frames, n)] * window, axis=0)
+        total += librosa.util.normalize(tg, norm=np.inf, axis=0).sum(axis=1)
+    
+    return librosa.feature.tempo(
+        sr=sr, hop_length=hop_length, tg=(total / n)[:, np.newaxis], aggregate=None
+    )
+
+
+def extract_features_streaming(audio_file, params=ANALYSIS_PARAMS, block_frames=1024, timer=None):
+    """То же, что extract_features(), но с ограниченной памятью для длинных треков
+
+    Аудио читается блоками через soundfile, полная STFT не строится. В памяти
+    остаются только компактные признаки по кадрам (энергия полос, огибающие
+    onset'ов); мел-спектр в dB пишется во временный файл, потому что порог
+    top_db=80 у onset_strength зависит от максимума по всему треку.
+    """
+    timer = timer if timer is not None else StageTimer()
+    sr = params['sr']
+    n_fft = params['n_fft']
+    hop_length = params['hop_length']
+    top_db = 80.0
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, fmax=0.5 * sr)
+    n_mels = mel_basis.shape[0]
+    
+    log.info(f"🎵 Потоковый анализ: {audio_file}")
+    
+    bands = []
+    db_max = -np.inf
+    with tempfile.TemporaryFile() as mel_file:
+        with timer.stage('decode_stft'):
+            for D in _stream_spectra(audio_file, sr, n_fft, hop_length, block_frames):
+                if not isinstance(D, np.ndarray):
+                    n_samples = D
+                    break
+                bands.append(band_energies(D, params['bands']))
+                mel_db = librosa.power_to_db(
+                    np.einsum("...ft,mf->...mt", D ** 2, mel_basis, optimize=True), top_db=None
+                )
+                db_max = max(db_max, float(mel_db.max()))
+                np.ascontiguousarray(mel_db.T).tofile(mel_file)
         
-        # Делим спектр на частотные диапазоны
-        low = np.mean(spectrum[0:50])      # Kick (низкие)
-        mid = np.mean(spectrum[50:150])    # Snare (средние)
-        high = np.mean(spectrum[150:300])  # Hi-hat (высокие)
+        bands = np.concatenate(bands)
+        n_frames = len(bands)
+        mel_file.flush()
+        mel_db = np.memmap(mel_file, dtype=np.float32, mode='r', shape=(n_frames, n_mels))
         
-        total = low + mid + high
-        if total == 0:
-            return 'note'
-            
-        # Определяем доминирующую частоту
-        if low > mid * 1.5 and low > high * 1.5:
-            return 'kick'
-        elif mid > low * 1.2 and mid > high * 1.2:
-            return 'snare'
-        elif high > low * 1.2 and high > mid * 1.2:
-            return 'hihat'
-        else:
-            return 'note'
+        # Спектральный поток (как в onset_strength): mean - для onset'ов,
+        # median - для beat_track
+        floor = np.float32(db_max - top_db)
+        env_mean = np.zeros(n_frames, dtype=np.float32)
+        env_median = np.zeros(n_frames, dtype=np.float32)
+        pad = 1 + n_fft // (2 * hop_length)
+        with timer.stage('onset_strength'):
+            for start in range(1, n_frames, block_frames):
+                stop = min(start + block_frames, n_frames)
+                S = np.ascontiguousarray(np.maximum(mel_db[start - 1:stop], floor).T)
+                flux = np.maximum(0.0, S[:, 1:] - S[:, :-1])
+                out = slice(start - 1 + pad, min(stop - 1 + pad, n_frames))
+                n_out = out.stop - out.start
+                if n_out > 0:
+                    env_mean[out] = np.mean(flux, axis=0)[:n_out]
+                    env_median[out] = np.median(flux, axis=0)[:n_out]
+        del mel_db
+    
+    duration = n_samples / sr
+    log.info(f"⏱️  Длительность: {duration:.2f}s")
+    
+    with timer.stage('beat_track'):
+        tempo, beats = librosa.beat.beat_track(
+            onset_envelope=env_median, sr=sr, hop_length=hop_length, units='time',
+            bpm=_tempo_chunked(env_median, sr, hop_length)
+        )
+    tempo = float(np.mean(tempo)) if isinstance(tempo, np.ndarray) else float(tempo)
+    log.info(f"🎼 BPM: {tempo:.1f}")
+    log.info(f"🥁 Найдено beats: {len(beats)}")
+    
+    with timer.stage('onset_detect_strong'):
+        onsets_strong = librosa.onset.onset_detect(
+            onset_envelope=env_mean, sr=sr, hop_length=hop_length, units='time',
+            backtrack=True, **params['strong']
+        )
+    with timer.stage('onset_detect_weak'):
+        onsets_weak = librosa.onset.onset_detect(
+            onset_envelope=env_mean, sr=sr, hop_length=hop_length, units='time',
+            backtrack=True, **params['weak']
+        )
+    log.info(f"💥 Strong onsets: {len(onsets_strong)}")
+    log.info(f"✨ Weak onsets: {len(onsets_weak)}")
+    
+    return {
+        'sr': sr,
+        'hop_length': hop_length,
+        'duration': duration,
+        'tempo': tempo,
+        'beats': beats,
+        'onset_env': env_mean,
+        'onsets_strong': onsets_strong,
+        'onsets_weak': onsets_weak,
+        'bands': bands,
+    }
+
+
+def build_beatmap(features, title, dedup_tolerance=DEDUP_TOLERANCE, timer=None):
+    """Собирает beatmap из признаков extract_features() без обращения к аудио"""
+    timer = timer if timer is not None else StageTimer()
+    sr = int(features['sr'])
+    hop_length = int(features['hop_length'])
+    duration = float(features['duration'])
+    bands = features['bands']
+    onsets_strong = features['onsets_strong']
+    onsets_weak = features['onsets_weak']
     
     # 4. Создаём beatmap
     beatmap = {
         'metadata': {
-            'title': 'Infernal Pulse',
+            'title': title,
             'artist': 'Suno AI',
             'duration': duration,
-            'bpm': float(tempo)
+            'bpm': float(features['tempo'])
         },
         'timing': {
-            'beats': beats.tolist(),  # Основная метрическая сетка
+            'beats': features['beats'].tolist(),  # Основная метрическая сетка
         },
         'notes': []
     }
     
     # Добавляем сильные удары (основной трек)
-    for onset_time in onsets_strong:
-        note_type = classify_onset(onset_time)
+    with timer.stage('classify'):
+        strong_types = classify_onsets(onsets_strong, bands, sr, hop_length)
+    for onset_time, note_type in zip(onsets_strong, strong_types):
         beatmap['notes'].append({
             'time': float(onset_time),
-            'type': note_type,
+            'type': str(note_type),
             'strength': 'strong'
         })
     
-    # Добавляем слабые удары (для сложности)
-    for onset_time in onsets_weak:
-        # Проверяем что не дублируем сильный удар
-        if not any(abs(n['time'] - onset_time) < 0.05 for n in beatmap['notes']):
-            note_type = classify_onset(onset_time)
-            beatmap['notes'].append({
-                'time': float(onset_time),
-                'type': note_type,
-                'strength': 'weak'
-            })
+    # Добавляем слабые удары (для сложности), без дублей сильных
+    with timer.stage('dedup'):
+        onsets_weak = onsets_weak[dedup_onsets(onsets_strong, onsets_weak, dedup_tolerance)]
+    with timer.stage('classify'):
+        weak_types = classify_onsets(onsets_weak, bands, sr, hop_length)
+    for onset_time, note_type in zip(onsets_weak, weak_types):
+        beatmap['notes'].append({
+            'time': float(onset_time),
+            'type': str(note_type),
+            'strength': 'weak'
+        })
     
     # Сортируем по времени
-    beatmap['notes'].sort(key=lambda x: x['time'])
+    with timer.stage('sort'):
+        beatmap['notes'].sort(key=lambda x: x['time'])
     
-    print(f"\n📝 Создано нот: {len(beatmap['notes'])}")
-    print(f"📊 Средняя плотность: {len(beatmap['notes'])/duration:.1f} нот/сек")
+    log.info(f"📝 Создано нот: {len(beatmap['notes'])}")
+    log.info(f"📊 Средняя плотность: {len(beatmap['notes'])/duration:.1f} нот/сек")
     
     return beatmap
 
-def create_osu_beatmap(beatmap, output_file):
-    """Создаёт .osu файл для игры"""
-    osu_content = f"""osu file format v14
+
+def analyze_track(audio_file, dedup_tolerance=DEDUP_TOLERANCE, title=None, cache=None,
+                  streaming=False, timer=None, params=ANALYSIS_PARAMS):
+    """Анализирует трек и находит все ритмические моменты
+
+    title по умолчанию берётся из имени файла. Если передан cache
+    (beatmap_cache.AnalysisCache), признаки трека берутся из него, а при
+    промахе считаются и сохраняются - декодирование и DSP пропускаются.
+    streaming=True включает потоковый анализ с ограниченной памятью
+    (для миксов на 30-60 минут). timer (beatmap_profile.StageTimer)
+    собирает время по этапам; таблица этапов пишется в лог на уровне DEBUG.
+    params - параметры DSP (см. ANALYSIS_MODES); cache должен быть создан
+    с теми же params и тем же streaming.
+    """
+    timer = timer if timer is not None else StageTimer()
+    if title is None:
+        title = os.path.splitext(os.path.basename(audio_file))[0]
+    
+    features = None
+    if cache is not None:
+        if cache.streaming != streaming:
+            raise ValueError(f"Кэш создан для streaming={cache.streaming}, а анализ идёт с streaming={streaming}")
+        with timer.stage('cache_get'):
+            features = cache.get(audio_file)
+    if features is None:
+        extract = extract_features_streaming if streaming else extract_features
+        features = extract(audio_file, params=params, timer=timer)
+        if cache is not None:
+            with timer.stage('cache_put'):
+                cache.put(audio_file, features)
+    else:
+        log.info(f"⚡ Из кэша: {audio_file}")
+    
+    beatmap = build_beatmap(features, title, dedup_tolerance, timer)
+    log.debug(format_report(timer.report()))
+    return beatmap
+
+# Компактный бинарный формат beatmap (.bmb), struct-of-arrays:
+#   заголовок  <4sBBHI: magic, версия, сжатие, резерв, длина дескриптора
+#   дескриптор JSON: metadata, таблицы кодов, список колонок (dtype, count, offset)
+#   данные     колонки подряд, каждая выровнена на 4 байта; при сжатии
+#              (gzip/zstd) сжимается весь блок данных
+# Без сжатия колонки читаются через memory-map без разбора.
+BMB_MAGIC = b'PTBM'
+BMB_VERSION = 1
+BMB_HEADER = struct.Struct('<4sBBHI')
+BMB_COMPRESSION = {None: 0, 'gzip': 1, 'zstd': 2}
+STRENGTHS = ('strong', 'weak')
+
+
+def _align4(n):
+    return (n + 3) & ~3
+
+
+def _compress(data, compression):
+    if compression == 'gzip':
+        return gzip.compress(data, mtime=0)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=19).compress(data)
+    return data
+
+
+def _decompress(data, compression):
+    if compression == 'gzip':
+        return gzip.decompress(data)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def write_beatmap_binary(beatmap, output_file, compression=None):
+    """Сохраняет beatmap в компактном колоночном формате .bmb
+
+    Время нот и beats хранится как float32, тип и сила удара - как uint8
+    коды (таблицы кодов лежат в дескрипторе). compression: None, 'gzip'
+    или 'zstd' (нужен пакет zstandard).
+    """
+    notes = beatmap['notes']
+    codes = {'type': [str(t) for t in NOTE_TYPES], 'strength': list(STRENGTHS)}
+    columns = {
+        'time': np.array([n['time'] for n in notes], dtype='<f4'),
+        'beats': np.asarray(beatmap['timing']['beats'], dtype='<f4'),
+        'type': np.array([codes['type'].index(n['type']) for n in notes], dtype='u1'),
+        'strength': np.array([codes['strength'].index(n['strength']) for n in notes], dtype='u1'),
+    }
+    if notes and 'stem' in notes[0]:
+        codes['stem'] = sorted({n['stem'] for n in notes})
+        columns['stem'] = np.array([codes['stem'].index(n['stem']) for n in notes], dtype='u1')
+    
+    layout = []
+    offset = 0
+    for name, values in columns.items():
+        layout.append({'name': name, 'dtype': values.dtype.str, 'count': len(values), 'offset': offset})
+        offset = _align4(offset + values.nbytes)
+    payload = bytearray(offset)
+    for column, values in zip(layout, columns.values()):
+        payload[column['offset']:column['offset'] + values.nbytes] = values.tobytes()
+    
+    timing = {k: v for k, v in beatmap['timing'].items() if k != 'beats'}
+    descriptor = json.dumps({
+        'metadata': beatmap['metadata'],
+        'timing': timing,
+        'codes': codes,
+        'columns': layout,
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    # Данные начинаются с границы 4 байт, чтобы memory-map давал выровненные массивы
+    descriptor += b' ' * (_align4(BMB_HEADER.size + len(descriptor)) - BMB_HEADER.size - len(descriptor))
+    
+    with open(output_file, 'wb') as f:
+        f.write(BMB_HEADER.pack(BMB_MAGIC, BMB_VERSION, BMB_COMPRESSION[compression], 0, len(descriptor)))
+        f.write(descriptor)
+        f.write(_compress(bytes(payload), compression))
+    
+    return output_file
+
+
+def read_beatmap_binary(path, mmap=True):
+    """Читает .bmb: возвращает дескриптор и колонки как массивы numpy
+
+    Несжатый файл отображается в память (mmap=True): колонки - это
+    представления поверх файла, разбора нет. Сжатый файл распаковывается.
+    """
+    with open(path, 'rb') as f:
+        magic, version, compression, _, descriptor_len = BMB_HEADER.unpack(f.read(BMB_HEADER.size))
+        if magic != BMB_MAGIC:
+            raise ValueError(f"{path}: не .bmb файл")
+        if version != BMB_VERSION:
+            raise ValueError(f"{path}: неподдерживаемая версия формата {version}")
+        descriptor = json.loads(f.read(descriptor_len))
+        data_start = BMB_HEADER.size + descriptor_len
+        compression = {v: k for k, v in BMB_COMPRESSION.items()}[compression]
+        if compression is None and mmap:
+            payload = np.memmap(path, dtype=np.uint8, mode='r', offset=data_start)
+        else:
+            payload = np.frombuffer(_decompress(f.read(), compression), dtype=np.uint8)
+    
+    columns = {}
+    for column in descriptor['columns']:
+        dtype = np.dtype(column['dtype'])
+        start = column['offset']
+        columns[column['name']] = payload[start:start + column['count'] * dtype.itemsize].view(dtype)
+    descriptor['columns'] = columns
+    return descriptor
+
+
+def beatmap_from_binary(data):
+    """Собирает из результата read_beatmap_binary() beatmap в JSON-схеме"""
+    columns = data['columns']
+    codes = data['codes']
+    notes = []
+    for i in range(len(columns['time'])):
+        note = {
+            'time': float(columns['time'][i]),
+            'type': codes['type'][columns['type'][i]],
+            'strength': codes['strength'][columns['strength'][i]],
+        }
+        if 'stem' in columns:
+            note['stem'] = codes['stem'][columns['stem'][i]]
+        notes.append(note)
+    
+    return {
+        'metadata': data['metadata'],
+        'timing': dict(data['timing'], beats=columns['beats'].astype(float).tolist()),
+        'notes': notes,
+    }
+
+# Позиция ноты на поле osu! зависит от типа
+OSU_POSITIONS = {
+    'kick': (256, 192),    # Центр
+    'snare': (128, 192),   # Слева
+    'hihat': (384, 192),   # Справа
+    'note': (256, 192)     # Центр
+}
+
+
+def timing_points_from_beats(beats, tolerance=0.025, min_beats=4, patience=2):
+    """Разбивает сетку beats на участки постоянного темпа (для [TimingPoints])
+
+    Для каждого участка ведётся линейная регрессия время ~ номер бита (по
+    накопленным суммам, O(1) на бит). Новый участок начинается, когда
+    patience битов подряд отклоняются от прогноза больше чем на tolerance
+    секунд: дрейф темпа даёт новые timing point'ы, а квантование beats по
+    кадрам STFT (~12 мс) и одиночные сбои трекера - нет.
+    Возвращает [(время_мс, длина_бита_мс)].
+    """
+    beats = np.asarray(beats, dtype=float).tolist()
+    points = []
+    
+    def fit(n, sx, sy, sxx, sxy):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        return (sy - slope * sx) / n, slope
+    
+    # Время внутри участка считается от его первого бита - меньше ошибка округления
+    i = 0
+    while i < len(beats) - 1:
+        t0 = beats[i]
+        n = sx = sy = sxx = sxy = 0.0
+        misses = []
+        j = i
+        while j < len(beats):
+            x, y = j - i, beats[j] - t0
+            if n >= max(2, min_beats):
+                intercept, slope = fit(n, sx, sy, sxx, sxy)
+                if abs(y - intercept - slope * x) > tolerance:
+                    misses.append(j)
+                    if len(misses) >= patience:
+                        break
+                    j += 1
+                    continue
+            misses = []
+            n += 1
+            sx += x
+            sy += y
+            sxx += x * x
+            sxy += x * y
+            j += 1
+        
+        if n >= 2:
+            intercept, slope = fit(n, sx, sy, sxx, sxy)
+            points.append(((t0 + intercept) * 1000, slope * 1000))
+        # Следующий участок начинается с первого бита, не попавшего в прогноз
+        i = misses[0] if len(misses) >= patience else len(beats)
+    
+    return points
+
+
+def write_osu(beatmap, f, audio_filename='audio.mp3', batch_size=10000):
+    """Пишет beatmap в формате .osu в открытый текстовый поток f
+
+    Hit objects форматируются пачками по batch_size и пишутся через
+    writelines, без склейки всего файла в одну строку.
+    """
+    metadata = beatmap['metadata']
+    f.write(f"""osu file format v14
 
 [General]
-AudioFilename: audio.mp3
+AudioFilename: {audio_filename}
 Mode: 0
 
 [Metadata]
-Title:{beatmap['metadata']['title']}
-Artist:{beatmap['metadata']['artist']}
-
+Title:{metadata['title']}
+Artist:{metadata['artist']}
+""")
+    if 'difficulty' in metadata:
+        f.write(f"Version:{metadata['difficulty']}\n")
+    f.write("""
 [Difficulty]
 HPDrainRate:5
 CircleSize:4
@@ -151,79 +710,234 @@ SliderMultiplier:1.4
 SliderTickRate:1
 
 [TimingPoints]
-0,{60000/beatmap['metadata']['bpm']:.2f},4,2,0,50,1,0
-
-[HitObjects]
-"""
+""")
     
-    # Добавляем ноты
-    for note in beatmap['notes']:
-        time_ms = int(note['time'] * 1000)
-        # Позиция зависит от типа
-        positions = {
-            'kick': (256, 192),    # Центр
-            'snare': (128, 192),   # Слева
-            'hihat': (384, 192),   # Справа
-            'note': (256, 192)     # Центр
-        }
-        x, y = positions.get(note['type'], (256, 192))
-        
-        # type,combo (1=circle, 5=new combo)
-        hit_type = 1 if note['strength'] == 'weak' else 5
-        osu_content += f"{x},{y},{time_ms},{hit_type},0,0:0:0:0:\n"
+    points = timing_points_from_beats(beatmap['timing'].get('beats', []))
+    if not points:
+        points = [(0, 60000 / metadata['bpm'])]
+    f.writelines(f"{int(round(t))},{beat_length:.4f},4,2,0,50,1,0\n" for t, beat_length in points)
+    
+    f.write("\n[HitObjects]\n")
     
-    with open(output_file, 'w') as f:
-        f.write(osu_content)
+    # Добавляем ноты: строка = "x,y," + время + ",type,..." - части до и после
+    # времени зависят только от типа и силы удара, их форматируем один раз
+    # type,combo (1=circle, 5=new combo)
+    prefixes = {note_type: f"{x},{y}," for note_type, (x, y) in OSU_POSITIONS.items()}
+    default_prefix = prefixes['note']
+    weak_suffix, strong_suffix = ",1,0,0:0:0:0:\n", ",5,0,0:0:0:0:\n"
     
-    print(f"✅ Создан OSU beatmap: {output_file}")
+    notes = beatmap['notes']
+    for start in range(0, len(notes), batch_size):
+        batch = notes[start:start + batch_size]
+        times_ms = (np.fromiter((n['time'] for n in batch), dtype=float, count=len(batch)) * 1000).astype(np.int64)
+        f.writelines([
+            prefixes.get(note['type'], default_prefix) + str(time_ms)
+            + (weak_suffix if note['strength'] == 'weak' else strong_suffix)
+            for time_ms, note in zip(times_ms.tolist(), batch)
+        ])
 
-def create_simplified_beatmap(beatmap, difficulty='normal'):
-    """Создаёт упрощённую версию для разных уровней сложности"""
-    notes = beatmap['notes'].copy()
-    
-    if difficulty == 'easy':
-        # Только сильные удары, kick и snare
-        notes = [n for n in notes if n['strength'] == 'strong' and n['type'] in ['kick', 'snare']]
-    elif difficulty == 'normal':
-        # Сильные удары + некоторые слабые
-        strong_notes = [n for n in notes if n['strength'] == 'strong']
-        weak_notes = [n for n in notes if n['strength'] == 'weak']
-        # Берём каждый второй слабый удар
-        weak_notes = weak_notes[::2]
-        notes = strong_notes + weak_notes
-        notes.sort(key=lambda x: x['time'])
-    # hard = все ноты
+
+def create_osu_beatmap(beatmap, output_file, audio_filename='audio.mp3'):
+    """Создаёт .osu файл для игры"""
+    with open(output_file, 'w', encoding='utf-8', newline='\n') as f:
+        write_osu(beatmap, f, audio_filename)
     
-    simplified = beatmap.copy()
-    simplified['notes'] = notes
-    simplified['metadata']['difficulty'] = difficulty
+    log.info(f"✅ Создан OSU beatmap: {output_file}")
+
+
+def create_osz(tiers, audio_file, output_file):
+    """Собирает архив .osz: аудио + по .osu на каждый уровень сложности
+
+    tiers - {имя уровня: beatmap}, например результат create_difficulty_tiers().
+    AudioFilename в .osu совпадает с именем аудио внутри архива. MP3 уже
+    сжат, поэтому кладётся без deflate.
+    """
+    audio_name = os.path.basename(audio_file)
+    with zipfile.ZipFile(output_file, 'w') as osz:
+        osz.write(audio_file, audio_name, compress_type=zipfile.ZIP_STORED)
+        for name, beatmap in tiers.items():
+            metadata = beatmap['metadata']
+            osu_name = f"{metadata['artist']} - {metadata['title']} [{name}].osu"
+            info = zipfile.ZipInfo(osu_name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with osz.open(info, 'w') as raw, io.TextIOWrapper(raw, encoding='utf-8', newline='\n') as f:
+                write_osu(beatmap, f, audio_name)
     
-    return simplified
+    log.info(f"📦 Создан OSZ: {output_file} ({len(tiers)} уровней)")
+    return output_file
 
-if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python beatmap_analyzer.py <audio_file>")
-        sys.exit(1)
+
+# Правила уровней сложности. Ключи правила (все необязательные):
+#   strengths   - допустимые силы удара ('strong' / 'weak')
+#   types       - допустимые типы нот
+#   stems       - допустимые стемы (для beatmap из beatmap_stems)
+#   weak_every  - брать каждый n-й слабый удар (счёт по всем слабым нотам трека)
+#   max_density - предел плотности, нот/сек: между нотами не меньше 1/max_density сек
+DIFFICULTY_TIERS = {
+    # Только сильные удары, kick и snare
+    'easy': {'strengths': ('strong',), 'types': ('kick', 'snare')},
+    # Сильные удары + каждый второй слабый
+    'normal': {'weak_every': 2},
+    # hard = все ноты
+    'hard': {},
+}
+
+
+def create_difficulty_tiers(beatmap, tiers=DIFFICULTY_TIERS):
+    """Строит все уровни сложности за один проход по нотам
+
+    Колонки нот (время, тип, сила, стем) собираются один раз, каждый уровень -
+    это булева маска поверх них. Ноты не копируются: уровни ссылаются на
+    словари нот полного beatmap, порядок по времени сохраняется. У каждого
+    уровня своя metadata с полем difficulty.
+    """
+    notes = beatmap['notes']
+    n = len(notes)
     
-    audio_file = sys.argv[1]
+    def column(key, default=None):
+        """Колонка как целочисленные коды + таблица {значение: код}"""
+        codes = {}
+        values = np.fromiter((codes.setdefault(note.get(key, default), len(codes)) for note in notes),
+                             dtype=np.int32, count=n)
+        return values, codes
     
-    # Анализируем
-    beatmap = analyze_track(audio_file)
+    def allowed(values, codes, names):
+        return np.isin(values, [codes[name] for name in names if name in codes])
+    
+    times = np.fromiter((note['time'] for note in notes), dtype=float, count=n)
+    types, type_codes = column('type')
+    strengths, strength_codes = column('strength')
+    is_weak = strengths == strength_codes.get('weak', -1)
+    weak_rank = np.cumsum(is_weak) - 1
+    stems = None
+    
+    result = {}
+    for name, rule in tiers.items():
+        mask = np.ones(n, dtype=bool)
+        if 'strengths' in rule:
+            mask &= allowed(strengths, strength_codes, rule['strengths'])
+        if 'types' in rule:
+            mask &= allowed(types, type_codes, rule['types'])
+        if 'stems' in rule:
+            if stems is None:
+                stems = column('stem')
+            mask &= allowed(*stems, rule['stems'])
+        if 'weak_every' in rule:
+            mask &= ~is_weak | (weak_rank % rule['weak_every'] == 0)
+        
+        index = np.flatnonzero(mask)
+        if rule.get('max_density'):
+            # Жадно прореживаем по времени: та же логика, что у дублей onset'ов
+            index = index[dedup_onsets(np.array([]), times[index], 1.0 / rule['max_density'])]
+        
+        result[name] = {
+            'metadata': dict(beatmap['metadata'], difficulty=name),
+            'timing': beatmap['timing'],
+            'notes': [notes[i] for i in index.tolist()],
+        }
+    
+    return result
+
+
+def create_simplified_beatmap(beatmap, difficulty='normal'):
+    """Создаёт упрощённую версию для одного уровня сложности"""
+    rule = DIFFICULTY_TIERS.get(difficulty, {})
+    return create_difficulty_tiers(beatmap, {difficulty: rule})[difficulty]
+
+def write_beatmap_files(beatmap, output_dir, binary=False, compression=None,
+                        tiers=DIFFICULTY_TIERS, osz_audio=None, timer=None):
+    """Сохраняет полный beatmap, .osu и уровни сложности в output_dir
+
+    tiers - правила уровней (см. DIFFICULTY_TIERS). binary=True
+    дополнительно пишет каждый JSON в формате .bmb (см. write_beatmap_binary).
+    osz_audio - путь к аудио: тогда рядом собирается <title>.osz со всеми
+    уровнями. Возвращает словарь {имя: путь}.
+    """
+    timer = timer if timer is not None else StageTimer()
+    os.makedirs(output_dir, exist_ok=True)
+    written = {}
     
     # Сохраняем JSON
-    json_file = '/home/claude/beatmap_full.json'
-    with open(json_file, 'w') as f:
+    json_file = os.path.join(output_dir, 'beatmap_full.json')
+    with timer.stage('write_json'), open(json_file, 'w') as f:
         json.dump(beatmap, f, indent=2)
-    print(f"💾 Сохранён JSON: {json_file}")
+    log.info(f"💾 Сохранён JSON: {json_file}")
+    written['full'] = json_file
+    if binary:
+        with timer.stage('write_bmb'):
+            written['full_bmb'] = write_beatmap_binary(
+                beatmap, os.path.join(output_dir, 'beatmap_full.bmb'), compression)
     
     # Создаём OSU файл
-    osu_file = '/home/claude/beatmap.osu'
-    create_osu_beatmap(beatmap, osu_file)
+    osu_file = os.path.join(output_dir, 'beatmap.osu')
+    with timer.stage('write_osu'):
+        create_osu_beatmap(beatmap, osu_file)
+    written['osu'] = osu_file
     
     # Создаём упрощённые версии
-    for difficulty in ['easy', 'normal', 'hard']:
-        simplified = create_simplified_beatmap(beatmap, difficulty)
-        diff_file = f'/home/claude/beatmap_{difficulty}.json'
-        with open(diff_file, 'w') as f:
+    with timer.stage('tiers'):
+        tier_maps = create_difficulty_tiers(beatmap, tiers)
+    for difficulty, simplified in tier_maps.items():
+        diff_file = os.path.join(output_dir, f'beatmap_{difficulty}.json')
+        with timer.stage('write_json'), open(diff_file, 'w') as f:
             json.dump(simplified, f, indent=2)
-        print(f"💾 {difficulty.upper()}: {len(simplified['notes'])} нот")
+        log.info(f"💾 {difficulty.upper()}: {len(simplified['notes'])} нот")
+        written[difficulty] = diff_file
+        if binary:
+            with timer.stage('write_bmb'):
+                written[f'{difficulty}_bmb'] = write_beatmap_binary(
+                    simplified, os.path.join(output_dir, f'beatmap_{difficulty}.bmb'), compression)
+    
+    if osz_audio is not None:
+        with timer.stage('write_osz'):
+            written['osz'] = create_osz(
+                tier_maps, osz_audio, os.path.join(output_dir, f"{beatmap['metadata']['title']}.osz"))
+    
+    return written
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Анализирует трек и создаёт beatmap')
+    parser.add_argument('audio_file')
+    parser.add_argument('-o', '--output-dir', default='.',
+                        help='куда сохранить beatmap_*.json и beatmap.osu')
+    parser.add_argument('--cache-dir', help='кэш признаков анализа (пропускает декодирование и DSP)')
+    parser.add_argument('--streaming', action='store_true',
+                        help='потоковый анализ блоками (ограниченная память для длинных треков)')
+    parser.add_argument('--mode', default='full', choices=list(ANALYSIS_MODES),
+                        help='fast - пониженная частота дискретизации, быстрее и грубее '
+                             '(сравнение: beatmap_benchmark.py modes)')
+    parser.add_argument('--binary', nargs='?', const='none', choices=['none', 'gzip', 'zstd'],
+                        help='дополнительно сохранить beatmap_*.bmb (по умолчанию без сжатия)')
+    parser.add_argument('--tiers', help='JSON с правилами уровней сложности (см. DIFFICULTY_TIERS)')
+    parser.add_argument('--osz', action='store_true',
+                        help='собрать .osz архив (аудио + .osu на каждый уровень)')
+    parser.add_argument('--log-level', default='INFO', choices=LOG_LEVELS,
+                        help='DEBUG дополнительно печатает время каждого этапа')
+    parser.add_argument('--timing-report', help='сохранить время и память по этапам в JSON')
+    parser.add_argument('--profile', help='записать профиль анализа (.prof для cProfile)')
+    parser.add_argument('--profiler', default='cprofile', choices=['cprofile', 'pyinstrument'])
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format='%(message)s')
+    
+    tiers = DIFFICULTY_TIERS
+    if args.tiers:
+        with open(args.tiers, encoding='utf-8') as f:
+            tiers = json.load(f)
+    
+    cache = None
+    if args.cache_dir:
+        from beatmap_cache import AnalysisCache
+        cache = AnalysisCache(args.cache_dir, params=ANALYSIS_MODES[args.mode], streaming=args.streaming)
+    
+    # Анализируем
+    timer = StageTimer()
+    with profiled(args.profile, args.profiler):
+        beatmap = analyze_track(args.audio_file, cache=cache, streaming=args.streaming, timer=timer,
+                                params=ANALYSIS_MODES[args.mode])
+        write_beatmap_files(beatmap, args.output_dir, binary=args.binary is not None,
+                            compression=None if args.binary in (None, 'none') else args.binary,
+                            tiers=tiers, osz_audio=args.audio_file if args.osz else None, timer=timer)
+    
+    if args.timing_report:
+        save_report(timer.report(file=args.audio_file, notes=len(beatmap['notes']),
+                                 duration=beatmap['metadata']['duration']), args.timing_report)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Пакетный анализ каталога треков: beatmap для каждого файла в своей папке
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from beatmap_analyzer import ANALYSIS_MODES, analyze_track, write_beatmap_files
+from beatmap_cache import DEFAULT_MAX_BYTES, AnalysisCache
+from beatmap_profile import LOG_LEVELS, StageTimer, profile_path, profiled, save_report
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.flac', '.m4a')
+
+
+def collect_audio_files(source, recursive=False):
+    """Собирает список аудио файлов из папки или из манифеста.
+
+    Манифест - текстовый файл, по одному пути на строку; пустые строки и
+    строки с # пропускаются, относительные пути считаются от папки манифеста.
+    """
+    if os.path.isdir(source):
+        files = []
+        for root, dirs, names in os.walk(source):
+            files.extend(
+                os.path.join(root, name) for name in names
+                if name.lower().endswith(AUDIO_EXTENSIONS)
+            )
+            if not recursive:
+                break
+        return sorted(files)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    files = []
+    with open(source, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            files.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return files
+
+
+def track_output_dirs(output_root, audio_files):
+    """Папки для результатов треков: {трек: <output_root>/<путь без расширения>}
+
+    Путь берётся от общей папки всех треков, поэтому a/intro.mp3 и
+    b/intro.mp3 (с -r или из манифеста) попадают в разные папки. Треки,
+    которые всё равно совпали (intro.mp3 и intro.wav), получают суффикс из
+    хэша абсолютного пути.
+    """
+    paths = [os.path.abspath(audio_file) for audio_file in audio_files]
+    root = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ''
+    names = [os.path.splitext(os.path.relpath(path, root))[0] for path in paths]
+    taken = Counter(os.path.normcase(name) for name in names)
+    output_dirs = {}
+    for audio_file, path, name in zip(audio_files, paths, names):
+        if taken[os.path.normcase(name)] > 1:
+            name += '-' + hashlib.sha256(path.encode('utf-8')).hexdigest()[:8]
+        output_dirs[audio_file] = os.path.join(output_root, name)
+    return output_dirs
+
+
+def process_track(audio_file, output_dir, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                  streaming=False, binary=None, osz=False, log_level='WARNING',
+                  profile_dir=None, profiler='cprofile', mode='full'):
+    """Анализирует один трек в воркере; ошибки возвращаются, а не бросаются
+
+    Лог анализа в воркере по умолчанию ограничен предупреждениями, чтобы
+    строки параллельных треков не перемешивались. В результате - отчёт
+    StageTimer по этапам трека ('timing').
+    """
+    logging.getLogger('beatmap').setLevel(log_level)
+    start = time.perf_counter()
+    timer = StageTimer()
+    try:
+        with profiled(profile_path(profile_dir, audio_file, profiler), profiler):
+            params = ANALYSIS_MODES[mode]
+            cache = AnalysisCache(cache_dir, cache_max_bytes, params, streaming) if cache_dir else None
+            beatmap = analyze_track(audio_file, cache=cache, streaming=streaming, timer=timer, params=params)
+            write_beatmap_files(beatmap, output_dir, binary=binary is not None,
+                                compression=None if binary == 'none' else binary,
+                                osz_audio=audio_file if osz else None, timer=timer)
+    except Exception as e:
+        return {
+            'file': audio_file,
+            'ok': False,
+            'error': f"{type(e).__name__}: {e}",
+            'elapsed': time.perf_counter() - start,
+            'timing': timer.report(),
+        }
+
+    return {
+        'file': audio_file,
+        'ok': True,
+        'output_dir': output_dir,
+        'notes': len(beatmap['notes']),
+        'duration': beatmap['metadata']['duration'],
+        'elapsed': time.perf_counter() - start,
+        'timing': timer.report(),
+    }
+
+
+def failed_result(audio_file, error):
+    return {'file': audio_file, 'ok': False, 'error': f"{type(error).__name__}: {error}", 'elapsed': 0.0}
+
+
+def map_tracks(audio_files, output_dirs, workers=None, task_args=(), task=process_track):
+    """Результаты task(трек, папка, *task_args) в порядке готовности.
+
+    В пуле одновременно не больше workers треков. Если воркер падает
+    целиком (segfault в декодере, os._exit), пул ломается, и все его
+    незавершённые задачи получают BrokenProcessPool. Под подозрением тогда
+    только треки, что были в работе: каждый перезапускается один в своём
+    процессе, и ошибкой помечается только трек, который роняет и его.
+    Остальные треки продолжаются в новом пуле.
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = deque(audio_files)
+    suspects = deque()
+    while pending or suspects:
+        if suspects:
+            audio_file = suspects.popleft()
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                future = pool.submit(task, audio_file, output_dirs[audio_file], *task_args)
+                error = future.exception()
+            yield failed_result(audio_file, error) if error is not None else future.result()
+            continue
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            while pending or running:
+                while pending and len(running) < workers:
+                    audio_file = pending.popleft()
+                    running[pool.submit(task, audio_file, output_dirs[audio_file], *task_args)] = audio_file
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = any(isinstance(future.exception(), BrokenProcessPool) for future in done)
+                if broken:
+                    # Сломанный пул сразу завершает все свои задачи
+                    done, _ = wait(running)
+                for future in done:
+                    audio_file = running.pop(future)
+                    error = future.exception()
+                    if isinstance(error, BrokenProcessPool):
+                        suspects.append(audio_file)
+                    else:
+                        yield failed_result(audio_file, error) if error is not None else future.result()
+                if broken:
+                    break
+
+
+def run_batch(audio_files, output_root, workers=None, cache_dir=None,
+              cache_max_bytes=DEFAULT_MAX_BYTES, streaming=False, binary=None, osz=False,
+              log_level='WARNING', profile_dir=None, profiler='cprofile', mode='full', task=process_track):
+    """Раскидывает треки по пулу процессов и печатает тайминги по мере готовности
+
+    task - функция анализа одного трека с сигнатурой process_track.
+    """
+    results = []
+    start = time.perf_counter()
+    output_dirs = track_output_dirs(output_root, audio_files)
+    task_args = (cache_dir, cache_max_bytes, streaming, binary, osz, log_level, profile_dir, profiler, mode)
+
+    for result in map_tracks(audio_files, output_dirs, workers, task_args, task):
+        results.append(result)
+
+        # Имя папки результатов: у одноимённых треков из разных папок оно разное
+        name = os.path.relpath(output_dirs[result['file']], output_root)
+        if result['ok']:
+            print(f"✅ {name}: {result['notes']} нот, "
+                  f"{result['duration']:.1f}s аудио за {result['elapsed']:.2f}s")
+        else:
+            print(f"❌ {name}: {result['error']}")
+
+    wall = time.perf_counter() - start
+    print_summary(results, wall)
+    print_stage_summary(results)
+    return results
+
+
+def stage_totals(results):
+    """Суммарное время этапов по всем трекам: {этап: {'wall', 'cpu', 'calls'}}"""
+    totals = {}
+    for result in results:
+        for stage in result.get('timing', {}).get('stages', []):
+            entry = totals.setdefault(stage['name'], {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            for key in ('wall', 'cpu', 'calls'):
+                entry[key] += stage[key]
+    return totals
+
+
+def print_stage_summary(results, top=5):
+    """Этапы, на которые ушло больше всего времени воркеров"""
+    totals = stage_totals(results)
+    busy = sum(entry['wall'] for entry in totals.values())
+    if not busy:
+        return
+    print("\n🔥 Самые долгие этапы (сумма по трекам):")
+    for name, entry in sorted(totals.items(), key=lambda item: -item[1]['wall'])[:top]:
+        print(f"   {name:<22} {entry['wall']:>8.2f}s  {entry['wall'] / busy * 100:>5.1f}%")
+
+
+def batch_report(results, wall):
+    """JSON-отчёт пакета: этапы каждого трека и суммы по этапам"""
+    return {
+        'wall': wall,
+        'stages': stage_totals(results),
+        'tracks': [
+            {key: r[key] for key in ('file', 'ok', 'notes', 'duration', 'elapsed', 'error', 'timing')
+             if key in r}
+            for r in results
+        ],
+    }
+
+
+def print_summary(results, wall):
+    """Итоговая пропускная способность пакета"""
+    ok = [r for r in results if r['ok']]
+    failed = len(results) - len(ok)
+    audio_seconds = sum(r['duration'] for r in ok)
+
+    print(f"\n📦 Треков: {len(results)} (успешно {len(ok)}, ошибок {failed})")
+    print(f"⏱️  Общее время: {wall:.2f}s")
+    if wall > 0:
+        print(f"🚀 Пропускная способность: {len(ok) / wall * 60:.1f} треков/мин, "
+              f"{audio_seconds / wall:.1f}x реального времени")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('source', help='папка с аудио или манифест (по пути на строку)')
+    parser.add_argument('-o', '--output-dir', default='beatmaps',
+                        help='корневая папка для результатов')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='число процессов (по умолчанию - число ядер)')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='искать аудио во вложенных папках')
+    parser.add_argument('--cache-dir', help='кэш признаков анализа между запусками')
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help='предел размера кэша, MB')
+    parser.add_argument('--streaming', action='store_true',
+                        help='потоковый анализ с ограниченной памятью (длинные миксы)')
+    parser.add_argument('--mode', default='full', choices=list(ANALYSIS_MODES),
+                        help='режим анализа каталога: fast быстрее и грубее')
+    parser.add_argument('--binary', nargs='?', const='none', choices=['none', 'gzip', 'zstd'],
+                        help='дополнительно сохранить beatmap_*.bmb')
+    parser.add_argument('--osz', action='store_true',
+                        help='собрать .osz архив для каждого трека')
+    parser.add_argument('--log-level', default='WARNING', choices=LOG_LEVELS,
+                        help='уровень лога анализа в воркерах')
+    parser.add_argument('--timing-report', help='сохранить время и память по этапам всех треков в JSON')
+    parser.add_argument('--profile-dir', help='профиль каждого трека: <папка>/<трек>-<хэш пути>.prof')
+    parser.add_argument('--profiler', default='cprofile', choices=['cprofile', 'pyinstrument'])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    audio_files = collect_audio_files(args.source, args.recursive)
+    if not audio_files:
+        print(f"Не найдено аудио файлов в {args.source}")
+        sys.exit(1)
+
+    print(f"🎵 Анализируем {len(audio_files)} треков")
+    start = time.perf_counter()
+    results = run_batch(audio_files, args.output_dir, args.workers,
+                        args.cache_dir, args.cache_max_mb * 1024 ** 2, args.streaming,
+                        args.binary, args.osz, args.log_level, args.profile_dir, args.profiler, args.mode)
+    if args.timing_report:
+        save_report(batch_report(results, time.perf_counter() - start), args.timing_report)
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки этапов beatmap_analyzer на синтетических данных
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from beatmap_analyzer import (ANALYSIS_MODES, DEDUP_TOLERANCE, NOTE_TYPES, OSU_POSITIONS, STRENGTHS,
+                              analyze_track, beatmap_from_binary, dedup_onsets, read_beatmap_binary,
+                              timing_points_from_beats, write_beatmap_binary, write_beatmap_files,
+                              write_osu)
+from beatmap_batch import process_track, run_batch
+from beatmap_profile import StageTimer, peak_rss_mb
+
+# Синтетические треки набора: длительность (сек), плотность (onset'ов/сек), темп
+SUITE_CASES = {
+    '30s_sparse': {'duration': 30, 'density': 2.5, 'bpm': 100},
+    '30s_dense': {'duration': 30, 'density': 7.0, 'bpm': 140},
+    '3min': {'duration': 180, 'density': 4.0, 'bpm': 128},
+    '10min': {'duration': 600, 'density': 5.0, 'bpm': 120},
+    '60min': {'duration': 3600, 'density': 4.0, 'bpm': 124},
+}
+# С этой длительности трек анализируется потоково (как миксы на 30-60 минут)
+STREAMING_FROM = 600
+# Окно совпадения найденного onset'а с истинным, сек
+MATCH_TOLERANCE = 0.05
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+# Регрессия: больше baseline * (1 + threshold) и при этом больше чем на min_delta
+# (сек / MB) - короткие этапы не дают ложных срабатываний от шума
+REGRESSION_THRESHOLD = 0.25
+REGRESSION_MIN_DELTA = {'analyze_s': 0.5, 'export_s': 0.2, 'peak_rss_mb': 20.0}
+# Допустимое падение precision / recall / точности типов (абсолютное)
+QUALITY_TOLERANCE = 0.02
+
+
+def synthetic_onsets(n_weak, seed=0, notes_per_sec=8.0, strong_ratio=0.4):
+    """Генерирует отсортированные массивы сильных и слабых onset'ов.
+
+    Плотность подобрана как у плотного трека с хай-хэтами: n_weak слабых
+    onset'ов, сильных примерно strong_ratio от этого числа.
+    """
+    rng = np.random.default_rng(seed)
+    duration = n_weak / notes_per_sec
+    strong = np.sort(rng.uniform(0, duration, int(n_weak * strong_ratio)))
+    weak = np.sort(rng.uniform(0, duration, n_weak))
+    return strong, weak
+
+
+def synthetic_beatmap(n_notes, seed=0, notes_per_sec=8.0, bpm=132.5):
+    """Beatmap в JSON-схеме со случайными нотами заданного размера"""
+    rng = np.random.default_rng(seed)
+    duration = n_notes / notes_per_sec
+    times = np.sort(rng.uniform(0, duration, n_notes))
+    types = rng.integers(0, len(NOTE_TYPES), n_notes)
+    strengths = rng.integers(0, len(STRENGTHS), n_notes)
+    return {
+        'metadata': {'title': f'Synthetic {n_notes}', 'artist': 'Benchmark',
+                     'duration': duration, 'bpm': bpm},
+        'timing': {'beats': np.arange(0, duration, 60 / bpm).tolist()},
+        'notes': [
+            {'time': float(t), 'type': str(NOTE_TYPES[k]), 'strength': STRENGTHS[s]}
+            for t, k, s in zip(times, types, strengths)
+        ],
+    }
+
+
+def dedup_naive(onsets_strong, onsets_weak, tolerance=DEDUP_TOLERANCE):
+    """Исходная квадратичная дедупликация (эталон для сравнения)"""
+    notes = [float(t) for t in onsets_strong]
+    keep = np.zeros(len(onsets_weak), dtype=bool)
+    for i, onset_time in enumerate(onsets_weak):
+        if not any(abs(n - onset_time) < tolerance for n in notes):
+            notes.append(float(onset_time))
+            keep[i] = True
+    return keep
+
+
+def bench_dedup(sizes, naive_max=5000, tolerance=DEDUP_TOLERANCE):
+    """Замеряет dedup_onsets и сверяет результат с эталоном на малых размерах"""
+    print(f"{'weak':>10} {'strong':>10} {'kept':>10} {'fast, s':>10} {'naive, s':>10}")
+    for size in sizes:
+        strong, weak = synthetic_onsets(size)
+
+        start = time.perf_counter()
+        keep = dedup_onsets(strong, weak, tolerance)
+        fast = time.perf_counter() - start
+
+        naive = '-'
+        if size <= naive_max:
+            start = time.perf_counter()
+            expected = dedup_naive(strong, weak, tolerance)
+            naive = f"{time.perf_counter() - start:.3f}"
+            if not np.array_equal(keep, expected):
+                raise AssertionError(f"dedup_onsets расходится с эталоном на {size} onset'ах")
+
+        print(f"{size:>10} {len(strong):>10} {int(keep.sum()):>10} {fast:>10.3f} {naive:>10}")
+
+
+def check_roundtrip(beatmap, restored, time_tolerance=1e-3):
+    """Сверяет beatmap после .bmb с исходным JSON (время - с точностью float32)"""
+    assert restored['metadata'] == beatmap['metadata'], "metadata расходится"
+    assert np.allclose(restored['timing']['beats'], beatmap['timing']['beats'],
+                       rtol=0, atol=time_tolerance), "beats расходятся"
+    assert len(restored['notes']) == len(beatmap['notes']), "разное число нот"
+    for got, expected in zip(restored['notes'], beatmap['notes']):
+        assert abs(got['time'] - expected['time']) < time_tolerance, f"время ноты: {got} != {expected}"
+        assert {k: v for k, v in got.items() if k != 'time'} == \
+            {k: v for k, v in expected.items() if k != 'time'}, f"нота: {got} != {expected}"
+
+
+def bench_format(beatmaps, compressions=(None, 'gzip')):
+    """Размер и время разбора .bmb против JSON, с проверкой round-trip"""
+    print(f"{'beatmap':<28} {'notes':>8} {'format':<8} {'size, KB':>10} {'ratio':>7} {'load, ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, beatmap in beatmaps:
+            json_path = os.path.join(tmp, 'beatmap.json')
+            with open(json_path, 'w') as f:
+                json.dump(beatmap, f, indent=2)
+            json_size = os.path.getsize(json_path)
+
+            start = time.perf_counter()
+            with open(json_path) as f:
+                json.load(f)
+            json_ms = (time.perf_counter() - start) * 1000
+            n_notes = len(beatmap['notes'])
+            print(f"{name:<28} {n_notes:>8} {'json':<8} {json_size / 1024:>10.1f} {1:>7.1f} {json_ms:>10.2f}")
+
+            for compression in compressions:
+                bmb_path = os.path.join(tmp, f'beatmap_{compression}.bmb')
+                write_beatmap_binary(beatmap, bmb_path, compression)
+                size = os.path.getsize(bmb_path)
+
+                start = time.perf_counter()
+                data = read_beatmap_binary(bmb_path)
+                load_ms = (time.perf_counter() - start) * 1000
+
+                check_roundtrip(beatmap, beatmap_from_binary(data))
+                label = compression or 'mmap'
+                print(f"{'':<28} {'':>8} {label:<8} {size / 1024:>10.1f} "
+                      f"{json_size / size:>7.1f} {load_ms:>10.2f}")
+
+
+def osu_concat(beatmap):
+    """Исходный экспорт .osu через osu_content += (эталон для сравнения)"""
+    osu_content = "[HitObjects]\n"
+    for note in beatmap['notes']:
+        time_ms = int(note['time'] * 1000)
+        x, y = OSU_POSITIONS.get(note['type'], (256, 192))
+        hit_type = 1 if note['strength'] == 'weak' else 5
+        osu_content += f"{x},{y},{time_ms},{hit_type},0,0:0:0:0:\n"
+    return osu_content
+
+
+def drifting_beats(duration, bpm_from=120.0, bpm_to=140.0, segments=4, seed=0, hop=512 / 44100):
+    """Сетка beats с темпом, меняющимся ступенями, и квантованием по кадрам STFT"""
+    rng = np.random.default_rng(seed)
+    beats, t = [], 0.0
+    for bpm in np.linspace(bpm_from, bpm_to, segments):
+        end = t + duration / segments
+        while t < end:
+            beats.append(t)
+            t += 60.0 / bpm
+    beats = np.round((np.array(beats) + rng.uniform(0, hop, len(beats))) / hop) * hop
+    return beats
+
+
+def bench_osu(sizes):
+    """Экспорт .osu: склейка строк против потоковой записи"""
+    print(f"{'notes':>10} {'concat, s':>10} {'stream, s':>10} {'timing points':>14}")
+    for size in sizes:
+        beatmap = synthetic_beatmap(size)
+        beatmap['timing']['beats'] = drifting_beats(beatmap['metadata']['duration']).tolist()
+
+        start = time.perf_counter()
+        expected = osu_concat(beatmap)
+        concat = time.perf_counter() - start
+
+        buffer = io.StringIO()
+        start = time.perf_counter()
+        write_osu(beatmap, buffer)
+        stream = time.perf_counter() - start
+
+        content = buffer.getvalue()
+        if content[content.index('[HitObjects]'):] != expected:
+            raise AssertionError(f"HitObjects расходятся на {size} нотах")
+        n_points = len(timing_points_from_beats(beatmap['timing']['beats']))
+        print(f"{size:>10} {concat:>10.3f} {stream:>10.3f} {n_points:>14}")
+
+
+def drum_samples(sr, rng):
+    """Удары синтетической установки: kick (60 Гц), snare и hi-hat (шум в полосах
+    mid и high из BAND_BINS), чтобы классификатор мог их различить"""
+    def band_noise(length, lo, hi, decay):
+        spectrum = np.fft.rfft(rng.standard_normal(length))
+        freqs = np.fft.rfftfreq(length, 1 / sr)
+        spectrum[(freqs < lo) | (freqs > hi)] = 0
+        noise = np.fft.irfft(spectrum, length)
+        t = np.arange(length) / sr
+        return noise / np.abs(noise).max() * np.exp(-t * decay)
+
+    t = np.arange(int(0.15 * sr)) / sr
+    return {
+        'kick': np.sin(2 * np.pi * 60 * t) * np.exp(-t * 25),
+        'snare': band_noise(int(0.12 * sr), 1200, 3000, 35),
+        'hihat': band_noise(int(0.05 * sr), 3600, 6200, 90) * 0.7,
+    }
+
+
+def synthetic_hits(duration, density, bpm, rng):
+    """Истинные удары на сетке шестнадцатых: kick/snare на каждой четверти,
+    hi-hat на остальных шестнадцатых с вероятностью под плотность density.
+    Возвращает (времена, типы) по возрастанию времени."""
+    step = 60 / bpm / 4
+    slots = np.arange(int(duration / step))
+    quarter = slots % 4 == 0
+    hihat_p = np.clip((density - bpm / 60) / (3 * bpm / 60), 0, 1)
+    present = quarter | (rng.random(len(slots)) < hihat_p)
+    # Последние 0.2 с не используем: хвост удара не должен обрезаться концом трека
+    present &= slots * step < duration - 0.2
+    kinds = np.where(quarter, np.where(slots // 4 % 2 == 0, 'kick', 'snare'), 'hihat')
+    return slots[present] * step, kinds[present]
+
+
+def write_synthetic_track(path, duration, density, bpm, seed=0, sr=44100, block_seconds=60):
+    """Пишет синтетический барабанный трек в WAV блоками (60 минут не держатся
+    в памяти целиком) и возвращает истинные (времена, типы) ударов"""
+    rng = np.random.default_rng(seed)
+    samples = drum_samples(sr, rng)
+    times, kinds = synthetic_hits(duration, density, bpm, rng)
+    starts = np.round(times * sr).astype(np.int64)
+    gains = rng.uniform(0.6, 1.0, len(times))
+    tail = max(len(sample) for sample in samples.values())
+    block = block_seconds * sr
+    total = int(duration * sr)
+
+    carry = np.zeros(tail)
+    with sf.SoundFile(path, 'w', sr, 1, 'PCM_16') as f:
+        for block_start in range(0, total, block):
+            length = min(block, total - block_start)
+            buffer = np.zeros(length + tail)
+            buffer[:tail] += carry
+            buffer += rng.normal(0, 1e-4, len(buffer))  # шумовой пол вместо цифровой тишины
+            lo, hi = np.searchsorted(starts, [block_start, block_start + length])
+            for start, kind, gain in zip(starts[lo:hi], kinds[lo:hi], gains[lo:hi]):
+                offset = start - block_start
+                buffer[offset:offset + len(samples[kind])] += gain * samples[kind]
+            f.write(np.clip(buffer[:length] * 0.5, -1, 1))
+            carry = buffer[length:]
+    return times, kinds
+
+
+def match_onsets(detected, truth, tolerance=MATCH_TOLERANCE):
+    """Жадное сопоставление один-к-одному отсортированных времён.
+    Возвращает пары индексов (detected, truth)."""
+    pairs = []
+    i = j = 0
+    while i < len(detected) and j < len(truth):
+        if abs(detected[i] - truth[j]) <= tolerance:
+            pairs.append((i, j))
+            i += 1
+            j += 1
+        elif detected[i] < truth[j]:
+            i += 1
+        else:
+            j += 1
+    return pairs
+
+
+def run_case(name, spec, seed, work_dir):
+    """Один трек набора: синтез, analyze_track, экспорт и качество onset'ов.
+
+    Запускается в отдельном процессе, поэтому peak RSS - пик именно этого трека.
+    """
+    audio = os.path.join(work_dir, f'{name}.wav')
+    streaming = spec['duration'] >= STREAMING_FROM
+    # Прогрев: JIT-компиляция numba в librosa не должна попадать в замер
+    write_synthetic_track(audio, 3, spec['density'], spec['bpm'], seed)
+    analyze_track(audio, streaming=streaming)
+    truth, truth_types = write_synthetic_track(audio, spec['duration'], spec['density'], spec['bpm'], seed)
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    beatmap = analyze_track(audio, streaming=streaming, timer=timer)
+    analyze = time.perf_counter() - start
+    os.remove(audio)
+
+    start = time.perf_counter()
+    write_beatmap_files(beatmap, os.path.join(work_dir, name), binary=True, timer=timer)
+    export = time.perf_counter() - start
+
+    notes = beatmap['notes']
+    detected = np.array([note['time'] for note in notes])
+    pairs = match_onsets(detected, truth)
+    correct_types = sum(notes[i]['type'] == truth_types[j] for i, j in pairs)
+    return {
+        **spec,
+        'streaming': streaming,
+        'notes': len(notes),
+        'truth': len(truth),
+        'analyze_s': analyze,
+        'export_s': export,
+        'peak_rss_mb': peak_rss_mb(),
+        'precision': len(pairs) / len(notes) if notes else 0.0,
+        'recall': len(pairs) / len(truth) if len(truth) else 0.0,
+        'type_accuracy': correct_types / len(pairs) if pairs else 0.0,
+        'stages': {stage['name']: stage['wall'] for stage in timer.report()['stages']},
+    }
+
+
+def machine_info():
+    return {'platform': platform.platform(), 'python': platform.python_version(),
+            'cpus': os.cpu_count(), 'numpy': np.__version__}
+
+
+def run_suite(cases, seed=0):
+    """Все треки набора, каждый в свежем процессе"""
+    print(f"{'case':<12} {'dur, s':>7} {'notes':>7} {'analyze, s':>11} {'export, s':>10} "
+          f"{'RSS, MB':>8} {'precision':>10} {'recall':>7} {'types':>6}")
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in cases:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                r = pool.submit(run_case, name, SUITE_CASES[name], seed, work_dir).result()
+            results[name] = r
+            rss = r['peak_rss_mb']
+            print(f"{name:<12} {r['duration']:>7} {r['notes']:>7} {r['analyze_s']:>11.2f} {r['export_s']:>10.2f} "
+                  f"{rss if rss is None else f'{rss:.0f}':>8} {r['precision']:>10.3f} {r['recall']:>7.3f} "
+                  f"{r['type_accuracy']:>6.2f}")
+    return {'machine': machine_info(), 'seed': seed, 'cases': results}
+
+
+def compare_with_baseline(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Регрессии относительно baseline: время и память выше порога, качество ниже допуска"""
+    regressions = []
+    if baseline.get('machine') != results['machine']:
+        print("⚠️  Baseline снят на другой машине или окружении - сравнение времени приблизительное")
+    for name, current in results['cases'].items():
+        old = baseline['cases'].get(name)
+        if old is None:
+            continue
+        for metric, min_delta in REGRESSION_MIN_DELTA.items():
+            if old[metric] is None or current[metric] is None:
+                continue
+            if current[metric] > old[metric] * (1 + threshold) and current[metric] - old[metric] > min_delta:
+                regressions.append(f"{name}: {metric} {old[metric]:.2f} -> {current[metric]:.2f} "
+                                   f"(+{(current[metric] / old[metric] - 1) * 100:.0f}%)")
+        for metric in ('precision', 'recall', 'type_accuracy'):
+            if current[metric] < old[metric] - QUALITY_TOLERANCE:
+                regressions.append(f"{name}: {metric} {old[metric]:.3f} -> {current[metric]:.3f}")
+    return regressions
+
+
+def bench_suite(cases, seed, output=None, baseline_file=BASELINE_FILE, threshold=REGRESSION_THRESHOLD,
+                update_baseline=False):
+    """Набор на синтетических треках с проверкой против JSON baseline; код выхода 1 при регрессии"""
+    results = run_suite(cases, seed)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Результаты: {output}")
+
+    if update_baseline:
+        baseline = {'machine': results['machine'], 'seed': seed, 'cases': {}}
+        if os.path.exists(baseline_file):
+            with open(baseline_file) as f:
+                baseline['cases'] = json.load(f)['cases']
+        baseline['cases'].update(results['cases'])
+        with open(baseline_file, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"📌 Baseline обновлён: {baseline_file}")
+        return
+
+    if not os.path.exists(baseline_file):
+        print(f"\nℹ️  Нет baseline {baseline_file} - запустите с --update-baseline")
+        return
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    if baseline.get('seed') != seed:
+        raise SystemExit(f"Baseline снят с seed={baseline.get('seed')}, а запуск - с seed={seed}")
+    regressions = compare_with_baseline(results, baseline, threshold)
+    if regressions:
+        print(f"\n❌ Регрессии относительно {baseline_file}:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+    print(f"\n✅ Без регрессий относительно baseline (порог {threshold:.0%})")
+
+
+def mode_agreement(reference, beatmap, tolerance=MATCH_TOLERANCE):
+    """Ноты режима против нот полного режима: совпавшие доли, отклонение времени
+    совпавших нот (мс) и согласие меток type / strength"""
+    ref_notes, notes = reference['notes'], beatmap['notes']
+    pairs = match_onsets([n['time'] for n in ref_notes], [n['time'] for n in notes], tolerance)
+    deviation = np.array([(notes[j]['time'] - ref_notes[i]['time']) * 1000 for i, j in pairs])
+    share = lambda key: sum(ref_notes[i][key] == notes[j][key] for i, j in pairs) / len(pairs) if pairs else 0.0
+    return {
+        'matched_of_full': len(pairs) / len(ref_notes) if ref_notes else 0.0,
+        'matched_of_mode': len(pairs) / len(notes) if notes else 0.0,
+        'timing_bias_ms': float(np.median(deviation)) if pairs else 0.0,
+        'timing_mean_abs_ms': float(np.abs(deviation).mean()) if pairs else 0.0,
+        'timing_p95_abs_ms': float(np.percentile(np.abs(deviation), 95)) if pairs else 0.0,
+        'type_agreement': share('type'),
+        'strength_agreement': share('strength'),
+    }
+
+
+def bench_modes(audio_files, modes, cases=('30s_dense', '3min'), seed=0, streaming=False, output=None):
+    """Быстрые режимы анализа против полного: скорость, отклонение onset'ов и согласие меток.
+
+    Кроме переданных треков (или вместо них) считаются синтетические cases -
+    для них дополнительно печатаются precision / recall против истинных ударов.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        tracks = [(os.path.basename(path), path, None) for path in audio_files]
+        for name in cases:
+            spec = SUITE_CASES[name]
+            path = os.path.join(work_dir, f'{name}.wav')
+            tracks.append((name, path, write_synthetic_track(path, spec['duration'], spec['density'],
+                                                             spec['bpm'], seed)))
+        # Прогрев JIT каждого режима на коротком треке
+        warmup = os.path.join(work_dir, 'warmup.wav')
+        write_synthetic_track(warmup, 3, 4.0, 120, seed)
+        for mode in ['full', *modes]:
+            analyze_track(warmup, streaming=streaming, params=ANALYSIS_MODES[mode])
+
+        print(f"{'track':<22} {'mode':<8} {'time, s':>8} {'speedup':>8} {'notes':>6} {'of full':>8} "
+              f"{'bias, ms':>9} {'|dev|, ms':>10} {'p95, ms':>8} {'type':>6} {'strength':>9} {'P/R truth':>11}")
+        report = {}
+        for name, path, truth in tracks:
+            report[name] = {}
+            reference = None
+            for mode in ['full', *modes]:
+                start = time.perf_counter()
+                beatmap = analyze_track(path, streaming=streaming, params=ANALYSIS_MODES[mode])
+                elapsed = time.perf_counter() - start
+                if reference is None:
+                    reference, reference_time = beatmap, elapsed
+                entry = {'analyze_s': elapsed, 'speedup': reference_time / elapsed,
+                         'notes': len(beatmap['notes']), **mode_agreement(reference, beatmap)}
+                vs_truth = ''
+                if truth is not None:
+                    pairs = match_onsets(np.array([n['time'] for n in beatmap['notes']]), truth[0])
+                    entry['precision'] = len(pairs) / len(beatmap['notes']) if beatmap['notes'] else 0.0
+                    entry['recall'] = len(pairs) / len(truth[0])
+                    vs_truth = f"{entry['precision']:.2f}/{entry['recall']:.2f}"
+                report[name][mode] = entry
+                print(f"{name[:22]:<22} {mode:<8} {elapsed:>8.2f} {entry['speedup']:>7.1f}x {entry['notes']:>6} "
+                      f"{entry['matched_of_full']:>8.1%} {entry['timing_bias_ms']:>9.1f} "
+                      f"{entry['timing_mean_abs_ms']:>10.1f} {entry['timing_p95_abs_ms']:>8.1f} "
+                      f"{entry['type_agreement']:>6.1%} {entry['strength_agreement']:>9.1%} {vs_truth:>11}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'modes': {mode: ANALYSIS_MODES[mode] for mode in ['full', *modes]},
+                       'tolerance': MATCH_TOLERANCE, 'tracks': report}, f, indent=2)
+        print(f"\n💾 Отчёт: {output}")
+    return report
+
+
+# Каталог проверки пакета: одноимённые треки в разных папках, одноимённые
+# с разным расширением и трек, на котором воркер умирает (CRASH_TRACK)
+BATCH_TRACKS = ['a/intro.wav', 'b/intro.wav', 'c/outro.wav', 'c/outro.flac', 'crash/crash.wav', 'd/tail.wav']
+CRASH_TRACK = 'crash.wav'
+
+
+def crashing_track(audio_file, output_dir, *args):
+    """process_track, который на CRASH_TRACK убивает воркер, как segfault в декодере"""
+    if os.path.basename(audio_file) == CRASH_TRACK:
+        os._exit(1)
+    return process_track(audio_file, output_dir, *args)
+
+
+def check_batch(workers=2, seed=0):
+    """beatmap_batch на синтетическом каталоге: у каждого трека своя папка
+    результатов, а падение воркера помечает ошибкой только свой трек"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = os.path.join(work_dir, 'tracks')
+        output_root = os.path.join(work_dir, 'beatmaps')
+        for i, track in enumerate(BATCH_TRACKS):
+            path = os.path.join(source, track)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_synthetic_track(path, 4, 3.0 + i, 120, seed + i)
+        audio_files = sorted(os.path.join(source, track) for track in BATCH_TRACKS)
+
+        results = {r['file']: r for r in run_batch(audio_files, output_root, workers, task=crashing_track)}
+        print()
+        for audio_file in audio_files:
+            result = results[audio_file]
+            if os.path.basename(audio_file) == CRASH_TRACK:
+                if result['ok'] or 'BrokenProcessPool' not in result['error']:
+                    raise AssertionError(f"{audio_file}: падение воркера не помечено ошибкой трека")
+            elif not result['ok']:
+                raise AssertionError(f"{audio_file}: трек помечен ошибкой из-за чужого падения: {result['error']}")
+
+        written = [r for r in results.values() if r['ok']]
+        output_dirs = {r['output_dir'] for r in written}
+        if len(output_dirs) != len(written):
+            raise AssertionError("разные треки записаны в одну папку")
+        for result in written:
+            with open(os.path.join(result['output_dir'], 'beatmap_full.json')) as f:
+                if len(json.load(f)['notes']) != result['notes']:
+                    raise AssertionError(f"{result['output_dir']}: beatmap перезаписан другим треком")
+            print(f"✅ {os.path.relpath(result['output_dir'], output_root)}: {result['notes']} нот")
+    print(f"✅ {len(written)} треков в {len(output_dirs)} папках, упал только {CRASH_TRACK}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    dedup = sub.add_parser('dedup', help='дедупликация слабых onset\'ов')
+    dedup.add_argument('--sizes', type=int, nargs='+', default=[2_000, 10_000, 100_000, 1_000_000])
+    dedup.add_argument('--naive-max', type=int, default=5000,
+                       help='максимальный размер, на котором запускается эталон')
+    dedup.add_argument('--tolerance', type=float, default=DEDUP_TOLERANCE)
+
+    fmt = sub.add_parser('format', help='бинарный формат .bmb против JSON')
+    fmt.add_argument('json_files', nargs='*', help='beatmap_*.json для проверки (по умолчанию - синтетика)')
+    fmt.add_argument('--notes', type=int, nargs='+', default=[1_000, 100_000])
+    fmt.add_argument('--compression', nargs='+', default=['none', 'gzip'],
+                     choices=['none', 'gzip', 'zstd'])
+
+    osu = sub.add_parser('osu', help='экспорт .osu')
+    osu.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+
+    suite = sub.add_parser('suite', help='синтетические треки 30 с - 60 мин: время, память и '
+                                         'precision/recall против baseline')
+    suite.add_argument('--cases', nargs='+', default=list(SUITE_CASES), choices=list(SUITE_CASES))
+    suite.add_argument('--seed', type=int, default=0)
+    suite.add_argument('-o', '--output', help='сохранить результаты запуска в JSON')
+    suite.add_argument('--baseline', default=BASELINE_FILE, help='JSON baseline для сравнения')
+    suite.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                       help='допустимый относительный рост времени и памяти')
+    suite.add_argument('--update-baseline', action='store_true',
+                       help='записать результаты запущенных треков в baseline вместо сравнения')
+
+    modes = sub.add_parser('modes', help='быстрые режимы анализа против полного: скорость, '
+                                         'отклонение onset\'ов, согласие меток')
+    modes.add_argument('audio_files', nargs='*', help='свои треки (по умолчанию - только синтетика)')
+    modes.add_argument('--modes', nargs='+', default=[m for m in ANALYSIS_MODES if m != 'full'],
+                       choices=[m for m in ANALYSIS_MODES if m != 'full'])
+    modes.add_argument('--cases', nargs='*', default=['30s_dense', '3min'], choices=list(SUITE_CASES),
+                       help='синтетические треки с известными ударами')
+    modes.add_argument('--streaming', action='store_true')
+    modes.add_argument('--seed', type=int, default=0)
+    modes.add_argument('-o', '--output', help='сохранить отчёт в JSON')
+
+    batch = sub.add_parser('batch', help='пакетный анализ: папки одноимённых треков и падение воркера')
+    batch.add_argument('-j', '--workers', type=int, default=2)
+    batch.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == 'batch':
+        check_batch(args.workers, args.seed)
+    elif args.command == 'dedup':
+        bench_dedup(args.sizes, args.naive_max, args.tolerance)
+    elif args.command == 'osu':
+        bench_osu(args.sizes)
+    elif args.command == 'modes':
+        bench_modes(args.audio_files, args.modes, args.cases, args.seed, args.streaming, args.output)
+    elif args.command == 'suite':
+        bench_suite(args.cases, args.seed, args.output, args.baseline, args.threshold, args.update_baseline)
+    elif args.command == 'format':
+        beatmaps = []
+        for path in args.json_files:
+            with open(path) as f:
+                beatmaps.append((os.path.basename(path), json.load(f)))
+        beatmaps += [('synthetic', synthetic_beatmap(n)) for n in args.notes]
+        bench_format(beatmaps, [None if c == 'none' else c for c in args.compression])
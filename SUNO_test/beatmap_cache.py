@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Дисковый кэш признаков анализа трека (content-addressed, LRU по размеру)
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import librosa
+import numpy as np
+
+from beatmap_analyzer import ANALYSIS_MODES, ANALYSIS_PARAMS
+
+# Версия формата записи: поднимать, если меняется состав признаков
+CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 содержимого файла (не зависит от имени и пути)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def params_hash(params, streaming=False):
+    """Хэш параметров анализа + пути извлечения признаков + версии кэша и librosa
+
+    Потоковое извлечение - отдельный ключ: сейчас оно даёт те же признаки,
+    но если пути разойдутся, кэш не подменит результат одного другим.
+    Обычный путь в хэш не пишется, поэтому его прежние записи остаются в силе.
+    """
+    payload = {'params': params, 'cache_version': CACHE_VERSION, 'librosa': librosa.__version__}
+    if streaming:
+        payload['extraction'] = 'streaming'
+    payload = json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def known_params_hashes():
+    """Хэши параметров всех режимов ANALYSIS_MODES, обычного и потокового пути"""
+    return {params_hash(params, streaming) for params in ANALYSIS_MODES.values() for streaming in (False, True)}
+
+
+def entry_params_hash(path):
+    """Хэш параметров записи по имени файла {sha256 аудио}-{хэш параметров}.npz"""
+    return os.path.basename(path)[:-len('.npz')].rpartition('-')[2]
+
+
+class AnalysisCache:
+    """Кэш результатов extract_features() в виде .npz файлов.
+
+    Ключ записи - хэш содержимого аудио + хэш параметров анализа и пути
+    извлечения (streaming), поэтому изменение ANALYSIS_PARAMS автоматически
+    даёт промах. Старые записи
+    удаляются через prune_stale(). В одной папке живут записи всех режимов
+    анализа: актуальные - записи любого режима ANALYSIS_MODES. Время последнего доступа хранится в mtime
+    файла, по нему работает LRU-вытеснение при превышении max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, params=ANALYSIS_PARAMS, streaming=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.streaming = streaming
+        self.params_hash = params_hash(params, streaming)
+        self.current_hashes = known_params_hashes() | {self.params_hash}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, audio_hash):
+        return os.path.join(self.cache_dir, f"{audio_hash}-{self.params_hash}.npz")
+
+    def _entries(self):
+        """Все записи кэша: (путь, размер, mtime)"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Запись удалил другой процесс
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, audio_file):
+        """Признаки трека из кэша или None при промахе
+
+        Битая запись (обрезанный или испорченный .npz) - тоже промах, она
+        удаляется. Запись, вытесненная другим процессом между чтением и
+        отметкой для LRU, - промах, как если бы её вытеснили раньше.
+        """
+        path = self._path(file_hash(audio_file))
+        try:
+            with np.load(path) as data:
+                features = {
+                    key: data[key].item() if data[key].ndim == 0 else data[key]
+                    for key in data.files
+                }
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+            # Файлы пишутся атомарно, значит запись испорчена, а не недописана
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            return None
+
+        # Отмечаем использование для LRU
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return features
+
+    def put(self, audio_file, features):
+        """Сохраняет признаки трека и вытесняет старые записи при переполнении"""
+        path = self._path(file_hash(audio_file))
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **features)
+            # Атомарная замена: параллельные воркеры не видят недописанных файлов
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Удаляет давно не использованные записи, пока кэш больше max_bytes"""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    def invalidate(self, audio_file=None):
+        """Удаляет записи одного трека (при любых параметрах) или весь кэш"""
+        prefix = file_hash(audio_file) if audio_file is not None else ''
+        removed = 0
+        for path, _, _ in self._entries():
+            if os.path.basename(path).startswith(prefix):
+                os.unlink(path)
+                removed += 1
+        return removed
+
+    def prune_stale(self):
+        """Удаляет записи с параметрами, которых нет ни у одного режима анализа"""
+        removed = 0
+        for path, _, _ in self._entries():
+            if entry_params_hash(path) not in self.current_hashes:
+                os.unlink(path)
+                removed += 1
+        return removed
+
+    def stats(self):
+        entries = self._entries()
+        current = sum(1 for path, _, _ in entries if entry_params_hash(path) in self.current_hashes)
+        return {
+            'entries': len(entries),
+            'current_params': current,
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('cache_dir')
+    parser.add_argument('command', choices=['stats', 'prune', 'clear'],
+                        help='stats - размер, prune - удалить записи со старыми параметрами, '
+                             'clear - очистить всё')
+    args = parser.parse_args()
+
+    cache = AnalysisCache(args.cache_dir)
+    if args.command == 'prune':
+        print(f"🧹 Удалено устаревших записей: {cache.prune_stale()}")
+    elif args.command == 'clear':
+        print(f"🧹 Удалено записей: {cache.invalidate()}")
+    stats = cache.stats()
+    print(f"📦 Записей: {stats['entries']} (актуальных {stats['current_params']}), "
+          f"{stats['bytes'] / 1024 ** 2:.1f} / {stats['max_bytes'] / 1024 ** 2:.0f} MB")
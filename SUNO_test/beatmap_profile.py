@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Замеры этапов анализа: wall/CPU время и пиковая память по стадиям, профили треков
+"""
+import contextlib
+import cProfile
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+log = logging.getLogger('beatmap.profile')
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса с момента запуска, MB (None, если недоступно)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт KB, macOS - байты
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+class StageTimer:
+    """Накопитель времени по этапам пайплайна.
+
+    Этапы открываются через with timer.stage('name'); повторный этап с тем же
+    именем (например, classify для сильных и слабых onset'ов) суммируется.
+    peak_rss_mb этапа - пиковый RSS процесса на момент его окончания: в
+    воркере пакета это пик с начала жизни процесса, а не только этого трека.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            entry = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            entry['wall'] += wall
+            entry['cpu'] += cpu
+            entry['calls'] += 1
+            entry['peak_rss_mb'] = peak_rss_mb()
+            log.debug(f"⏱️  {name}: {wall:.3f}s (CPU {cpu:.3f}s)")
+
+    def report(self, **extra):
+        """Отчёт в виде JSON-совместимого словаря; extra добавляется как есть"""
+        return {
+            **extra,
+            'stages': [{'name': name, **entry} for name, entry in self.stages.items()],
+            'total': {
+                'wall': time.perf_counter() - self._wall,
+                'cpu': time.process_time() - self._cpu,
+                'peak_rss_mb': peak_rss_mb(),
+            },
+        }
+
+
+def format_report(report):
+    """Таблица этапов для лога"""
+    total = report['total']['wall'] or 1.0
+    lines = [f"{'stage':<22} {'wall, s':>9} {'cpu, s':>9} {'%':>6} {'peak RSS, MB':>13}"]
+    for stage in report['stages']:
+        rss = stage['peak_rss_mb']
+        lines.append(f"{stage['name']:<22} {stage['wall']:>9.3f} {stage['cpu']:>9.3f} "
+                     f"{stage['wall'] / total * 100:>6.1f} {rss if rss is None else f'{rss:.0f}':>13}")
+    lines.append(f"{'total':<22} {report['total']['wall']:>9.3f} {report['total']['cpu']:>9.3f}")
+    return '\n'.join(lines)
+
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    log.info(f"📊 Отчёт по этапам: {path}")
+
+
+@contextlib.contextmanager
+def profiled(output_path, profiler='cprofile'):
+    """Профилирует блок: cProfile пишет .prof, pyinstrument - .html.
+
+    output_path=None - профилирование выключено. pyinstrument не входит в
+    зависимости (pip install pyinstrument).
+    """
+    if output_path is None:
+        yield
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(profile.output_html())
+    else:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(output_path)
+    log.info(f"🔬 Профиль: {output_path}")
+
+
+def profile_path(profile_dir, audio_file, profiler='cprofile'):
+    """<profile_dir>/<имя трека>-<хэш пути>.prof (или .html для pyinstrument)
+
+    Суффикс из хэша абсолютного пути трека: a/intro.mp3 и b/intro.mp3 из
+    одной пачки не перезаписывают профили друг друга.
+    """
+    if profile_dir is None:
+        return None
+    path = os.path.abspath(audio_file)
+    name = os.path.splitext(os.path.basename(path))[0] + '-' + hashlib.sha256(path.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(profile_dir, name + ('.html' if profiler == 'pyinstrument' else '.prof'))
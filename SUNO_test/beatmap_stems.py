@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Анализ трека по стемам: onset'ы ищутся в каждом стеме отдельно (по процессу на стем)
+"""
+import argparse
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import librosa
+import numpy as np
+
+from beatmap_analyzer import (ANALYSIS_PARAMS, DEDUP_TOLERANCE, band_energies, classify_onsets,
+                              dedup_onsets, write_beatmap_files)
+from beatmap_profile import LOG_LEVELS
+
+log = logging.getLogger('beatmap.stems')
+
+# Роли стемов в порядке приоритета: при совпадении по времени остаётся нота
+# более приоритетного стема. type=None - тип ноты определяется по спектру
+# стема (kick/snare/hihat), иначе все ноты стема получают этот тип.
+# weak=True - из стема берутся и слабые onset'ы.
+STEM_ROLES = {
+    'drums': {'type': None, 'weak': True},
+    'bass': {'type': 'note', 'weak': False},
+    'synth': {'type': 'note', 'weak': False},
+    'vocals': {'type': 'note', 'weak': False},
+    'backing vocals': {'type': 'note', 'weak': False},
+    'fx': {'type': 'note', 'weak': False},
+}
+
+# Бэк-вокал и FX по умолчанию не дают нот: они дублируют вокал и шумят
+DEFAULT_STEMS = ('drums', 'bass', 'synth', 'vocals')
+
+
+def stem_name(path):
+    """Имя стема из файла вида 'Infernal Pulse (Drums).mp3' -> 'drums'"""
+    base = os.path.splitext(os.path.basename(path))[0]
+    match = re.search(r'\(([^)]+)\)\s*$', base)
+    return (match.group(1) if match else base).strip().lower()
+
+
+def track_title(stem_files):
+    """Название трека - часть имени стема до скобок"""
+    base = os.path.splitext(os.path.basename(stem_files[0]))[0]
+    return re.sub(r'\s*\([^)]*\)\s*$', '', base)
+
+
+def analyze_stem(stem_file, role, params=ANALYSIS_PARAMS):
+    """Onset'ы одного стема; полная STFT считается только для ударных"""
+    y, sr = librosa.load(stem_file, sr=params['sr'])
+    hop_length = params['hop_length']
+    onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)
+
+    result = {
+        'stem': stem_name(stem_file),
+        'duration': librosa.get_duration(y=y, sr=sr),
+    }
+
+    for strength in ('strong', 'weak'):
+        if strength == 'weak' and not role['weak']:
+            times = np.array([])
+        else:
+            times = librosa.onset.onset_detect(
+                onset_envelope=onset_env, sr=sr, hop_length=hop_length, units='time',
+                backtrack=True, **params[strength]
+            )
+        result[strength] = times
+
+    if role['type'] is None:
+        # Метрическая сетка и классификация - по стему ударных
+        tempo, beats = librosa.beat.beat_track(y=y, sr=sr, hop_length=hop_length, units='time')
+        result['tempo'] = float(np.mean(tempo)) if isinstance(tempo, np.ndarray) else float(tempo)
+        result['beats'] = beats
+        S = np.abs(librosa.stft(y, n_fft=params['n_fft'], hop_length=hop_length))
+        bands = band_energies(S, params['bands'])
+        result['strong_types'] = classify_onsets(result['strong'], bands, sr, hop_length)
+        result['weak_types'] = classify_onsets(result['weak'], bands, sr, hop_length)
+    else:
+        result['strong_types'] = np.full(len(result['strong']), role['type'])
+        result['weak_types'] = np.full(len(result['weak']), role['type'])
+
+    return result
+
+
+def analyze_stems(stem_files, title=None, stems=DEFAULT_STEMS, workers=None,
+                  dedup_tolerance=DEDUP_TOLERANCE):
+    """Строит beatmap из стемов трека.
+
+    Каждый стем анализируется в своём процессе. Ноты сливаются в порядке
+    STEM_ROLES: сначала сильные, затем слабые onset'ы каждого стема; onset,
+    попавший в dedup_tolerance от уже принятой ноты, отбрасывается.
+    Схема beatmap та же, что у analyze_track, плюс поле 'stem' у каждой ноты.
+    """
+    by_name = {stem_name(f): f for f in stem_files}
+    selected = [name for name in STEM_ROLES if name in stems and name in by_name]
+    if 'drums' not in selected:
+        raise ValueError("Для анализа по стемам нужен стем ударных (Drums)")
+    if title is None:
+        title = track_title(stem_files)
+
+    log.info(f"🎵 Стемы: {', '.join(selected)}")
+    with ProcessPoolExecutor(max_workers=workers or len(selected)) as pool:
+        futures = [pool.submit(analyze_stem, by_name[name], STEM_ROLES[name]) for name in selected]
+        results = [future.result() for future in futures]
+
+    drums = results[0]
+    duration = max(r['duration'] for r in results)
+    log.info(f"🎼 BPM (по ударным): {drums['tempo']:.1f}")
+
+    beatmap = {
+        'metadata': {
+            'title': title,
+            'artist': 'Suno AI',
+            'duration': duration,
+            'bpm': drums['tempo']
+        },
+        'timing': {
+            'beats': drums['beats'].tolist(),
+        },
+        'notes': []
+    }
+
+    accepted = np.array([])
+    for result in results:
+        for strength in ('strong', 'weak'):
+            if strength == 'weak' and not STEM_ROLES[result['stem']]['weak']:
+                continue
+            times = result[strength]
+            keep = dedup_onsets(accepted, times, dedup_tolerance)
+            for onset_time, note_type in zip(times[keep], result[f'{strength}_types'][keep]):
+                beatmap['notes'].append({
+                    'time': float(onset_time),
+                    'type': str(note_type),
+                    'strength': strength,
+                    'stem': result['stem']
+                })
+            accepted = np.sort(np.concatenate([accepted, times[keep]]))
+            log.info(f"  {result['stem']:<15} {strength:<6} {int(keep.sum()):>5} из {len(times)}")
+
+    beatmap['notes'].sort(key=lambda x: x['time'])
+
+    log.info(f"📝 Создано нот: {len(beatmap['notes'])}")
+    log.info(f"📊 Средняя плотность: {len(beatmap['notes'])/duration:.1f} нот/сек")
+
+    return beatmap
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('stems_dir', help='папка со стемами вида "<трек> (Drums).mp3"')
+    parser.add_argument('-o', '--output-dir', default='.',
+                        help='куда сохранить beatmap_*.json и beatmap.osu')
+    parser.add_argument('--stems', nargs='+', default=list(DEFAULT_STEMS),
+                        choices=list(STEM_ROLES), help='какие стемы дают ноты')
+    parser.add_argument('--log-level', default='INFO', choices=LOG_LEVELS)
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format='%(message)s')
+
+    stem_files = sorted(
+        os.path.join(args.stems_dir, name) for name in os.listdir(args.stems_dir)
+        if name.lower().endswith(('.mp3', '.wav', '.ogg', '.flac'))
+    )
+    beatmap = analyze_stems(stem_files, stems=args.stems)
+    write_beatmap_files(beatmap, args.output_dir)
@@ -0,0 +1,374 @@
+"""
+Микробенчмарки симулятора экономики: быстрые пути против исходных алгоритмов
+"""
+import argparse
+import copy
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import List, Tuple
+
+import numpy as np
+
+from economy_config import DEFAULT_CONFIG
+from economy_replay import (DEFAULT_CHART, JUDGE_WINDOWS, JUDGEMENTS, Chart, accuracy_distribution,
+                            judge, synthetic_inputs)
+from economy_rng import RandomStream
+from economy_simulator import PROFILES, EconomySimulator, GameState
+
+# Источники случайности прогонов: random.Random или поток на numpy Generator
+RNGS = {'random': random.Random, 'stream': RandomStream}
+
+
+def create_beats_loop(simulator: EconomySimulator) -> Tuple[int, float]:
+    """Исходный цикл по одному биту (эталон для EconomySimulator.create_beats)"""
+    state = simulator.state
+    beats_this_session = 0
+    active_earnings = 0
+
+    while state.energy >= 20:
+        accuracy = simulator.profile.skill_level + simulator.rng.uniform(-0.05, 0.05)
+        accuracy = max(0.5, min(1.0, accuracy))
+
+        price, quality, reputation = state.calculate_beat_price(accuracy)
+
+        state.money += price
+        state.reputation += reputation
+        state.energy -= 20
+        state.beats_created += 1
+        beats_this_session += 1
+        active_earnings += price
+        state.total_active_earnings += price
+
+    return beats_this_session, active_earnings
+
+
+def buy_upgrades_scan(state: GameState) -> List[str]:
+    """Исходная жадная покупка полным перебором (эталон для EconomySimulator.buy_upgrades)"""
+    upgrades_bought = []
+
+    while True:
+        best_upgrade = None
+        best_value = 0
+
+        # Проверяем оборудование
+        for eq_type in state.equipment:
+            level = state.equipment[eq_type]
+            cost = state.get_equipment_cost(eq_type, level)
+
+            if cost <= state.money and cost != float('inf'):
+                # Ценность = бонус / стоимость
+                bonus = 5 if eq_type in ['phone', 'headphones'] else (10 if eq_type == 'microphone' else 15)
+                value = bonus / cost
+
+                if value > best_value:
+                    best_value = value
+                    best_upgrade = ('equipment', eq_type, cost)
+
+        # Проверяем артистов
+        for artist_type in state.artists:
+            if not state.can_afford_artist(artist_type):
+                continue
+
+            level = state.artists[artist_type]
+            cost = state.get_artist_cost(artist_type, level)
+
+            if cost <= state.money and cost != float('inf'):
+                # Ценность = доход в минуту / стоимость
+                income_increase = {
+                    'street_poet': 3.75,
+                    'mc_flow': 4.75,
+                    'lil_dreamer': 5.5,
+                    'young_legend': 9.5
+                }[artist_type]
+
+                value = income_increase / cost
+
+                if value > best_value:
+                    best_value = value
+                    best_upgrade = ('artist', artist_type, cost)
+
+        # Покупаем лучший апгрейд
+        if best_upgrade:
+            upgrade_type, item, cost = best_upgrade
+            state.money -= cost
+
+            if upgrade_type == 'equipment':
+                state.equipment[item] += 1
+                upgrades_bought.append(f"{item} L{state.equipment[item]}")
+            else:
+                state.artists[item] += 1
+                upgrades_bought.append(f"{item} L{state.artists[item]}")
+        else:
+            break
+
+    return upgrades_bought
+
+
+def purchases_from_names(config, upgrades_bought: List[str]) -> List[Tuple[int, int]]:
+    """'item L<уровень>' -> (индекс в upgrade_tables, уровень), как возвращает buy_upgrades"""
+    index = {item: i for i, (_, item, _, _) in enumerate(config.upgrade_tables)}
+    return [(index[item], int(level[1:])) for item, level in (name.split(' ') for name in upgrades_bought)]
+
+
+class DictGameState:
+    """Исходная раскладка состояния: __dict__ на экземпляр и по словарю
+    уровней на оборудование и артистов (эталон для замера памяти)"""
+
+    def __init__(self, config=None):
+        self.config = config if config is not None else DEFAULT_CONFIG
+        self.money = self.config.start_money
+        self.reputation = 0
+        self.energy = self.config.start_energy
+        self.max_energy = self.config.max_energy
+        self.equipment = dict.fromkeys(self.config.equipment_cost, 0)
+        self.artists = dict.fromkeys(self.config.artist_cost, 0)
+        self.beats_created = 0
+        self.total_active_earnings = 0
+        self.total_passive_earnings = 0
+
+
+class ReferenceSimulator(EconomySimulator):
+    """EconomySimulator с исходными алгоритмами вместо быстрых путей"""
+
+    def create_beats(self) -> Tuple[int, float]:
+        return create_beats_loop(self)
+
+    def buy_upgrades(self) -> List[Tuple[int, int]]:
+        return purchases_from_names(self.config, buy_upgrades_scan(self.state))
+
+
+def session_state(simulator: EconomySimulator) -> tuple:
+    state = simulator.state
+    return (state.money, state.reputation, state.energy, state.beats_created,
+            state.total_active_earnings)
+
+
+def bench_session(sessions: int, seed: int = 0, rng: str = 'random'):
+    """Фаза битов одной сессии (полная энергия): цикл против быстрого пути"""
+    print(f"{'профиль':<10} {'сессий':>8} {'loop, мс':>10} {'fast, мс':>10} {'ускорение':>10}")
+    for profile_name, profile in PROFILES.items():
+        timings = {}
+        states = {}
+        for name, create_beats in (('loop', create_beats_loop), ('fast', EconomySimulator.create_beats)):
+            simulator = EconomySimulator(profile, rng=RNGS[rng](seed))
+            simulator.state.equipment.update(phone=3, headphones=2, microphone=1, computer=1)
+            start = time.perf_counter()
+            for _ in range(sessions):
+                simulator.state.energy = simulator.state.max_energy
+                create_beats(simulator)
+            timings[name] = time.perf_counter() - start
+            states[name] = session_state(simulator)
+
+        if states['loop'] != states['fast']:
+            raise AssertionError(f"{profile_name}: быстрый путь расходится с циклом: "
+                                 f"{states['fast']} != {states['loop']}")
+        print(f"{profile_name:<10} {sessions:>8} {timings['loop'] * 1000:>10.1f} "
+              f"{timings['fast'] * 1000:>10.1f} {timings['loop'] / timings['fast']:>9.2f}x")
+
+
+def bench_simulate(runs: int, seed: int = 0, rng: str = 'random'):
+    """Полные 60-дневные прогоны: результаты должны совпадать побитово"""
+    print(f"{'профиль':<10} {'прогонов':>8} {'loop, с':>10} {'fast, с':>10} {'ускорение':>10}")
+    for profile_name, profile in PROFILES.items():
+        timings = {}
+        results = {}
+        for name, simulator_class in (('loop', ReferenceSimulator), ('fast', EconomySimulator)):
+            start = time.perf_counter()
+            results[name] = []
+            for run in range(runs):
+                simulator = simulator_class(profile, rng=RNGS[rng](seed + run))
+                result = simulator.simulate(verbose=False)
+                summary = {key: value for key, value in result.items() if key != 'recorder'}
+                results[name].append((summary, simulator.log, simulator.daily_snapshots))
+            timings[name] = time.perf_counter() - start
+
+        if results['loop'] != results['fast']:
+            raise AssertionError(f"{profile_name}: результаты прогонов расходятся")
+        print(f"{profile_name:<10} {runs:>8} {timings['loop']:>10.2f} {timings['fast']:>10.2f} "
+              f"{timings['loop'] / timings['fast']:>9.2f}x")
+
+
+def bench_checkpoint(days: int, split_day: int, seed: int = 0, rng: str = 'random'):
+    """Прогон до split_day + чекпоинт + продолжение против прогона без остановки"""
+    print(f"{'профиль':<10} {'дней':>6} {'чекпоинт, КБ':>13} {'save, мс':>9} {'load, мс':>9} "
+          f"{'с нуля, с':>10} {'с чекпоинта, с':>15}")
+    path = os.path.join(tempfile.mkdtemp(), 'checkpoint.npz')
+    for profile_name, profile in PROFILES.items():
+        start = time.perf_counter()
+        straight = EconomySimulator(profile, days, rng=RNGS[rng](seed))
+        expected = straight.simulate(verbose=False)
+        full = time.perf_counter() - start
+
+        simulator = EconomySimulator(profile, days, rng=RNGS[rng](seed))
+        simulator.simulate(verbose=False, until_day=split_day)
+        start = time.perf_counter()
+        simulator.save_checkpoint(path)
+        save = time.perf_counter() - start
+        start = time.perf_counter()
+        resumed = EconomySimulator.load_checkpoint(path)
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        result = resumed.simulate(verbose=False)
+        resume = time.perf_counter() - start
+
+        outcomes = [({key: value for key, value in r.items() if key != 'recorder'}, sim.log, sim.daily_snapshots)
+                    for r, sim in ((expected, straight), (result, resumed))]
+        if outcomes[0] != outcomes[1]:
+            raise AssertionError(f"{profile_name}: продолжение с чекпоинта расходится с прогоном без остановки")
+        print(f"{profile_name:<10} {days:>6} {os.path.getsize(path) / 1024:>13.1f} {save * 1000:>9.1f} "
+              f"{load * 1000:>9.1f} {full:>10.3f} {resume:>15.3f}")
+    os.remove(path)
+
+
+def judge_loop(chart: Chart, times: np.ndarray, lanes: np.ndarray) -> np.ndarray:
+    """Последовательное судейство как в handleLaneHit / handleMissedNote
+    (эталон для economy_replay.judge): нажатия по времени, каждое - к
+    ближайшей неотбитой ноте своей дорожки"""
+    counts = np.zeros((len(times), len(JUDGEMENTS)), dtype=np.int64)
+    for run, (run_times, run_lanes) in enumerate(zip(times, lanes)):
+        hit = np.zeros(chart.n_notes, dtype=bool)
+        for i in np.argsort(run_times, kind='stable'):
+            t = run_times[i]
+            if np.isnan(t):
+                continue
+            candidates = np.flatnonzero((chart.lanes == run_lanes[i]) & ~hit)
+            if len(candidates) == 0:
+                continue
+            note = candidates[np.argmin(np.abs(chart.times[candidates] - t))]
+            error = abs(t - chart.times[note])
+            if error > JUDGE_WINDOWS[-1]:
+                continue
+            hit[note] = True
+            counts[run, np.searchsorted(JUDGE_WINDOWS, error)] += 1
+        counts[run, -1] = chart.n_notes - counts[run, :-1].sum()
+    return counts
+
+
+def bench_replay(plays: int, check: int, chart_path: str = DEFAULT_CHART, seed: int = 0):
+    """Судейство синтетических прогонов чарта: скорость, распределения
+    точности по профилям и сверка с последовательным эталоном"""
+    chart = Chart.load(chart_path)
+    print(f"{os.path.basename(chart_path)}: {chart.n_notes} нот, {chart.duration:.0f}s\n")
+    print(f"{'профиль':<10} {'skill':>6} {'прогонов':>9} {'прогонов/мин':>13} {'hits p10/p50/p90':>20} "
+          f"{'ex p10/p50/p90':>20} {'сверено':>8}")
+    for profile_name, profile in PROFILES.items():
+        start = time.perf_counter()
+        hits = accuracy_distribution(chart, profile.skill_level, plays, seed)
+        elapsed = time.perf_counter() - start
+        ex = accuracy_distribution(chart, profile.skill_level, plays, seed, 'ex')
+
+        times, lanes = synthetic_inputs(chart, check, profile.skill_level, np.random.default_rng(seed))
+        fast = judge(chart, times, lanes)
+        reference = judge_loop(chart, times, lanes)
+        mismatched = np.flatnonzero((fast != reference).any(axis=1))
+        if len(mismatched):
+            run = mismatched[0]
+            raise AssertionError(f"{profile_name}: judge() расходится с последовательным судейством в "
+                                 f"{len(mismatched)} из {check} прогонов, прогон {run}: "
+                                 f"{fast[run].tolist()} против {reference[run].tolist()}")
+        cells = [' / '.join(f'{v:.0%}' for v in np.percentile(values, [10, 50, 90])) for values in (hits, ex)]
+        print(f"{profile_name:<10} {profile.skill_level:>6.2f} {plays:>9} {plays / elapsed * 60:>13,.0f} "
+              f"{cells[0]:>20} {cells[1]:>20} {check:>8}")
+
+
+def random_state(rng: random.Random, state_class=GameState) -> GameState:
+    """Состояние со случайными уровнями, деньгами и репутацией"""
+    state = state_class()
+    for levels in (state.equipment, state.artists):
+        for item in levels:
+            levels[item] = rng.randint(0, 5)
+    state.money = rng.choice([rng.uniform(0, 500), rng.uniform(0, 5000), rng.uniform(0, 50000)])
+    state.reputation = rng.uniform(0, 800)
+    return state
+
+
+def bench_upgrades(states: int, seed: int = 0):
+    """Фаза покупок: перебор против кучи на случайных состояниях"""
+    rng = random.Random(seed)
+    cases = [random_state(rng) for _ in range(states)]
+    timings = {}
+    outcomes = {}
+    for name in ('scan', 'heap'):
+        simulators = []
+        for state in cases:
+            simulator = EconomySimulator(PROFILES['core'])
+            simulator.state = copy.deepcopy(state)
+            simulators.append(simulator)
+        start = time.perf_counter()
+        if name == 'scan':
+            bought = [buy_upgrades_scan(simulator.state) for simulator in simulators]
+        else:
+            bought = [simulator.buy_upgrades() for simulator in simulators]
+        timings[name] = time.perf_counter() - start
+        if name == 'scan':
+            # Строки эталона -> (индекс, уровень) вне замера
+            bought = [purchases_from_names(simulator.config, b) for b, simulator in zip(bought, simulators)]
+        outcomes[name] = [(b, sim.state.money, sim.state.equipment, sim.state.artists)
+                          for b, sim in zip(bought, simulators)]
+
+    if outcomes['scan'] != outcomes['heap']:
+        raise AssertionError("куча покупает не то же, что перебор")
+    purchases = sum(len(b) for b, *_ in outcomes['scan'])
+    print(f"{'состояний':>10} {'покупок':>10} {'scan, мс':>10} {'heap, мс':>10} {'ускорение':>10}")
+    print(f"{states:>10} {purchases:>10} {timings['scan'] * 1000:>10.1f} {timings['heap'] * 1000:>10.1f} "
+          f"{timings['scan'] / timings['heap']:>9.2f}x")
+
+
+def bench_memory(players: int, seed: int = 0):
+    """Байт на игрока: состояния словарями против __slots__ + массива уровней"""
+    print(f"{'раскладка':<10} {'игроков':>8} {'всего, МБ':>10} {'байт/игрок':>11}")
+    sizes = {}
+    for name, state_class in (('dict', DictGameState), ('slots', GameState)):
+        rng = random.Random(seed)
+        tracemalloc.start()
+        states = [random_state(rng, state_class) for _ in range(players)]
+        sizes[name] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del states
+        print(f"{name:<10} {players:>8} {sizes[name] / 2**20:>10.1f} {sizes[name] / players:>11.0f}")
+    print(f"экономия: {sizes['dict'] / sizes['slots']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rng', default='random', choices=list(RNGS), help='источник случайности прогонов')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    session = sub.add_parser('session', help='создание битов за сессию: цикл против быстрого пути')
+    session.add_argument('--sessions', type=int, default=100_000)
+
+    upgrades = sub.add_parser('upgrades', help='покупка апгрейдов: перебор против кучи')
+    upgrades.add_argument('--states', type=int, default=20_000)
+
+    simulate = sub.add_parser('simulate', help='полные прогоны с проверкой побитового совпадения')
+    simulate.add_argument('--runs', type=int, default=200)
+
+    memory = sub.add_parser('memory', help='память на игрока: словари против компактного состояния')
+    memory.add_argument('--players', type=int, default=100_000)
+
+    checkpoint = sub.add_parser('checkpoint', help='чекпоинт в середине прогона и продолжение с него')
+    checkpoint.add_argument('--days', type=int, default=365)
+    checkpoint.add_argument('--split-day', type=int, default=180, help='день, после которого сохраняется чекпоинт')
+
+    replay = sub.add_parser('replay', help='судейство прогонов чарта: скорость и сверка с эталоном')
+    replay.add_argument('--plays', type=int, default=200_000, help='синтетических прогонов на профиль')
+    replay.add_argument('--check', type=int, default=200, help='прогонов для сверки с эталоном')
+    replay.add_argument('--chart', default=DEFAULT_CHART, help='битмап beatmap_analyzer.py')
+
+    args = parser.parse_args()
+    if args.command == 'session':
+        bench_session(args.sessions, args.seed, args.rng)
+    elif args.command == 'upgrades':
+        bench_upgrades(args.states, args.seed)
+    elif args.command == 'simulate':
+        bench_simulate(args.runs, args.seed, args.rng)
+    elif args.command == 'memory':
+        bench_memory(args.players, args.seed)
+    elif args.command == 'checkpoint':
+        bench_checkpoint(args.days, args.split_day, args.seed, args.rng)
+    elif args.command == 'replay':
+        bench_replay(args.plays, args.check, args.chart, args.seed)
@@ -0,0 +1,217 @@
+"""
+Конфиг экономики симулятора: JSON с базовыми ценами, множителями, доходом и
+бонусами, скомпилированный в плоские таблицы по уровням
+"""
+import argparse
+import json
+import math
+import os
+import re
+from typing import Dict, List
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'economy_config.json')
+
+
+def level_costs(base_cost: float, multiplier: float, max_level: int, floor: bool = False) -> List[float]:
+    """costs[level] - цена перехода с level на level + 1"""
+    costs = [base_cost * (multiplier ** level) for level in range(max_level)]
+    return [float(math.floor(cost)) for cost in costs] if floor else costs
+
+
+class EconomyConfig:
+    """Конфиг экономики, скомпилированный в таблицы по уровням.
+
+    equipment_cost / artist_cost[item][level] - цена следующего уровня,
+    equipment_bonus[item][level] - бонус к качеству (%) на уровне level,
+    artist_income[item][level] - доход артиста ($/мин) на уровне level.
+    upgrade_tables - (вид, имя, costs, values) в порядке перебора при
+    жадной покупке: сначала оборудование, затем артисты.
+    equipment_slots[item] / artist_slots[item] - позиция уровня предмета в
+    плоском массиве уровней GameState (совпадает с индексом в upgrade_tables).
+    """
+
+    def __init__(self, raw: Dict, name: str = 'default'):
+        self.raw = raw
+        self.name = name
+
+        self.start_money = raw['start']['money']
+        self.start_energy = raw['start']['energy']
+        self.max_energy = raw['energy']['max']
+        self.energy_regen_per_minute = raw['energy']['regen_per_minute']
+        self.beat_energy = raw['energy']['per_beat']
+        self.offline_cap_minutes = raw['offline_cap_minutes']
+        # Burnout: доля сессий падает линейно на 1 / burnout_days в день, но не ниже burnout_floor
+        self.burnout_floor = raw['burnout']['floor']
+        self.burnout_days = raw['burnout']['days']
+
+        self.equipment_cost = {}
+        self.equipment_bonus = {}
+        self.artist_cost = {}
+        self.artist_income = {}
+        self.artist_min_reputation = {}
+        self.upgrade_tables = []
+        self.equipment_slots = {}
+        self.artist_slots = {}
+
+        group = raw['equipment']
+        for item, spec in group['items'].items():
+            costs = self._costs(group, spec)
+            bonus = spec['bonus_per_level']
+            self.equipment_slots[item] = len(self.upgrade_tables)
+            self.equipment_cost[item] = costs
+            self.equipment_bonus[item] = [level * bonus for level in range(group['max_level'] + 1)]
+            self.upgrade_tables.append(('equipment', item, costs, [bonus / cost for cost in costs]))
+
+        group = raw['artists']
+        for item, spec in group['items'].items():
+            costs = self._costs(group, spec)
+            if 'income' in spec:
+                # Явный доход по уровням: ценность - прирост до следующего уровня
+                income = list(spec['income'][:group['max_level'] + 1])
+                gains = [income[level + 1] - income[level] for level in range(group['max_level'])]
+            else:
+                # Линейный доход: base_income на 1 уровне, +income_per_level за каждый следующий.
+                # Ценность апгрейда, как и раньше, - income_per_level / цена на любом уровне
+                income = [0] + [spec['base_income'] + (level - 1) * spec['income_per_level']
+                                for level in range(1, group['max_level'] + 1)]
+                gains = [spec['income_per_level']] * group['max_level']
+            self.artist_slots[item] = len(self.upgrade_tables)
+            self.artist_cost[item] = costs
+            self.artist_income[item] = income
+            self.artist_min_reputation[item] = spec.get('min_reputation', 0)
+            self.upgrade_tables.append(('artist', item, costs, [gain / cost for gain, cost in zip(gains, costs)]))
+
+    @staticmethod
+    def _costs(group: Dict, spec: Dict) -> List[float]:
+        return level_costs(spec['base_cost'], spec.get('cost_multiplier', group['cost_multiplier']),
+                           group['max_level'], group.get('floor_costs', False))
+
+    @property
+    def max_level(self) -> int:
+        return max(self.raw['equipment']['max_level'], self.raw['artists']['max_level'])
+
+
+def load_config(path: str = DEFAULT_CONFIG_PATH) -> EconomyConfig:
+    with open(path, encoding='utf-8') as f:
+        raw = json.load(f)
+    return EconomyConfig(raw, os.path.splitext(os.path.basename(path))[0])
+
+
+DEFAULT_CONFIG = load_config()
+
+
+def with_overrides(raw: Dict, overrides: Dict[str, float]) -> Dict:
+    """Копия raw с заменёнными значениями; ключи - пути через точку,
+    например 'artists.cost_multiplier' или 'energy.per_beat'"""
+    raw = json.loads(json.dumps(raw))
+    for path, value in overrides.items():
+        *parents, key = path.split('.')
+        node = raw
+        for parent in parents:
+            node = node[parent]
+        if key not in node:
+            raise KeyError(f"{path}: нет такого параметра в конфиге")
+        node[key] = value
+    return raw
+
+
+def _ts_block(source: str, name: str) -> str:
+    """Тело объекта `export const NAME = { ... }` (до первой строки '}')"""
+    match = re.search(rf'export const {name}\b[^=]*=\s*\{{(.*?)\n\}}', source, re.S)
+    if match is None:
+        raise ValueError(f"{name} не найден")
+    return match.group(1)
+
+
+def _ts_number(block: str, key: str):
+    match = re.search(rf'\b{key}:\s*([\d.]+)', block)
+    return None if match is None else json.loads(match.group(1))
+
+
+def config_from_game_state_ts(ts_path: str, base: Dict = None) -> Dict:
+    """Конфиг из каталога lib/game-state.ts.
+
+    Артисты берутся из ARTISTS_CONFIG (baseCost, costMultiplier,
+    incomePerLevel в $/ч -> $/мин, requiresReputation), цены округляются
+    вниз, как в getArtistUpgradeCost. Энергия - из ENERGY_CONFIG, стартовые
+    деньги - из INITIAL_GAME_STATE. Цен оборудования в TS нет: раздел
+    equipment и оффлайн-лимит берутся из base (по умолчанию - основной конфиг).
+    """
+    with open(ts_path, encoding='utf-8') as f:
+        source = f.read()
+    raw = json.loads(json.dumps(base if base is not None else DEFAULT_CONFIG.raw))
+
+    energy = _ts_block(source, 'ENERGY_CONFIG')
+    raw['energy'] = {
+        'max': _ts_number(energy, 'BASE_MAX_ENERGY'),
+        'regen_per_minute': _ts_number(energy, 'ENERGY_REGEN_PER_MINUTE'),
+        'per_beat': _ts_number(energy, 'ENERGY_COST_PER_BEAT'),
+    }
+    initial = _ts_block(source, 'INITIAL_GAME_STATE')
+    raw['start'] = {'money': _ts_number(initial, 'money'), 'energy': _ts_number(initial, 'energy')}
+
+    artists = {}
+    multipliers = set()
+    for artist_id, body in re.findall(r'\n  "([\w-]+)":\s*\{(.*?)\n  \}', _ts_block(source, 'ARTISTS_CONFIG'), re.S):
+        income = re.search(r'incomePerLevel:\s*\[([^\]]*)\]', body).group(1)
+        spec = {
+            'base_cost': _ts_number(body, 'baseCost'),
+            'cost_multiplier': _ts_number(body, 'costMultiplier'),
+            'income': [float(x) / 60 for x in income.split(',')],
+        }
+        if _ts_number(body, 'requiresReputation'):
+            spec['min_reputation'] = _ts_number(body, 'requiresReputation')
+        multipliers.add(spec['cost_multiplier'])
+        artists[artist_id.replace('-', '_')] = spec
+
+    cost_multiplier = raw['artists']['cost_multiplier']
+    if len(multipliers) == 1:
+        # Общий множитель - на уровень группы, чтобы его можно было варьировать одним ключом
+        cost_multiplier = multipliers.pop()
+        for spec in artists.values():
+            del spec['cost_multiplier']
+    raw['artists'] = {
+        'max_level': min(len(spec['income']) for spec in artists.values()) - 1,
+        'cost_multiplier': cost_multiplier,
+        'floor_costs': True,
+        'items': artists,
+    }
+    return raw
+
+
+def print_tables(config: EconomyConfig):
+    """Скомпилированные таблицы: цена каждого уровня, бонус и доход"""
+    print(f"Конфиг {config.name}: энергия {config.start_energy}/{config.max_energy} "
+          f"(+{config.energy_regen_per_minute}/мин, {config.beat_energy} на бит), "
+          f"старт ${config.start_money:,}, оффлайн до {config.offline_cap_minutes} мин, "
+          f"burnout до {config.burnout_floor:.0%} за {config.burnout_days} дней")
+    for kind, item, costs, values in config.upgrade_tables:
+        if kind == 'equipment':
+            effect = f"бонус {config.equipment_bonus[item][-1]}%"
+        else:
+            effect = f"доход ${config.artist_income[item][-1]:.2f}/мин"
+            if config.artist_min_reputation[item]:
+                effect += f", с {config.artist_min_reputation[item]} репутации"
+        print(f"  {kind:<10} {item:<16} {effect:<36} цены: {', '.join(f'{c:,.0f}' for c in costs)}")
+    total = sum(sum(costs) for *_, costs, _ in config.upgrade_tables)
+    print(f"  Стоимость всего контента: ${total:,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('config', nargs='?', default=DEFAULT_CONFIG_PATH, help='JSON-конфиг для показа')
+    parser.add_argument('--from-ts', metavar='GAME_STATE_TS',
+                        help='сгенерировать конфиг из lib/game-state.ts')
+    parser.add_argument('-o', '--output', help='куда записать сгенерированный конфиг')
+    args = parser.parse_args()
+
+    if args.from_ts:
+        raw = config_from_game_state_ts(args.from_ts)
+        config = EconomyConfig(raw, 'game-state.ts')
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(raw, f, indent=2, ensure_ascii=False)
+            print(f"✅ Конфиг сохранён в {args.output}")
+    else:
+        config = load_config(args.config)
+    print_tables(config)
@@ -0,0 +1,47 @@
+"""
+Событийные часы симулятора экономики: очередь событий с меткой времени в минутах
+"""
+import heapq
+from typing import Any, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+# События, которые двигают симуляцию
+SESSION_START = 'session_start'  # data: (день, номер сессии, последняя ли сессия дня)
+DAY_END = 'day_end'  # data: день; только для дней, которые пишет рекордер
+
+# Производные события: планируются, только если на них кто-то подписан
+ENERGY_FULL = 'energy_full'  # энергия восстановилась до максимума
+OFFLINE_CAP = 'offline_cap'  # оффлайн-доход упёрся в лимит
+ARTIST_UNLOCK = 'artist_unlock'  # data: артист, до которого дотянулась репутация
+
+
+class EventQueue:
+    """Куча событий (время, порядковый номер, вид, данные).
+
+    События с одинаковым временем выходят в порядке планирования. now -
+    время последнего извлечённого события: часы прыгают от события к
+    событию, стоимость пропорциональна числу событий, а не длине периода.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.now = 0
+        self._seq = 0
+
+    def schedule(self, time: int, kind: str, data: Any = None):
+        if time < self.now:
+            raise ValueError(f"Событие {kind} в прошлом: {time} < {self.now}")
+        heapq.heappush(self.heap, (time, self._seq, kind, data))
+        self._seq += 1
+
+    def pop(self) -> Tuple[int, str, Any]:
+        time, _, kind, data = heapq.heappop(self.heap)
+        self.now = time
+        return time, kind, data
+
+    def next_time(self) -> int:
+        return self.heap[0][0]
+
+    def __len__(self) -> int:
+        return len(self.heap)
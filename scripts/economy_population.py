@@ -0,0 +1,191 @@
+"""
+Популяционный режим симулятора экономики: N независимых seeded-прогонов на профиль
+и перцентили по дням вместо одной случайной траектории
+"""
+import argparse
+import os
+import time
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from economy_config import DEFAULT_CONFIG_PATH, EconomyConfig, load_config
+from economy_recorder import KEY_DAYS, SAMPLING, SimulationRecorder, save_recordings
+from economy_replay import ACCURACY_METRICS, POOL_SIZE, Chart, ReplayAccuracy, accuracy_distribution
+from economy_simulator import PROFILES, EconomySimulator
+
+# Метрики траектории (последняя ось массивов)
+METRICS = ('money', 'reputation', 'beats_created', 'passive_share')
+PERCENTILES = (10, 50, 90)
+REPORT_DAYS = [1, 3, 7, 14, 21, 30, 45, 60]
+
+# Прогонов на одну задачу пула: меньше - больше накладных расходов на IPC
+CHUNK_SIZE = 250
+
+
+def run_seed(master_seed: int, profile_name: str, run: int) -> int:
+    """Seed прогона зависит только от master seed, профиля и номера прогона,
+    поэтому результат не зависит от числа воркеров и размера чанков"""
+    entropy = [master_seed, zlib.crc32(profile_name.encode('utf-8')), run]
+    return int(np.random.SeedSequence(entropy).generate_state(1, np.uint64)[0])
+
+
+def trajectory(recorder: SimulationRecorder) -> np.ndarray:
+    """Дневные снимки одного прогона -> массив (days, len(METRICS))"""
+    columns = recorder.columns()
+    total = columns['daily_total_active'] + columns['daily_total_passive']
+    share = np.divide(columns['daily_total_passive'], total, out=np.zeros(len(total)), where=total > 0)
+    return np.stack([columns['daily_money'], columns['daily_reputation'],
+                     columns['daily_beats_created'], share], axis=1).astype(np.float32)
+
+
+def record_path(record_dir: str, profile_name: str, runs: range) -> str:
+    return os.path.join(record_dir, f'{profile_name}_{runs.start:07d}.npz')
+
+
+def simulate_chunk(profile_name: str, days: int, master_seed: int, runs: range,
+                   config: EconomyConfig = None, record_dir: str = None, sampling: str = 'key_days',
+                   accuracy_pool: np.ndarray = None) -> np.ndarray:
+    """Прогоны runs одного профиля -> массив (len(runs), days, len(METRICS))
+
+    С record_dir записи прогонов чанка сохраняются колоночным .npz
+    (см. economy_recorder.save_recordings) с выборкой sampling. С
+    accuracy_pool точность битов тянется из пула точностей прогонов чарта.
+    """
+    profile = PROFILES[profile_name]
+    result = np.empty((len(runs), days, len(METRICS)), dtype=np.float32)
+    # Для перцентилей нужны все дни; ключевые дни отбираются при сохранении
+    recorder_sampling = 'sessions' if record_dir is not None and sampling == 'sessions' else 'daily'
+    recorders = []
+    for i, run in enumerate(runs):
+        seed = run_seed(master_seed, profile_name, run)
+        accuracy_source = ReplayAccuracy(accuracy_pool, [seed, 1]) if accuracy_pool is not None else None
+        simulator = EconomySimulator(profile, days=days, config=config, sampling=recorder_sampling, seed=seed,
+                                     accuracy_source=accuracy_source)
+        simulator.simulate(verbose=False)
+        result[i] = trajectory(simulator.recorder)
+        if record_dir is not None:
+            recorders.append(simulator.recorder)
+    if record_dir is not None:
+        save_recordings(recorders, record_path(record_dir, profile_name, runs), runs,
+                        KEY_DAYS if sampling == 'key_days' else None)
+    return result
+
+
+def run_population(profile_name: str, n_runs: int, master_seed: int = 0, days: int = 60,
+                   executor: Executor = None, chunk_size: int = CHUNK_SIZE,
+                   config: EconomyConfig = None, record_dir: str = None, sampling: str = 'key_days',
+                   chart: Chart = None, metric: str = 'hits') -> Dict:
+    """N независимых прогонов профиля, агрегированных в перцентили по дням.
+
+    Возвращает 'percentiles' (len(PERCENTILES), days, len(METRICS)) и
+    'final' (n_runs, len(METRICS)) - распределение на последний день.
+    Полные траектории не сохраняются. Без executor прогоны идут в текущем
+    процессе. config - скомпилированный конфиг экономики (по умолчанию
+    economy_config.json). С record_dir каждый чанк по готовности пишет
+    записи своих прогонов в record_dir/<профиль>_<первый прогон>.npz.
+    chart - точность битов из пула POOL_SIZE синтетических прогонов этого
+    чарта (метрика metric), отсуженного один раз на профиль.
+    """
+    start = time.perf_counter()
+    chunks = [range(lo, min(lo + chunk_size, n_runs)) for lo in range(0, n_runs, chunk_size)]
+    n = len(chunks)
+    accuracy_pool = None
+    if chart is not None:
+        accuracy_pool = accuracy_distribution(chart, PROFILES[profile_name].skill_level, POOL_SIZE,
+                                              [master_seed, zlib.crc32(profile_name.encode('utf-8'))], metric)
+    args = ([profile_name] * n, [days] * n, [master_seed] * n, chunks, [config] * n,
+            [record_dir] * n, [sampling] * n, [accuracy_pool] * n)
+    mapper = executor.map if executor is not None else map
+    trajectories = np.concatenate(list(mapper(simulate_chunk, *args)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'profile': profile_name,
+        'runs': n_runs,
+        'days': days,
+        'percentiles': np.percentile(trajectories, PERCENTILES, axis=0).astype(np.float32),
+        'final': trajectories[:, -1, :],
+        'elapsed': elapsed,
+        'runs_per_sec': n_runs / elapsed if elapsed > 0 else float('inf'),
+    }
+
+
+def save_population(results: List[Dict], filename: str, master_seed: int):
+    """Сохраняет перцентили и финальные распределения всех профилей в .npz"""
+    arrays = {
+        'metrics': np.array(METRICS),
+        'percentile_levels': np.array(PERCENTILES),
+        'profiles': np.array([r['profile'] for r in results]),
+        'runs': np.array([r['runs'] for r in results]),
+        'master_seed': np.array(master_seed),
+    }
+    for r in results:
+        arrays[f"{r['profile']}_percentiles"] = r['percentiles']
+        arrays[f"{r['profile']}_final"] = r['final']
+    np.savez_compressed(filename, **arrays)
+    print(f"\n✅ Результаты сохранены в {filename}")
+
+
+def print_population(result: Dict):
+    """Таблица p10/p50/p90 по ключевым дням"""
+    pct = result['percentiles']
+    print(f"\n{PROFILES[result['profile']].name}: {result['runs']} прогонов, "
+          f"{result['elapsed']:.1f}s ({result['runs_per_sec']:,.0f} прогонов/сек)")
+    header = '  '.join(f"{m + ' p10/p50/p90':>32}" for m in METRICS)
+    print(f"{'День':>5}  {header}")
+    for day in REPORT_DAYS:
+        if day > result['days']:
+            break
+        cells = []
+        for m, metric in enumerate(METRICS):
+            fmt = '.0%' if metric == 'passive_share' else ',.0f'
+            cells.append(f"{' / '.join(format(pct[p, day - 1, m], fmt) for p in range(len(PERCENTILES))):>32}")
+        print(f"{day:>5}  {'  '.join(cells)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('-n', '--runs', type=int, default=10_000, help='прогонов на профиль')
+    parser.add_argument('--seed', type=int, default=0, help='master seed всей популяции')
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='число процессов (по умолчанию - число ядер)')
+    parser.add_argument('-o', '--output', default='scripts/population_results.npz')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH, help='JSON-конфиг экономики')
+    parser.add_argument('--record-dir', help='сохранять записи прогонов колоночными .npz по чанкам')
+    parser.add_argument('--sampling', default='key_days', choices=SAMPLING,
+                        help='что записывать в --record-dir: ключевые дни, каждый день или и сессии')
+    parser.add_argument('--chart', help='битмап beatmap_analyzer.py: точность битов из отсуженных прогонов чарта')
+    parser.add_argument('--accuracy-metric', default='hits', choices=ACCURACY_METRICS,
+                        help='точность прогона чарта: доля попаданий или EX Score')
+    args = parser.parse_args()
+    config = load_config(args.config)
+    chart = Chart.load(args.chart) if args.chart else None
+    if args.record_dir:
+        os.makedirs(args.record_dir, exist_ok=True)
+
+    print("\n" + "="*80)
+    print(f"ПОПУЛЯЦИОННАЯ СИМУЛЯЦИЯ ({args.runs} прогонов на профиль, {args.days} дней, "
+          f"seed {args.seed}, конфиг {config.name})")
+    print("="*80)
+    if chart is not None:
+        print(f"🎯 Точность битов: прогоны чарта {args.chart} ({chart.n_notes} нот, метрика {args.accuracy_metric})")
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for profile_name in args.profiles:
+            result = run_population(profile_name, args.runs, args.seed, args.days, pool, config=config,
+                                    record_dir=args.record_dir, sampling=args.sampling, chart=chart,
+                                    metric=args.accuracy_metric)
+            results.append(result)
+            print_population(result)
+    wall = time.perf_counter() - start
+
+    total_runs = sum(r['runs'] for r in results)
+    print(f"\n🚀 Всего: {total_runs} прогонов за {wall:.1f}s ({total_runs / wall:,.0f} прогонов/сек)")
+    save_population(results, args.output, args.seed)
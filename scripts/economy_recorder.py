@@ -0,0 +1,186 @@
+"""
+Колоночная запись прогонов симулятора экономики: дневные снимки, сессии и
+покупки в заранее выделенных массивах вместо списков словарей
+"""
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from economy_config import DEFAULT_CONFIG, EconomyConfig
+
+# Ключевые дни отчётов
+KEY_DAYS = [1, 3, 7, 14, 21, 30, 45, 60]
+
+# Что записывать: только ключевые дни, каждый день или каждый день и каждую сессию
+SAMPLING = ('key_days', 'daily', 'sessions')
+
+DAILY_COLUMNS = {
+    'day': np.int16,
+    'money': np.float64,
+    'reputation': np.float64,
+    'beats_created': np.int32,
+    'passive_income_per_hour': np.float64,
+    'total_active': np.float64,
+    'total_passive': np.float64,
+}
+SESSION_COLUMNS = {
+    'day': np.int16,
+    'session': np.int8,
+    'minutes_since_last': np.int32,
+    'passive_income': np.float64,
+    'energy_before': np.float64,
+    'beats_created': np.int32,
+    'active_earnings': np.float64,
+    'energy_after': np.float64,
+    'money_after': np.float64,
+    'reputation': np.float64,
+}
+# Покупка: номер сессии в прогоне, апгрейд (индекс в config.upgrade_tables), новый уровень
+PURCHASE_COLUMNS = {
+    'session': np.int32,
+    'upgrade': np.int8,
+    'level': np.int8,
+}
+
+
+class SimulationRecorder:
+    """Снимки одного прогона EconomySimulator.
+
+    Строки пишутся в предвыделенные float64-таблицы (размер известен
+    заранее: число записываемых дней, сессий и уровней всех апгрейдов),
+    типизированные столбцы собираются только при выгрузке.
+    """
+
+    def __init__(self, profile, days: int, config: EconomyConfig = None, sampling: str = 'sessions',
+                 key_days: List[int] = KEY_DAYS):
+        if sampling not in SAMPLING:
+            raise ValueError(f"Неизвестный режим записи: {sampling} ({', '.join(SAMPLING)})")
+        self.config = config if config is not None else DEFAULT_CONFIG
+        self.sampling = sampling
+        self.equipment = list(self.config.equipment_cost)
+        self.artists = list(self.config.artist_cost)
+
+        recorded = [day for day in key_days if day <= days] if sampling == 'key_days' else range(1, days + 1)
+        self.record_day_flags = [False] * (days + 1)
+        for day in recorded:
+            self.record_day_flags[day] = True
+        self.daily = np.zeros((len(recorded), len(DAILY_COLUMNS) + len(self.equipment) + len(self.artists)))
+        self.n_days = 0
+
+        self.record_sessions = sampling == 'sessions'
+        n_sessions = 0
+        max_purchases = 0
+        if self.record_sessions:
+            n_sessions = sum(profile.get_session_count(day, self.config) for day in range(1, days + 1))
+            max_purchases = sum(len(costs) for _, _, costs, _ in self.config.upgrade_tables)
+        self.sessions = np.zeros((n_sessions, len(SESSION_COLUMNS)))
+        self.purchases = np.zeros((max_purchases, len(PURCHASE_COLUMNS)), dtype=np.int32)
+        self.n_sessions = 0
+        self.n_purchases = 0
+
+    def record_session(self, state, day: int, session: int, minutes_since_last: int, passive_income: float,
+                       energy_before: float, beats_created: int, active_earnings: float, purchases: List):
+        """Строка сессии (после покупок) и её покупки [(индекс апгрейда, новый уровень)]"""
+        if not self.record_sessions:
+            return
+        row = self.n_sessions
+        self.sessions[row] = (day, session, minutes_since_last, passive_income, energy_before,
+                              beats_created, active_earnings, state.energy, state.money, state.reputation)
+        for upgrade, level in purchases:
+            self.purchases[self.n_purchases] = (row, upgrade, level)
+            self.n_purchases += 1
+        self.n_sessions += 1
+
+    def record_day(self, state, day: int):
+        """Снимок конца дня, если день попадает в выборку"""
+        if not self.record_day_flags[day]:
+            return
+        self.daily[self.n_days] = (
+            day, state.money, state.reputation, state.beats_created,
+            state.get_passive_income_per_minute() * 60,
+            state.total_active_earnings, state.total_passive_earnings,
+            *state.levels,
+        )
+        self.n_days += 1
+
+    def columns(self, days: List[int] = None) -> Dict[str, np.ndarray]:
+        """Заполненные строки как типизированные столбцы: daily_*, session_*, purchase_*
+
+        days - оставить из дневных снимков только эти дни.
+        """
+        daily = self.daily[:self.n_days]
+        if days is not None:
+            daily = daily[np.isin(daily[:, 0], days)]
+        columns = {}
+        for prefix, table, n, spec in (('daily', daily, len(daily), DAILY_COLUMNS),
+                                       ('session', self.sessions, self.n_sessions, SESSION_COLUMNS),
+                                       ('purchase', self.purchases, self.n_purchases, PURCHASE_COLUMNS)):
+            for j, (name, dtype) in enumerate(spec.items()):
+                columns[f'{prefix}_{name}'] = table[:n, j].astype(dtype)
+        levels = daily[:, len(DAILY_COLUMNS):].astype(np.int8)
+        columns['daily_equipment'] = levels[:, :len(self.equipment)]
+        columns['daily_artists'] = levels[:, len(self.equipment):]
+        return columns
+
+    def daily_snapshots(self) -> List[Dict]:
+        """Дневные снимки в прежнем формате списка словарей (для JSON-отчёта)"""
+        columns = self.columns()
+        rows = zip(*(columns[f'daily_{name}'].tolist() for name in DAILY_COLUMNS),
+                   columns['daily_equipment'].tolist(), columns['daily_artists'].tolist())
+        snapshots = []
+        for *values, equipment, artists in rows:
+            snapshot = dict(zip(DAILY_COLUMNS, values))
+            totals = {key: snapshot.pop(key) for key in ('total_active', 'total_passive')}
+            snapshot['equipment'] = dict(zip(self.equipment, equipment))
+            snapshot['artists'] = dict(zip(self.artists, artists))
+            snapshot.update(totals)
+            snapshots.append(snapshot)
+        return snapshots
+
+    def session_log(self) -> List[Dict]:
+        """Лог сессий в прежнем формате: словарь на сессию, покупки - строки 'item L<уровень>'"""
+        columns = self.columns()
+        names = [item for _, item, _, _ in self.config.upgrade_tables]
+        bought = [[] for _ in range(self.n_sessions)]
+        for row, upgrade, level in zip(columns['purchase_session'].tolist(), columns['purchase_upgrade'].tolist(),
+                                       columns['purchase_level'].tolist()):
+            bought[row].append(f"{names[upgrade]} L{level}")
+
+        log = []
+        for values, upgrades in zip(zip(*(columns[f'session_{name}'].tolist() for name in SESSION_COLUMNS)), bought):
+            entry = dict(zip(SESSION_COLUMNS, values))
+            # Энергия дробная только при дробных восстановлении или цене бита
+            for key in ('energy_before', 'energy_after'):
+                if entry[key].is_integer():
+                    entry[key] = int(entry[key])
+            after = {key: entry.pop(key) for key in ('money_after', 'reputation')}
+            entry['upgrades_bought'] = upgrades
+            entry.update(after)
+            log.append(entry)
+        return log
+
+
+def save_recordings(recorders: List[SimulationRecorder], filename: str, runs: List[int] = None,
+                    days: List[int] = None):
+    """Записи нескольких прогонов в один колоночный .npz.
+
+    Столбцы прогонов склеиваются, номер прогона - в daily_run / session_run /
+    purchase_run (по умолчанию 0..len-1). days - сохранить дневные снимки
+    только за эти дни. Файл пишется атомарно.
+    """
+    runs = runs if runs is not None else range(len(recorders))
+    parts = [recorder.columns(days) for recorder in recorders]
+    arrays = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    for prefix, column in (('daily', 'daily_day'), ('session', 'session_day'), ('purchase', 'purchase_session')):
+        arrays[f'{prefix}_run'] = np.concatenate(
+            [np.full(len(part[column]), run, dtype=np.int32) for run, part in zip(runs, parts)])
+    config = recorders[0].config
+    arrays['equipment'] = np.array(recorders[0].equipment)
+    arrays['artists'] = np.array(recorders[0].artists)
+    arrays['upgrades'] = np.array([item for _, item, _, _ in config.upgrade_tables])
+    arrays['sampling'] = np.array('key_days' if days is not None else recorders[0].sampling)
+
+    with open(filename + '.tmp', 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(filename + '.tmp', filename)
@@ -0,0 +1,234 @@
+"""
+Судейство реплеев для симулятора экономики: пачка потоков нажатий против
+битмапа beatmap_analyzer.py разом через np.searchsorted, окна судейства -
+как в lib/beatoraja-timing.ts
+"""
+import json
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from economy_rng import RandomStream
+
+DEFAULT_CHART = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'SUNO_test', 'beatmap_normal.json')
+
+# Окна судейства в микросекундах (BEATORAJA_JUDGE_WINDOWS): |ошибка| <= окна;
+# дальше BAD нажатие игнорируется
+JUDGE_WINDOWS_US = np.array([16667, 33333, 116667, 250000])
+JUDGE_WINDOWS = JUDGE_WINDOWS_US / 1_000_000  # в секундах
+BAD_WINDOW = JUDGE_WINDOWS[-1]
+JUDGEMENTS = ('pgreat', 'great', 'good', 'bad', 'poor')
+# EX Score за суждение (calculateEXScore: PGREAT x 2 + GREAT)
+EX_POINTS = np.array([2, 1, 0, 0, 0])
+
+# Дорожки по типу ноты, как в lib/rhythm-plus-converter.ts (kick, snare, hat, tom)
+LANES = {'kick': 0, 'snare': 1, 'hihat': 2}
+OTHER_LANE = 3
+
+# Точность прогона для calculate_beat_price: доля PGREAT/GREAT/GOOD
+# (calculateSimpleAccuracy) или доля EX Score от максимума (calculateEXScoreRate)
+ACCURACY_METRICS = ('hits', 'ex')
+
+# Синтетический игрок по skill_level профиля (0.6-0.95): доля пропущенных
+# нот и разброс нажатий (нормальный, мс) растут с (1 - skill)
+MISS_RATE_PER_SKILL = 0.5
+SIGMA_MS_PER_SKILL = 150
+
+# Прогонов в одной пачке судейства: рабочие массивы пачки (~0.7 МБ на чарт
+# в 350 нот) остаются в кэше, большие пачки не быстрее
+BATCH_SIZE = 256
+# Прогонов в пуле точностей ReplayAccuracy на профиль
+POOL_SIZE = 16384
+
+
+class Chart:
+    """Ноты битмапа, разложенные по дорожкам на одну ось времени.
+
+    Нота дорожки lane со временем t лежит в точке lane * lane_span + t:
+    lane_span длиннее трека больше чем на два окна BAD, поэтому ближайшая
+    к нажатию нота (его ключ считается так же) всегда из его дорожки, и
+    все дорожки всех прогонов судятся одним searchsorted.
+    """
+
+    def __init__(self, times, lanes=None):
+        times = np.asarray(times, dtype=np.float64)
+        lanes = np.zeros(len(times), dtype=np.int64) if lanes is None else np.asarray(lanes, dtype=np.int64)
+        if len(times) == 0:
+            raise ValueError("В битмапе нет нот")
+        self.n_notes = len(times)
+        self.duration = float(times.max())
+        self.lane_span = np.ceil(self.duration) + 2.0 + 2 * BAD_WINDOW
+        keys = lanes * self.lane_span + times
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.times = times[order]
+        self.lanes = lanes[order]
+        self.padded_keys = np.concatenate([[-np.inf], self.keys, [np.inf]])
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CHART) -> 'Chart':
+        """Битмап beatmap_analyzer.py (JSON с notes[{time, type}])"""
+        with open(path, encoding='utf-8') as f:
+            notes = json.load(f)['notes']
+        return cls([note['time'] for note in notes], [LANES.get(note['type'], OTHER_LANE) for note in notes])
+
+    def input_keys(self, times: np.ndarray, lanes: np.ndarray = None) -> np.ndarray:
+        """Нажатия -> ключи на оси нот. Время обрезается до секунды за краями
+        трека: такие нажатия всё равно дальше BAD от любой ноты, а в ключах
+        не залезают в соседнюю дорожку"""
+        keys = np.clip(times, -1.0, self.duration + 1.0)
+        if lanes is not None:
+            keys += lanes * self.lane_span
+        return keys
+
+
+def judge(chart: Chart, times, lanes=None) -> np.ndarray:
+    """Пачка прогонов -> число суждений (n_runs, len(JUDGEMENTS)).
+
+    times - (n_runs, n_inputs) секунд от начала трека, потоки разной длины
+    добиваются NaN; lanes - дорожки нажатий той же формы (без них все в
+    дорожке 0). Как handleLaneHit: нажатия по времени, каждое судится по
+    ближайшей неотбитой ноте своей дорожки (при равенстве - по более
+    ранней), дальше окна BAD - не считается. Неотбитые ноты - POOR.
+    """
+    times = np.atleast_2d(np.asarray(times, dtype=np.float64))
+    n_runs, n_inputs = times.shape
+    keys = chart.input_keys(times, lanes)
+    # В строке по дорожкам, внутри дорожки по времени; NaN - в конце
+    keys.sort(axis=1)
+
+    # Ноты между часовыми -inf/+inf: у каждого нажатия есть сосед слева и справа
+    right = np.searchsorted(chart.padded_keys, keys)
+    np.minimum(right, chart.n_notes + 1, out=right)
+    to_left = keys - chart.padded_keys[right - 1]
+    to_right = chart.padded_keys[right] - keys
+    nearest = right - (to_left <= to_right)  # индекс в padded_keys, на 1 больше индекса ноты
+    errors = np.minimum(to_left, to_right)
+    # Нажатие, у которого и ближайшая нота дальше BAD, не отобьёт ничего
+    # (NaN - тоже): дальше судятся только остальные
+    presses = np.flatnonzero(errors <= BAD_WINDOW)
+    keys, right, nearest, errors = (a.ravel()[presses] for a in (keys, right, nearest, errors))
+    # Ноты прогона - в своём блоке плоского массива
+    offset = presses // n_inputs * (chart.n_notes + 2)
+
+    # Нажатие забирает ближайшую ноту среди не забранных более ранними
+    # нажатиями его дорожки (порядок в строке - порядок по времени). Проход
+    # пересчитывает выбор всех нажатий по выбору предыдущего прохода: после
+    # k проходов верны первые k нажатий каждой дорожки, а неподвижная точка -
+    # ровно последовательное судейство. Первый проход - ближайшие ноты; в
+    # следующих пересчитываются только нажатия, чью ближайшую ноту забрало
+    # более раннее, - их мало, и проходов - единицы
+    first = np.full(n_runs * (chart.n_notes + 2), n_runs * n_inputs)
+    choice, hit = nearest, np.ones(len(presses), dtype=bool)
+    while True:
+        claimed = offset[hit] + choice[hit]
+        np.minimum.at(first, claimed, presses[hit])
+        blocked = np.flatnonzero(first[offset + nearest] < presses)
+        blocked_offset, blocked_presses = offset[blocked], presses[blocked]
+        lo, hi = right[blocked] - 1, right[blocked]
+        for bound, step in ((lo, -1), (hi, 1)):
+            # Часовые -inf/+inf никем не забраны: сдвиг остановится на них
+            moving = np.flatnonzero(first[blocked_offset + bound] < blocked_presses)
+            while len(moving):
+                bound[moving] += step
+                moving = moving[first[blocked_offset[moving] + bound[moving]] < blocked_presses[moving]]
+        to_left = keys[blocked] - chart.padded_keys[lo]
+        to_right = chart.padded_keys[hi] - keys[blocked]
+        previous, choice = choice, nearest.copy()
+        choice[blocked] = np.where(to_left <= to_right, lo, hi)
+        hit_errors = errors.copy()
+        hit_errors[blocked] = np.minimum(to_left, to_right)
+        previous_hit, hit = hit, hit_errors <= BAD_WINDOW
+        if np.array_equal(hit, previous_hit) and np.array_equal(choice[hit], previous[hit]):
+            break
+        first[claimed] = n_runs * n_inputs
+
+    grades = np.searchsorted(JUDGE_WINDOWS, hit_errors[hit])
+    counts = np.bincount(presses[hit] // n_inputs * len(JUDGEMENTS) + grades,
+                         minlength=n_runs * len(JUDGEMENTS)).reshape(n_runs, len(JUDGEMENTS))
+    counts[:, -1] = chart.n_notes - counts[:, :-1].sum(axis=1)
+    return counts
+
+
+def accuracy(counts: np.ndarray, metric: str = 'hits') -> np.ndarray:
+    """Точность прогонов 0..1 из judge(): 'hits' - доля PGREAT/GREAT/GOOD,
+    'ex' - доля EX Score от максимума"""
+    total = counts.sum(axis=1)
+    if metric == 'hits':
+        scored = counts[:, :3].sum(axis=1)
+    elif metric == 'ex':
+        scored = counts @ EX_POINTS
+        total = total * 2
+    else:
+        raise ValueError(f"Неизвестная метрика точности: {metric} ({', '.join(ACCURACY_METRICS)})")
+    return np.divide(scored, total, out=np.zeros(len(total)), where=total > 0)
+
+
+def synthetic_inputs(chart: Chart, n_runs: int, skill: float, generator: np.random.Generator,
+                     bias_ms: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """n_runs потоков нажатий игрока со skill -> (times, lanes).
+
+    По нажатию на ноту в её дорожке с нормальной ошибкой (среднее bias_ms,
+    разброс SIGMA_MS_PER_SKILL * (1 - skill)); пропущенные ноты
+    (MISS_RATE_PER_SKILL * (1 - skill)) - NaN.
+    """
+    sigma = SIGMA_MS_PER_SKILL * (1 - skill) / 1000
+    times = generator.normal(bias_ms / 1000, sigma, (n_runs, chart.n_notes))
+    times += chart.times
+    times[generator.random((n_runs, chart.n_notes)) < MISS_RATE_PER_SKILL * (1 - skill)] = np.nan
+    return times, np.broadcast_to(chart.lanes, times.shape)
+
+
+def accuracy_distribution(chart: Chart, skill: float, n_runs: int, seed=None, metric: str = 'hits',
+                          batch_size: int = BATCH_SIZE) -> np.ndarray:
+    """Точности n_runs синтетических прогонов чарта игроком со skill.
+
+    Прогоны генерируются и судятся пачками по batch_size: память - на одну
+    пачку (n_runs x число нот), а не на все прогоны сразу.
+    """
+    generator = np.random.default_rng(seed)
+    result = np.empty(n_runs)
+    for lo in range(0, n_runs, batch_size):
+        times, lanes = synthetic_inputs(chart, min(batch_size, n_runs - lo), skill, generator)
+        result[lo:lo + len(times)] = accuracy(judge(chart, times, lanes), metric)
+    return result
+
+
+class ReplayAccuracy:
+    """Источник точности для EconomySimulator: выборка из точностей
+    отсуженных прогонов чарта (accuracy_distribution).
+
+    Прогоны одного чарта одним игроком независимы и одинаково
+    распределены, поэтому пул судится один раз на профиль, а каждый
+    симулятор тянет из него своим потоком RandomStream(seed): бит стоит
+    одного случайного индекса, а не прогона чарта. draw(n) - n следующих
+    точностей; состояние источника - состояние потока (пул не сохраняется).
+    Точности пула - в [0, 1]; create_beats ограничивает их, как и шум
+    skill_level, диапазоном [0.5, 1.0], поэтому 'ex' (у casual около 0.3)
+    у слабых игроков упирается в нижнюю границу.
+    """
+
+    def __init__(self, pool: np.ndarray, seed=None):
+        if len(pool) == 0:
+            raise ValueError("Пустой пул точностей")
+        self.pool = np.asarray(pool, dtype=np.float64)
+        self.stream = RandomStream(seed)
+
+    @classmethod
+    def from_chart(cls, chart: Chart, skill: float, seed=None, metric: str = 'hits',
+                   plays: int = POOL_SIZE) -> 'ReplayAccuracy':
+        """Пул из plays прогонов chart игроком со skill"""
+        return cls(accuracy_distribution(chart, skill, plays, [seed, 0] if seed is not None else None, metric),
+                   seed)
+
+    def draw(self, n: int) -> List[float]:
+        picks = (np.array(self.stream.randoms(n)) * len(self.pool)).astype(np.int64)
+        return self.pool[picks].tolist()
+
+    def getstate(self) -> dict:
+        return self.stream.getstate()
+
+    def setstate(self, state: dict):
+        self.stream.setstate(state)
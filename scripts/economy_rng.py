@@ -0,0 +1,73 @@
+"""
+Потоки случайных чисел симулятора экономики: numpy Generator с заранее
+вытянутыми блоками за интерфейсом random.Random
+"""
+from typing import List, Sequence
+
+import numpy as np
+
+# Чисел в одном блоке: ~32KB float64 на поток
+BLOCK_SIZE = 4096
+
+
+class RandomStream:
+    """Собственный поток прогона на numpy Generator (PCG64).
+
+    Повторяет ту часть random.Random, которой пользуется симулятор
+    (random, uniform, choice, getstate/setstate), и добавляет randoms(n) -
+    n чисел разом для быстрых путей. Числа тянутся из генератора блоками по
+    block_size и отдаются по одному из списка: uniform(a, b) = a + (b - a) * u
+    ровно как в random.Random. Независимые потоки для параллельных прогонов
+    - через разные seed (например, из SeedSequence).
+    """
+
+    def __init__(self, seed=None, block_size: int = BLOCK_SIZE):
+        self.generator = np.random.default_rng(seed)
+        self.block_size = block_size
+        self._block = []
+        self._pos = 0
+        self._block_state = self.generator.bit_generator.state
+
+    def _refill(self):
+        # Состояние генератора до блока + позиция в нём - компактное состояние потока
+        self._block_state = self.generator.bit_generator.state
+        self._block = self.generator.random(self.block_size).tolist()
+        self._pos = 0
+
+    def random(self) -> float:
+        if self._pos == len(self._block):
+            self._refill()
+        u = self._block[self._pos]
+        self._pos += 1
+        return u
+
+    def randoms(self, n: int) -> List[float]:
+        """n следующих чисел [0, 1) тем же порядком, что n вызовов random()"""
+        result = []
+        while n > 0:
+            if self._pos == len(self._block):
+                self._refill()
+            take = min(n, len(self._block) - self._pos)
+            result += self._block[self._pos:self._pos + take]
+            self._pos += take
+            n -= take
+        return result
+
+    def uniform(self, a: float, b: float) -> float:
+        return a + (b - a) * self.random()
+
+    def choice(self, seq: Sequence):
+        return seq[int(self.random() * len(seq))]
+
+    def getstate(self) -> dict:
+        return {'block_state': self._block_state, 'pos': self._pos,
+                'block_len': len(self._block), 'block_size': self.block_size}
+
+    def setstate(self, state: dict):
+        self.block_size = state['block_size']
+        self.generator.bit_generator.state = state['block_state']
+        self._block_state = state['block_state']
+        self._block = []
+        if state['block_len']:
+            self._refill()
+        self._pos = state['pos']
@@ -1,8 +1,20 @@
 import json
+import os
+from array import array
+from collections.abc import MutableMapping
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
+import heapq
 import random
 
+import numpy as np
+
+from economy_config import DEFAULT_CONFIG, EconomyConfig
+from economy_events import (ARTIST_UNLOCK, DAY_END, ENERGY_FULL, MINUTES_PER_DAY, OFFLINE_CAP,
+                            SESSION_START, EventQueue)
+from economy_recorder import KEY_DAYS, SimulationRecorder
+from economy_rng import RandomStream
+
 class PlayerProfile:
     """Профиль игрока с реалистичными паттернами поведения"""
     
@@ -11,27 +23,31 @@ class PlayerProfile:
         self.sessions_per_day = sessions_per_day
         self.skill_level = skill_level  # 0.6-0.95 (точность в ритм-игре)
         
-    def get_daily_sessions(self, day: int) -> List[int]:
+    def get_session_count(self, day: int, config: EconomyConfig = None) -> int:
+        """Число заходов в игру в данный день"""
+        config = config if config is not None else DEFAULT_CONFIG
+        # Burnout: интерес снижается со временем (по умолчанию - вдвое к 60 дню)
+        burnout_factor = max(config.burnout_floor, 1 - (day / config.burnout_days))
+        return max(1, int(self.sessions_per_day * burnout_factor))
+    
+    def get_daily_sessions(self, day: int, rng=random, config: EconomyConfig = None) -> List[int]:
         """Возвращает часы заходов в игру для данного дня"""
-        # Burnout: интерес снижается со временем
-        burnout_factor = max(0.5, 1 - (day / 120))  # Снижение к 60 дню
-        actual_sessions = max(1, int(self.sessions_per_day * burnout_factor))
+        actual_sessions = self.get_session_count(day, config)
         
         # Реалистичные часы заходов (не ночью)
-        available_hours = list(range(8, 24))  # 8:00 - 23:59
-        
         if actual_sessions == 1:
-            return [random.choice([9, 20])]  # Утро или вечер
-        elif actual_sessions == 2:
-            return [9, 20]  # Утро и вечер
-        elif actual_sessions == 3:
-            return [9, 14, 21]  # Утро, обед, вечер
-        elif actual_sessions == 4:
-            return [8, 13, 18, 22]
-        elif actual_sessions == 5:
-            return [8, 12, 15, 19, 22]
-        else:  # 6+
-            return [8, 11, 14, 17, 20, 23]
+            return [rng.choice(SINGLE_SESSION_HOURS)]  # Утро или вечер
+        return SESSION_HOURS[min(actual_sessions, 6)]
+
+# Часы заходов по числу сессий в день (8:00 - 23:59)
+SINGLE_SESSION_HOURS = [9, 20]  # одна сессия - утром или вечером, случайно
+SESSION_HOURS = {
+    2: [9, 20],  # Утро и вечер
+    3: [9, 14, 21],  # Утро, обед, вечер
+    4: [8, 13, 18, 22],
+    5: [8, 12, 15, 19, 22],
+    6: [8, 11, 14, 17, 20, 23],  # 6+
+}
 
 # Профили игроков
 PROFILES = {
@@ -40,64 +56,95 @@ PROFILES = {
     'hardcore': PlayerProfile('Hardcore', 6, 0.90)
 }
 
+class LevelView(MutableMapping):
+    """Уровни одной группы (оборудование или артисты) как словарь имя -> уровень
+    поверх общего массива уровней GameState: чтение и запись идут в массив"""
+    __slots__ = ('levels', 'slots')
+    
+    def __init__(self, levels: array, slots: Dict[str, int]):
+        self.levels = levels
+        self.slots = slots
+    
+    def __getitem__(self, item: str) -> int:
+        return self.levels[self.slots[item]]
+    
+    def __setitem__(self, item: str, level: int):
+        self.levels[self.slots[item]] = level
+    
+    def __delitem__(self, item: str):
+        raise TypeError("Набор предметов задаётся конфигом")
+    
+    def __iter__(self):
+        return iter(self.slots)
+    
+    def __len__(self) -> int:
+        return len(self.slots)
+    
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
 class GameState:
-    """Состояние игры"""
+    """Состояние игры
     
-    def __init__(self):
-        self.money = 800  # Стартовые деньги
+    Компактное: __slots__ вместо словаря атрибутов, уровни всех предметов -
+    в одном массиве array('b') (позиции - config.equipment_slots /
+    artist_slots). equipment и artists - словарные представления над ним.
+    """
+    __slots__ = ('config', 'money', 'reputation', 'energy', 'max_energy', 'levels',
+                 'beats_created', 'total_active_earnings', 'total_passive_earnings')
+    
+    def __init__(self, config: EconomyConfig = None):
+        # Цены, бонусы и доход по уровням - из скомпилированного конфига
+        self.config = config if config is not None else DEFAULT_CONFIG
+        self.money = self.config.start_money  # Стартовые деньги
         self.reputation = 0
-        self.energy = 100
-        self.max_energy = 100
-        
-        # Оборудование (уровни 0-5)
-        self.equipment = {
-            'phone': 0,
-            'headphones': 0,
-            'microphone': 0,
-            'computer': 0
-        }
+        self.energy = self.config.start_energy
+        self.max_energy = self.config.max_energy
         
-        # Артисты (уровни 0-5)
-        self.artists = {
-            'street_poet': 0,
-            'mc_flow': 0,
-            'lil_dreamer': 0,
-            'young_legend': 0
-        }
+        # Оборудование и артисты (уровни 0-max_level)
+        self.levels = array('b', bytes(len(self.config.upgrade_tables)))
         
         self.beats_created = 0
         self.total_active_earnings = 0
         self.total_passive_earnings = 0
+    
+    @property
+    def equipment(self) -> LevelView:
+        return LevelView(self.levels, self.config.equipment_slots)
+    
+    @equipment.setter
+    def equipment(self, levels: Dict[str, int]):
+        self.equipment.update(levels)
+    
+    @property
+    def artists(self) -> LevelView:
+        return LevelView(self.levels, self.config.artist_slots)
+    
+    @artists.setter
+    def artists(self, levels: Dict[str, int]):
+        self.artists.update(levels)
         
     def get_equipment_bonus(self) -> float:
         """Бонус от оборудования в %"""
         bonus = 0
-        bonus += self.equipment['phone'] * 5
-        bonus += self.equipment['headphones'] * 5
-        bonus += self.equipment['microphone'] * 10
-        bonus += self.equipment['computer'] * 15
+        bonus_table = self.config.equipment_bonus
+        levels = self.levels
+        for equipment_type, slot in self.config.equipment_slots.items():
+            bonus += bonus_table[equipment_type][levels[slot]]
         return bonus
     
     def get_passive_income_per_minute(self) -> float:
         """Пассивный доход в минуту"""
         income = 0
-        
-        # Street Poet: $5-20/мин
-        if self.artists['street_poet'] > 0:
-            income += 5 + (self.artists['street_poet'] - 1) * 3.75
-            
-        # MC Flow: $6-25/мин
-        if self.artists['mc_flow'] > 0:
-            income += 6 + (self.artists['mc_flow'] - 1) * 4.75
-            
-        # Lil Dreamer: $8-30/мин
-        if self.artists['lil_dreamer'] > 0:
-            income += 8 + (self.artists['lil_dreamer'] - 1) * 5.5
-            
-        # Young Legend: $12-50/мин (требует 400 репутации)
-        if self.artists['young_legend'] > 0 and self.reputation >= 400:
-            income += 12 + (self.artists['young_legend'] - 1) * 9.5
-            
+        income_table = self.config.artist_income
+        min_reputation = self.config.artist_min_reputation
+        levels = self.levels
+        for artist_type, slot in self.config.artist_slots.items():
+            level = levels[slot]
+            # Young Legend приносит доход только с 400 репутации
+            if level > 0 and self.reputation >= min_reputation[artist_type]:
+                income += income_table[artist_type][level]
         return income
     
     def calculate_beat_price(self, accuracy: float) -> Tuple[float, float, float]:
@@ -119,196 +166,343 @@ class GameState:
     
     def get_equipment_cost(self, equipment_type: str, current_level: int) -> float:
         """Стоимость следующего уровня оборудования"""
-        if current_level >= 5:
-            return float('inf')
-            
-        base_costs = {
-            'phone': 80,
-            'headphones': 120,
-            'microphone': 200,
-            'computer': 400
-        }
-        
-        base = base_costs[equipment_type]
-        multiplier = 1.4
-        
-        return base * (multiplier ** current_level)
+        costs = self.config.equipment_cost[equipment_type]
+        return costs[current_level] if current_level < len(costs) else float('inf')
     
     def get_artist_cost(self, artist_type: str, current_level: int) -> float:
         """Стоимость следующего уровня артиста"""
-        if current_level >= 5:
-            return float('inf')
-            
-        base_costs = {
-            'street_poet': 70,
-            'mc_flow': 80,
-            'lil_dreamer': 100,
-            'young_legend': 200
-        }
-        
-        base = base_costs[artist_type]
-        multiplier = 1.6
-        
-        return base * (multiplier ** current_level)
+        costs = self.config.artist_cost[artist_type]
+        return costs[current_level] if current_level < len(costs) else float('inf')
     
     def can_afford_artist(self, artist_type: str) -> bool:
         """Проверяет, может ли игрок купить артиста"""
-        if artist_type == 'young_legend' and self.reputation < 400:
-            return False
-        return True
+        return self.reputation >= self.config.artist_min_reputation[artist_type]
+    
+    def snapshot(self) -> np.ndarray:
+        """Состояние одним float64-вектором: деньги, репутация, итоги, энергия, биты, уровни"""
+        return np.array([self.money, self.reputation, self.total_active_earnings, self.total_passive_earnings,
+                         self.energy, self.max_energy, self.beats_created, *self.levels], dtype=np.float64)
+    
+    def restore(self, snapshot: np.ndarray):
+        """Обратно к snapshot(); целые значения возвращаются int, энергия с
+        дробной частью (её может дать конфиг) - как сохранена"""
+        values = snapshot.tolist()
+        (self.money, self.reputation, self.total_active_earnings,
+         self.total_passive_earnings) = values[:4]
+        self.energy, self.max_energy = (int(v) if v.is_integer() else v for v in values[4:6])
+        self.beats_created = int(values[6])
+        self.levels = array('b', (int(v) for v in values[7:]))
+
 
 class EconomySimulator:
     """Симулятор экономики игры"""
     
-    def __init__(self, profile: PlayerProfile, days: int = 60):
+    def __init__(self, profile: PlayerProfile, days: int = 60, rng: random.Random = None,
+                 config: EconomyConfig = None, sampling: str = 'sessions', seed=None, accuracy_source=None):
         self.profile = profile
         self.days = days
-        self.state = GameState()
-        self.log = []
-        self.daily_snapshots = []
-        
-    def simulate_session(self, day: int, session: int, minutes_since_last: int) -> Dict:
-        """Симулирует одну игровую сессию"""
-        session_log = {
-            'day': day,
-            'session': session,
-            'minutes_since_last': minutes_since_last
+        # Источник случайности: собственный поток RandomStream(seed) на numpy
+        # Generator; можно передать и любой объект с интерфейсом random.Random
+        self.rng = rng if rng is not None else RandomStream(seed)
+        self.config = config if config is not None else DEFAULT_CONFIG
+        # Точность битов: skill_level профиля +- 0.05 или, с accuracy_source,
+        # точности отсуженных прогонов чарта (economy_replay.ReplayAccuracy)
+        self.accuracy_source = accuracy_source
+        self.state = GameState(self.config)
+        # Снимки пишутся в колоночный рекордер; sampling - что записывать
+        # ('key_days', 'daily' или 'sessions' - каждый день и каждую сессию)
+        self.recorder = SimulationRecorder(profile, days, self.config, sampling)
+        self.events = EventQueue()
+        self.handlers = {}
+        self.sessions_played = 0
+        self.unlocked = set()
+        self.last_session_time = 0
+        self.started = False
+    
+    def save_checkpoint(self, filename: str):
+        """Компактный снимок середины прогона в .npz: состояние игры, поток rng,
+        очередь событий и заполненные строки рекордера. Пишется атомарно.
+        
+        Подписчики (on) не сохраняются - после load_checkpoint их подписывают
+        заново; данные своих событий в очереди должны сериализоваться в JSON.
+        """
+        rng_type = 'stream' if isinstance(self.rng, RandomStream) else 'random'
+        meta = {
+            'profile': [self.profile.name, self.profile.sessions_per_day, self.profile.skill_level],
+            'days': self.days,
+            'sampling': self.recorder.sampling,
+            'config': self.config.raw,
+            'config_name': self.config.name,
+            'rng': [rng_type, self.rng.getstate()],
+            'accuracy': self.accuracy_source.getstate() if self.accuracy_source is not None else None,
+            'events': [self.events.heap, self.events._seq, self.events.now],
+            'clock': [self.started, self.last_session_time, self.sessions_played, sorted(self.unlocked)],
+            'recorder': [self.recorder.n_days, self.recorder.n_sessions, self.recorder.n_purchases],
         }
-        
+        recorder = self.recorder
+        with open(filename + '.tmp', 'wb') as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), state=self.state.snapshot(),
+                                daily=recorder.daily[:recorder.n_days],
+                                sessions=recorder.sessions[:recorder.n_sessions],
+                                purchases=recorder.purchases[:recorder.n_purchases])
+        os.replace(filename + '.tmp', filename)
+    
+    @classmethod
+    def load_checkpoint(cls, filename: str, seed=None, accuracy_source=None) -> 'EconomySimulator':
+        """Симулятор из save_checkpoint; simulate() продолжит с места остановки.
+        
+        seed - ответвление: продолжить с того же состояния на новом потоке
+        RandomStream(seed) вместо сохранённого. accuracy_source - источник
+        точности того же вида, что был у прогона (чарт и skill не
+        сохраняются); без seed его позиция восстанавливается из чекпоинта.
+        """
+        with np.load(filename) as checkpoint:
+            meta = json.loads(checkpoint['meta'].item())
+            arrays = {name: checkpoint[name] for name in ('state', 'daily', 'sessions', 'purchases')}
+        
+        rng_type, rng_state = meta['rng']
+        if seed is not None:
+            rng = RandomStream(seed)
+        elif rng_type == 'stream':
+            rng = RandomStream()
+            rng.setstate(rng_state)
+        else:
+            rng = random.Random()
+            version, internal, gauss = rng_state
+            rng.setstate((version, tuple(internal), gauss))
+        
+        simulator = cls(PlayerProfile(*meta['profile']), meta['days'], rng,
+                        EconomyConfig(meta['config'], meta['config_name']), meta['sampling'],
+                        accuracy_source=accuracy_source)
+        if accuracy_source is not None and seed is None and meta.get('accuracy') is not None:
+            accuracy_source.setstate(meta['accuracy'])
+        simulator.state.restore(arrays['state'])
+        
+        heap, seq, now = meta['events']
+        # JSON превращает кортежи данных событий в списки
+        simulator.events.heap = [(time, order, kind, tuple(data) if isinstance(data, list) else data)
+                                 for time, order, kind, data in heap]
+        simulator.events._seq = seq
+        simulator.events.now = now
+        started, simulator.last_session_time, simulator.sessions_played, unlocked = meta['clock']
+        simulator.started = started
+        simulator.unlocked = set(unlocked)
+        
+        recorder = simulator.recorder
+        recorder.n_days, recorder.n_sessions, recorder.n_purchases = meta['recorder']
+        recorder.daily[:recorder.n_days] = arrays['daily']
+        recorder.sessions[:recorder.n_sessions] = arrays['sessions']
+        recorder.purchases[:recorder.n_purchases] = arrays['purchases']
+        return simulator
+    
+    @property
+    def log(self) -> List[Dict]:
+        """Лог сессий (словарь на сессию), собранный из рекордера"""
+        return self.recorder.session_log()
+    
+    @property
+    def daily_snapshots(self) -> List[Dict]:
+        """Дневные снимки, собранные из рекордера"""
+        return self.recorder.daily_snapshots()
+        
+    def create_beats(self) -> Tuple[int, float]:
+        """Тратит энергию на биты; возвращает (число битов, заработок)
+        
+        Быстрый путь цикла "пока хватает энергии на бит": число битов известно
+        заранее (energy // beat_energy), бонус оборудования до покупок не меняется и считается
+        один раз, суммы копятся в локальных переменных. Точности тянутся из
+        rng в том же порядке (или разом из accuracy_source), цена и
+        репутация - по формулам calculate_beat_price, поэтому результат
+        совпадает до последнего бита.
+        """
+        state = self.state
+        beat_energy = self.config.beat_energy
+        beats = int(state.energy // beat_energy)
+        skill = self.profile.skill_level
+        if self.accuracy_source is not None:
+            # Точности прогонов чарта в [0, 1] ограничиваются тем же [0.5, 1.0]:
+            # метрика 'ex' у слабых игроков дала бы биты дешевле любого шума
+            accuracies = self.accuracy_source.draw(beats)
+            clip = True
+        else:
+            # Шум точности: у RandomStream - срезом заранее вытянутого блока,
+            # значения те же, что дали бы beats вызовов uniform(-0.05, 0.05)
+            if hasattr(self.rng, 'randoms'):
+                noise = [-0.05 + (0.05 - -0.05) * u for u in self.rng.randoms(beats)]
+            else:
+                uniform = self.rng.uniform
+                noise = [uniform(-0.05, 0.05) for _ in range(beats)]
+            accuracies = [skill + shift for shift in noise]
+            # uniform не выходит за [-0.05, 0.05]: если весь диапазон точности
+            # внутри [0.5, 1.0], ограничение ничего не меняет
+            clip = not (0.5 <= skill - 0.05 and skill + 0.05 <= 1.0)
+        quality_multiplier = 1 + state.get_equipment_bonus() / 100
+        
+        money = state.money
+        reputation = state.reputation
+        total_active = state.total_active_earnings
+        earnings = 0
+        for accuracy in accuracies:
+            if clip:
+                accuracy = max(0.5, min(1.0, accuracy))
+            final_quality = (50 + (accuracy * 50)) * quality_multiplier
+            price = 50 + (final_quality * 2)
+            money += price
+            reputation += final_quality * 0.15
+            earnings += price
+            total_active += price
+        
+        state.money = money
+        state.reputation = reputation
+        state.total_active_earnings = total_active
+        state.energy -= beats * beat_energy
+        state.beats_created += beats
+        return beats, earnings
+    
+    def buy_upgrades(self) -> List[Tuple[int, int]]:
+        """Жадно покупает самые выгодные апгрейды, пока хватает денег;
+        возвращает покупки [(индекс в upgrade_tables, новый уровень)]
+        
+        Ценность апгрейда (прирост бонуса или дохода / стоимость) зависит
+        только от его уровня, а деньги во время покупок только убывают.
+        Поэтому кандидаты лежат в куче по ценности: апгрейд на вершине, на
+        который не хватает денег, не станет доступен до конца сессии и
+        выбрасывается, а после покупки в кучу кладётся только следующий
+        уровень купленного. При равной ценности побеждает апгрейд, раньше
+        стоящий в upgrade_tables конфига - как при переборе по порядку.
+        """
+        state = self.state
+        upgrade_tables = self.config.upgrade_tables
+        # Индекс апгрейда в upgrade_tables - это и позиция его уровня в state.levels
+        levels = state.levels
+        heap = []
+        for index, (kind, item, costs, values) in enumerate(upgrade_tables):
+            if kind == 'artist' and not state.can_afford_artist(item):
+                continue
+            level = levels[index]
+            if level < len(costs):
+                heap.append((-values[level], index))
+        heapq.heapify(heap)
+        
+        purchases = []
+        while heap:
+            _, index = heapq.heappop(heap)
+            _, _, costs, values = upgrade_tables[index]
+            level = levels[index]
+            if costs[level] > state.money:
+                continue
+            
+            state.money -= costs[level]
+            level += 1
+            levels[index] = level
+            purchases.append((index, level))
+            if level < len(costs):
+                heapq.heappush(heap, (-values[level], index))
+        
+        return purchases
+    
+    def simulate_session(self, day: int, session: int, minutes_since_last: int):
+        """Симулирует одну игровую сессию"""
         # 1. Собираем оффлайн-доход (макс 4 часа)
-        offline_minutes = min(minutes_since_last, 240)
+        offline_minutes = min(minutes_since_last, self.config.offline_cap_minutes)
         passive_income = self.state.get_passive_income_per_minute() * offline_minutes
         self.state.money += passive_income
         self.state.total_passive_earnings += passive_income
         
         # 2. Восстанавливаем энергию (1/мин)
-        self.state.energy = min(self.state.max_energy, self.state.energy + minutes_since_last)
-        
-        session_log['passive_income'] = passive_income
-        session_log['energy_before'] = self.state.energy
+        regen = minutes_since_last * self.config.energy_regen_per_minute
+        self.state.energy = min(self.state.max_energy, self.state.energy + regen)
+        energy_before = self.state.energy
         
         # 3. Создаем биты (пока есть энергия)
-        beats_this_session = 0
-        active_earnings = 0
-        
-        while self.state.energy >= 20:
-            # Создаем бит
-            accuracy = self.profile.skill_level + random.uniform(-0.05, 0.05)
-            accuracy = max(0.5, min(1.0, accuracy))
-            
-            price, quality, reputation = self.state.calculate_beat_price(accuracy)
-            
-            self.state.money += price
-            self.state.reputation += reputation
-            self.state.energy -= 20
-            self.state.beats_created += 1
-            beats_this_session += 1
-            active_earnings += price
-            self.state.total_active_earnings += price
-        
-        session_log['beats_created'] = beats_this_session
-        session_log['active_earnings'] = active_earnings
-        session_log['energy_after'] = self.state.energy
+        beats_this_session, active_earnings = self.create_beats()
         
         # 4. Покупаем апгрейды (жадный алгоритм - самое выгодное)
-        upgrades_bought = []
+        purchases = self.buy_upgrades()
         
-        while True:
-            best_upgrade = None
-            best_value = 0
-            
-            # Проверяем оборудование
-            for eq_type in self.state.equipment:
-                level = self.state.equipment[eq_type]
-                cost = self.state.get_equipment_cost(eq_type, level)
-                
-                if cost <= self.state.money and cost != float('inf'):
-                    # Ценность = бонус / стоимость
-                    bonus = 5 if eq_type in ['phone', 'headphones'] else (10 if eq_type == 'microphone' else 15)
-                    value = bonus / cost
-                    
-                    if value > best_value:
-                        best_value = value
-                        best_upgrade = ('equipment', eq_type, cost)
-            
-            # Проверяем артистов
-            for artist_type in self.state.artists:
-                if not self.state.can_afford_artist(artist_type):
-                    continue
-                    
-                level = self.state.artists[artist_type]
-                cost = self.state.get_artist_cost(artist_type, level)
-                
-                if cost <= self.state.money and cost != float('inf'):
-                    # Ценность = доход в минуту / стоимость
-                    income_increase = {
-                        'street_poet': 3.75,
-                        'mc_flow': 4.75,
-                        'lil_dreamer': 5.5,
-                        'young_legend': 9.5
-                    }[artist_type]
-                    
-                    value = income_increase / cost
-                    
-                    if value > best_value:
-                        best_value = value
-                        best_upgrade = ('artist', artist_type, cost)
-            
-            # Покупаем лучший апгрейд
-            if best_upgrade:
-                upgrade_type, item, cost = best_upgrade
-                self.state.money -= cost
-                
-                if upgrade_type == 'equipment':
-                    self.state.equipment[item] += 1
-                    upgrades_bought.append(f"{item} L{self.state.equipment[item]}")
-                else:
-                    self.state.artists[item] += 1
-                    upgrades_bought.append(f"{item} L{self.state.artists[item]}")
-            else:
-                break
-        
-        session_log['upgrades_bought'] = upgrades_bought
-        session_log['money_after'] = self.state.money
-        session_log['reputation'] = self.state.reputation
-        
-        return session_log
+        self.recorder.record_session(self.state, day, session, minutes_since_last, passive_income,
+                                     energy_before, beats_this_session, active_earnings, purchases)
     
-    def simulate(self) -> Dict:
-        """Симулирует полный период игры"""
-        print(f"Симуляция {self.profile.name}...", end=" ", flush=True)
-        
-        last_session_time = 0
-        report_days = [1, 3, 7, 14, 21, 30, 45, 60]
-        
-        for day in range(1, self.days + 1):
-            sessions = self.profile.get_daily_sessions(day)
-            
-            for session_idx, hour in enumerate(sessions):
-                current_time = (day - 1) * 24 * 60 + hour * 60
-                minutes_since_last = current_time - last_session_time if last_session_time > 0 else 0
-                
-                session_log = self.simulate_session(day, session_idx + 1, minutes_since_last)
-                self.log.append(session_log)
+    def on(self, kind: str, handler: Callable):
+        """Подписывает handler(simulator, time, data) на события вида kind.
+        
+        Производные события (ENERGY_FULL, OFFLINE_CAP, ARTIST_UNLOCK)
+        планируются только при наличии подписчика; свои события
+        (например, временные акции) ставятся через self.events.schedule.
+        """
+        self.handlers.setdefault(kind, []).append(handler)
+    
+    def schedule_day(self, day: int):
+        """Ставит в очередь сессии дня (часы заходов тянутся из rng здесь)"""
+        hours = self.profile.get_daily_sessions(day, self.rng, self.config)
+        for session_idx, hour in enumerate(hours):
+            time = (day - 1) * MINUTES_PER_DAY + hour * 60
+            self.events.schedule(time, SESSION_START, (day, session_idx + 1, session_idx == len(hours) - 1))
+    
+    def schedule_derived_events(self, time: int):
+        """Производные события после сессии - только для тех, на кого подписаны"""
+        state = self.state
+        horizon = self.days * MINUTES_PER_DAY
+        if ENERGY_FULL in self.handlers and state.energy < state.max_energy:
+            regen = self.config.energy_regen_per_minute
+            full_at = time - (-(state.max_energy - state.energy) // regen)
+            if full_at <= horizon:
+                self.events.schedule(full_at, ENERGY_FULL, self.sessions_played)
+        if OFFLINE_CAP in self.handlers and time + self.config.offline_cap_minutes <= horizon:
+            self.events.schedule(time + self.config.offline_cap_minutes, OFFLINE_CAP, self.sessions_played)
+        if ARTIST_UNLOCK in self.handlers:
+            for artist, min_reputation in self.config.artist_min_reputation.items():
+                if min_reputation > 0 and artist not in self.unlocked and state.reputation >= min_reputation:
+                    self.unlocked.add(artist)
+                    self.events.schedule(time, ARTIST_UNLOCK, artist)
+    
+    def simulate(self, verbose: bool = True, until_day: int = None) -> Dict:
+        """Симулирует полный период игры (или до конца дня until_day)
+        
+        Часы событийные: в очереди лежат начала сессий и концы дней, которые
+        пишет рекордер, симуляция прыгает от события к событию. Сессии
+        следующего дня планируются после последней сессии текущего - rng
+        тянется в том же порядке, что и при обходе дней по порядку.
+        Остановленную на until_day симуляцию продолжает следующий вызов
+        simulate или восстановление из save_checkpoint.
+        """
+        if verbose:
+            print(f"Симуляция {self.profile.name}...", end=" ", flush=True)
+        
+        if not self.started:
+            self.started = True
+            self.schedule_day(1)
+            for day in range(1, self.days + 1):
+                if self.recorder.record_day_flags[day]:
+                    self.events.schedule(day * MINUTES_PER_DAY, DAY_END, day)
+        stop = until_day * MINUTES_PER_DAY if until_day is not None else float('inf')
+        
+        while self.events and self.events.next_time() <= stop:
+            time, kind, data = self.events.pop()
+            if kind == SESSION_START:
+                day, session, last_of_day = data
+                minutes_since_last = time - self.last_session_time if self.last_session_time > 0 else 0
+                self.simulate_session(day, session, minutes_since_last)
+                self.sessions_played += 1
+                self.last_session_time = time
+                if self.handlers:
+                    self.schedule_derived_events(time)
                 
-                last_session_time = current_time
-            
-            self.daily_snapshots.append({
-                'day': day,
-                'money': self.state.money,
-                'reputation': self.state.reputation,
-                'beats_created': self.state.beats_created,
-                'passive_income_per_hour': self.state.get_passive_income_per_minute() * 60,
-                'equipment': dict(self.state.equipment),
-                'artists': dict(self.state.artists),
-                'total_active': self.state.total_active_earnings,
-                'total_passive': self.state.total_passive_earnings
-            })
-            
-            if day % 10 == 0:
-                print(f"{day}д", end=" ", flush=True)
+                if last_of_day:
+                    if day < self.days:
+                        self.schedule_day(day + 1)
+                    if verbose and day % 10 == 0:
+                        print(f"{day}д", end=" ", flush=True)
+            elif kind == DAY_END:
+                self.recorder.record_day(self.state, data)
+            elif kind in (ENERGY_FULL, OFFLINE_CAP) and data != self.sessions_played:
+                continue  # устарело: после планирования была новая сессия
+            else:
+                for handler in self.handlers.get(kind, ()):
+                    handler(self, time, data)
         
-        print("✓")
+        if verbose:
+            print("✓")
         
         return {
             'profile': self.profile.name,
@@ -317,16 +511,20 @@ class EconomySimulator:
             'beats_created': self.state.beats_created,
             'total_active_earnings': self.state.total_active_earnings,
             'total_passive_earnings': self.state.total_passive_earnings,
-            'equipment': self.state.equipment,
-            'artists': self.state.artists,
-            'daily_snapshots': self.daily_snapshots
+            'equipment': dict(self.state.equipment),
+            'artists': dict(self.state.artists),
+            'recorder': self.recorder
         }
 
 # Функции для сохранения результатов
 def save_results_to_json(results: List[Dict], filename: str = "simulation_results.json"):
-    """Сохраняет результаты в JSON файл"""
+    """Сохраняет результаты в JSON файл (дневные снимки - из рекордера)"""
+    report = []
+    for result in results:
+        report.append({key: value for key, value in result.items() if key != 'recorder'})
+        report[-1]['daily_snapshots'] = result['recorder'].daily_snapshots()
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+        json.dump(report, f, indent=2, ensure_ascii=False)
     print(f"\n✅ Результаты сохранены в {filename}")
 
 def save_results_to_markdown(results: List[Dict], filename: str = "SIMULATION_REPORT.md"):
@@ -375,15 +573,17 @@ def save_results_to_markdown(results: List[Dict], filename: str = "SIMULATION_RE
                 f.write(f"- **{artist}:** Level {level}/5\n")
             
             # График прогрессии по ключевым дням
-            if 'daily_snapshots' in result:
+            if 'recorder' in result:
                 f.write("\n### Прогрессия по дням\n\n")
                 f.write("| День | Деньги | Репутация | Биты | Пассивный доход/час |\n")
                 f.write("|------|--------|-----------|------|---------------------|\n")
                 
-                key_days = [1, 3, 7, 14, 21, 30, 45, 60]
-                for snapshot in result['daily_snapshots']:
-                    if snapshot['day'] in key_days:
-                        f.write(f"| {snapshot['day']} | ${snapshot['money']:,.0f} | {snapshot['reputation']:.0f} | {snapshot['beats_created']} | ${snapshot['passive_income_per_hour']:.0f} |\n")
+                columns = result['recorder'].columns()
+                key_rows = np.isin(columns['daily_day'], KEY_DAYS)
+                for day, money, reputation, beats, passive in zip(*(
+                        columns[f'daily_{name}'][key_rows].tolist()
+                        for name in ('day', 'money', 'reputation', 'beats_created', 'passive_income_per_hour'))):
+                    f.write(f"| {day} | ${money:,.0f} | {reputation:.0f} | {beats} | ${passive:.0f} |\n")
         
         # Выводы и проблемы
         f.write("\n---\n\n## Выявленные проблемы\n\n")
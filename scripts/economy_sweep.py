@@ -0,0 +1,225 @@
+"""
+Перебор параметров экономики: сетка или латинский гиперкуб поверх конфига,
+каждая точка x каждый профиль на векторизованном движке. Результаты пишутся
+чанками .npz по мере готовности, прерванный перебор продолжается с места остановки
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from economy_config import DEFAULT_CONFIG_PATH, EconomyConfig, with_overrides
+from economy_population import METRICS, PERCENTILES, REPORT_DAYS, run_seed
+from economy_simulator import PROFILES
+from economy_vectorized import VectorizedEconomy
+
+# Точек на одну задачу пула и игроков векторизованного движка на точку
+CHUNK_SIZE = 20
+PLAYERS = 1000
+PROGRESS_INTERVAL = 10  # секунд между строками прогресса
+
+
+def sample_points(spec: Dict) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Точки перебора из спецификации: (имена параметров, значения (N, d), целочисленность (d,)).
+
+    method 'grid' - декартово произведение списков значений,
+    'lhs' - латинский гиперкуб из samples точек в границах [lo, hi].
+    Параметр целочисленный, если все его значения (или обе границы) - целые.
+    """
+    params = spec['parameters']
+    names = list(params)
+    integer = np.array([all(isinstance(v, int) for v in params[name]) for name in names])
+
+    if spec['method'] == 'grid':
+        values = np.array(list(itertools.product(*params.values())), dtype=float)
+    elif spec['method'] == 'lhs':
+        # По каждой оси n страт в случайном порядке, точка - случайно внутри страты
+        n = spec['samples']
+        rng = np.random.default_rng(spec.get('seed', 0))
+        strata = np.argsort(rng.random((len(names), n)), axis=1).T
+        unit = (strata + rng.random((n, len(names)))) / n
+        lo, hi = np.array([params[name] for name in names], dtype=float).T
+        values = lo + unit * (hi - lo)
+        values[:, integer] = np.round(values[:, integer])
+    else:
+        raise ValueError(f"Неизвестный метод перебора: {spec['method']} (grid или lhs)")
+    return names, values, integer
+
+
+def point_overrides(names: List[str], integer: np.ndarray, row: np.ndarray) -> Dict[str, float]:
+    return {name: int(v) if is_int else float(v) for name, is_int, v in zip(names, integer, row)}
+
+
+def report_days(days: int) -> List[int]:
+    return sorted({day for day in REPORT_DAYS if day <= days} | {days})
+
+
+def evaluate_chunk(base_raw: Dict, names: List[str], integer: np.ndarray, values: np.ndarray,
+                   profiles: List[str], players: int, days: int, master_seed: int) -> Dict[str, np.ndarray]:
+    """Точки values всех профилей -> {профиль: (len(values), len(PERCENTILES), len(дней), len(METRICS))}
+
+    Seed профиля одинаков для всех точек (общие случайные числа): разница
+    между точками - эффект параметров, а не шум.
+    """
+    day_index = [day - 1 for day in report_days(days)]
+    result = {name: np.empty((len(values), len(PERCENTILES), len(day_index), len(METRICS)), dtype=np.float32)
+              for name in profiles}
+    for i, row in enumerate(values):
+        config = EconomyConfig(with_overrides(base_raw, point_overrides(names, integer, row)))
+        for profile_name in profiles:
+            seed = run_seed(master_seed, profile_name, 0)
+            economy = VectorizedEconomy(profile_name, players, days, seed, config)
+            result[profile_name][i] = economy.simulate()['percentiles'][:, day_index]
+    return result
+
+
+def chunk_path(output_dir: str, start: int) -> str:
+    return os.path.join(output_dir, f'chunk_{start:07d}.npz')
+
+
+def save_chunk(output_dir: str, start: int, arrays: Dict[str, np.ndarray]):
+    """Пишет чанк атомарно: недописанный файл не будет принят за готовый при продолжении"""
+    path = chunk_path(output_dir, start)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(path + '.tmp', path)
+
+
+def prepare_sweep(spec: Dict, output_dir: str, base_raw: Dict, profiles: List[str], players: int,
+                  days: int, master_seed: int, chunk_size: int) -> Dict:
+    """Создаёт папку перебора (sweep.json + points.npz) или проверяет, что
+    существующая создана с теми же настройками"""
+    manifest = {'spec': spec, 'base_config': base_raw, 'profiles': profiles, 'players': players,
+                'days': days, 'master_seed': master_seed, 'chunk_size': chunk_size}
+    manifest_path = os.path.join(output_dir, 'sweep.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            existing = json.load(f)
+        if existing != manifest:
+            raise ValueError(f"{output_dir} содержит перебор с другими настройками - "
+                             f"выберите другую папку или удалите её")
+        return manifest
+
+    names, values, integer = sample_points(spec)
+    # Ошибка в имени параметра должна всплыть до запуска, а не в воркере
+    EconomyConfig(with_overrides(base_raw, point_overrides(names, integer, values[0])))
+    os.makedirs(output_dir, exist_ok=True)
+    np.savez(os.path.join(output_dir, 'points.npz'), names=np.array(names), values=values, integer=integer)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def load_points(output_dir: str) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    with np.load(os.path.join(output_dir, 'points.npz')) as points:
+        return points['names'].tolist(), points['values'], points['integer']
+
+
+def run_sweep(spec: Dict, output_dir: str, base_raw: Dict, profiles: List[str], players: int = PLAYERS,
+              days: int = 60, master_seed: int = 0, workers: int = None, chunk_size: int = CHUNK_SIZE):
+    """Считает все ещё не готовые чанки перебора в пуле процессов"""
+    manifest = prepare_sweep(spec, output_dir, base_raw, profiles, players, days, master_seed, chunk_size)
+    names, values, integer = load_points(output_dir)
+    starts = range(0, len(values), chunk_size)
+    pending = [start for start in starts if not os.path.exists(chunk_path(output_dir, start))]
+    done = len(values) - sum(len(values[start:start + chunk_size]) for start in pending)
+
+    print(f"🔍 {len(values)} точек x {len(profiles)} профилей, {players} игроков на точку: "
+          f"готово {done}, осталось {len(values) - done}")
+    if not pending:
+        return manifest
+
+    start_time = last_report = time.perf_counter()
+    computed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(evaluate_chunk, base_raw, names, integer, values[start:start + chunk_size],
+                        profiles, players, days, master_seed): start
+            for start in pending
+        }
+        try:
+            for future in as_completed(futures):
+                start = futures[future]
+                save_chunk(output_dir, start, future.result())
+                computed += len(values[start:start + chunk_size])
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL or computed + done == len(values):
+                    last_report = now
+                    rate = computed / (now - start_time)
+                    eta = (len(values) - done - computed) / rate
+                    print(f"  {done + computed}/{len(values)} точек, {rate:.1f} точек/с, "
+                          f"осталось ~{eta / 60:.0f} мин", flush=True)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print("\n⏸️  Прервано: готовые чанки сохранены, повторный запуск продолжит с места остановки")
+            raise
+    return manifest
+
+
+def merge_sweep(output_dir: str, filename: str):
+    """Собирает чанки в один .npz: params (N, d) и {профиль}_percentiles
+    (N, len(PERCENTILES), len(report_days), len(METRICS))"""
+    with open(os.path.join(output_dir, 'sweep.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    names, values, integer = load_points(output_dir)
+    chunk_size = manifest['chunk_size']
+    starts = range(0, len(values), chunk_size)
+    missing = [start for start in starts if not os.path.exists(chunk_path(output_dir, start))]
+    if missing:
+        raise ValueError(f"Не готово {len(missing)} чанков из {len(starts)} - сначала досчитайте перебор")
+
+    chunks = {name: [] for name in manifest['profiles']}
+    for start in starts:
+        with np.load(chunk_path(output_dir, start)) as chunk:
+            for name in chunks:
+                chunks[name].append(chunk[name])
+
+    arrays = {
+        'param_names': np.array(names),
+        'params': values,
+        'metrics': np.array(METRICS),
+        'percentile_levels': np.array(PERCENTILES),
+        'report_days': np.array(report_days(manifest['days'])),
+        'profiles': np.array(manifest['profiles']),
+    }
+    for name, parts in chunks.items():
+        arrays[f'{name}_percentiles'] = np.concatenate(parts)
+    np.savez_compressed(filename, **arrays)
+    print(f"✅ {len(values)} точек сохранены в {filename}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='запустить или продолжить перебор')
+    run.add_argument('spec', help='JSON-спецификация перебора (см. economy_sweep.json)')
+    run.add_argument('-o', '--output-dir', required=True, help='папка с чанками результатов')
+    run.add_argument('--config', default=DEFAULT_CONFIG_PATH, help='базовый конфиг экономики')
+    run.add_argument('--players', type=int, default=PLAYERS, help='игроков на точку и профиль')
+    run.add_argument('--days', type=int, default=60)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    run.add_argument('-j', '--workers', type=int, default=None,
+                     help='число процессов (по умолчанию - число ядер)')
+    run.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='точек на задачу пула')
+
+    merge = sub.add_parser('merge', help='собрать готовый перебор в один .npz')
+    merge.add_argument('output_dir')
+    merge.add_argument('-o', '--output', default='scripts/sweep_results.npz')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        with open(args.spec, encoding='utf-8') as f:
+            spec = json.load(f)
+        with open(args.config, encoding='utf-8') as f:
+            base_raw = json.load(f)
+        run_sweep(spec, args.output_dir, base_raw, args.profiles, args.players, args.days,
+                  args.seed, args.workers, args.chunk_size)
+    elif args.command == 'merge':
+        merge_sweep(args.output_dir, args.output)
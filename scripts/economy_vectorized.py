@@ -0,0 +1,292 @@
+"""
+Векторизованный движок симулятора экономики: тысячи игроков одного профиля
+шагают вместе, состояние хранится как struct-of-arrays
+"""
+import argparse
+import time
+from typing import Dict
+
+import numpy as np
+
+from economy_config import DEFAULT_CONFIG, EconomyConfig, load_config, with_overrides
+from economy_population import METRICS, PERCENTILES, run_population
+from economy_simulator import PROFILES, SESSION_HOURS, SINGLE_SESSION_HOURS
+
+
+def build_tables(config: EconomyConfig = DEFAULT_CONFIG) -> Dict[str, np.ndarray]:
+    """Таблицы стоимости, бонусов и дохода по уровням из скомпилированного конфига.
+
+    Строки cost / value - апгрейды в порядке config.upgrade_tables (сначала
+    оборудование, затем артисты), как их перебирает жадная покупка в
+    simulate_session (при равной ценности побеждает первый). Уровни выше
+    max_level своей группы стоят inf и ничего не дают.
+    """
+    width = config.max_level + 1
+    cost = np.full((len(config.upgrade_tables), width), np.inf)
+    value = np.zeros_like(cost)
+    for i, (kind, item, costs, values) in enumerate(config.upgrade_tables):
+        cost[i, :len(costs)] = costs
+        value[i, :len(values)] = values
+
+    def levels(table: Dict[str, list]) -> np.ndarray:
+        # Доход и бонус на недостижимых уровнях - как на последнем
+        return np.array([row + row[-1:] * (width - len(row)) for row in table.values()], dtype=float)
+
+    return {'cost': cost, 'value': value,
+            'bonus': levels(config.equipment_bonus), 'income': levels(config.artist_income),
+            'min_reputation': np.array(list(config.artist_min_reputation.values()), dtype=float)}
+
+
+TABLES = build_tables()
+
+# Дополнительные конфиги сверки --check: дробная энергия (восстановление
+# и цена бита не целые) поверх основного конфига
+CHECK_OVERRIDES = {
+    'regen 0.5': {'energy.regen_per_minute': 0.5},
+    'per_beat 17.5': {'energy.per_beat': 17.5},
+}
+
+
+def row_percentiles(x: np.ndarray, q=PERCENTILES) -> np.ndarray:
+    """np.percentile(x, q, axis=1) (линейная интерполяция) через полную сортировку.
+
+    На float32 SIMD-сортировка numpy в разы быстрее partition, которым
+    пользуется np.percentile.
+    """
+    x = np.sort(x, axis=1)
+    position = np.asarray(q) / 100 * (x.shape[1] - 1)
+    lo = np.floor(position).astype(np.intp)
+    hi = np.minimum(lo + 1, x.shape[1] - 1)
+    fraction = (position - lo)[:, np.newaxis]
+    return x[:, lo].T * (1 - fraction) + x[:, hi].T * fraction
+
+
+class VectorizedEconomy:
+    """n игроков одного профиля, шагающих по сессиям одновременно.
+
+    Повторяет EconomySimulator: оффлайн-доход, восстановление энергии,
+    биты, жадная покупка апгрейдов. Число битов за сессию считается сразу
+    как energy // beat_energy, точности всех битов сессии сэмплируются одним
+    массивом. Совпадает со скалярной моделью статистически, а не побитово:
+    случайность идёт из numpy Generator.
+    """
+
+    def __init__(self, profile_name: str, n_players: int, days: int = 60, seed=None,
+                 config: EconomyConfig = None):
+        self.profile_name = profile_name
+        self.profile = PROFILES[profile_name]
+        self.n = n_players
+        self.days = days
+        self.rng = np.random.default_rng(seed)
+        self.config = config if config is not None else DEFAULT_CONFIG
+        self.tables = TABLES if config is None else build_tables(config)
+        self.n_equipment = len(self.config.equipment_cost)
+        # Артисты с порогом репутации: (столбец в income, порог)
+        self.gates = [(a, threshold) for a, threshold in enumerate(self.tables['min_reputation']) if threshold > 0]
+
+        self.money = np.full(n_players, float(self.config.start_money))
+        self.reputation = np.zeros(n_players)
+        # Энергия дробная, если дробные восстановление или цена бита
+        self.energy = np.full(n_players, float(self.config.start_energy))
+        self.max_energy = self.config.max_energy
+        # Уровни апгрейдов: столбцы в порядке config.upgrade_tables
+        self.levels = np.zeros((n_players, len(self.config.upgrade_tables)), dtype=np.int64)
+        self.beats_created = np.zeros(n_players, dtype=np.int64)
+        self.total_active_earnings = np.zeros(n_players)
+        self.total_passive_earnings = np.zeros(n_players)
+        self.last_session_time = np.zeros(n_players, dtype=np.int64)
+
+        # Производные от уровней величины меняются только при покупке,
+        # поэтому хранятся готовыми и обновляются для купивших игроков
+        self.next_cost = np.broadcast_to(self.tables['cost'][:, 0], self.levels.shape).copy()
+        self.next_value = np.broadcast_to(self.tables['value'][:, 0], self.levels.shape).copy()
+        self.cheapest = np.empty(n_players)
+        self.equipment_bonus = np.empty(n_players)
+        self.income = np.empty(n_players)
+        self.gated_income = np.empty((n_players, len(self.gates)))
+        self.refresh(np.arange(n_players))
+
+    def refresh(self, players: np.ndarray):
+        """Пересчитывает кэш производных величин для игроков players
+
+        next_cost / next_value поддерживает сам buy_upgrades.
+        """
+        levels = self.levels[players]
+        bonus, income = self.tables['bonus'], self.tables['income']
+        self.cheapest[players] = self.next_cost[players].min(axis=1)
+        self.equipment_bonus[players] = bonus[np.arange(len(bonus)), levels[:, :self.n_equipment]].sum(axis=1)
+        income = income[np.arange(len(income)), levels[:, self.n_equipment:]]
+        gated = [a for a, _ in self.gates]
+        self.gated_income[players] = income[:, gated]
+        self.income[players] = np.delete(income, gated, axis=1).sum(axis=1)
+
+    def passive_income_per_minute(self) -> np.ndarray:
+        # Артисты с порогом (Young Legend) приносят доход только с нужной репутации
+        income = self.income
+        for g, (_, threshold) in enumerate(self.gates):
+            income = income + self.gated_income[:, g] * (self.reputation >= threshold)
+        return income
+
+    def simulate_session(self, minutes_since_last: np.ndarray):
+        """Одна сессия для всех игроков"""
+        # 1. Оффлайн-доход (макс 4 часа)
+        offline_minutes = np.minimum(minutes_since_last, self.config.offline_cap_minutes)
+        passive_income = self.passive_income_per_minute() * offline_minutes
+        self.money += passive_income
+        self.total_passive_earnings += passive_income
+
+        # 2. Энергия (1/мин)
+        regen = minutes_since_last * self.config.energy_regen_per_minute
+        self.energy = np.minimum(self.max_energy, self.energy + regen)
+
+        # 3. Биты: сколько позволяет энергия, суммы цены и репутации в закрытой форме
+        beat_energy = self.config.beat_energy
+        beats = (self.energy // beat_energy).astype(np.int64)
+        # Точности на все возможные биты сессии: строка j - j-й бит каждого игрока
+        width = int(self.max_energy // beat_energy)
+        skill = self.profile.skill_level
+        accuracy = skill + self.rng.uniform(-0.05, 0.05, (width, self.n))
+        if skill - 0.05 < 0.5 or skill + 0.05 > 1.0:
+            np.clip(accuracy, 0.5, 1.0, out=accuracy)
+        accuracy_sum = np.einsum('jn,jn->n', accuracy, np.arange(width)[:, np.newaxis] < beats)
+        quality_sum = (50 * beats + 50 * accuracy_sum) * (1 + self.equipment_bonus / 100)
+        earnings = 50 * beats + quality_sum * 2
+
+        self.money += earnings
+        self.reputation += quality_sum * 0.15
+        self.energy -= beats * beat_energy
+        self.beats_created += beats
+        self.total_active_earnings += earnings
+
+        # 4. Жадная покупка: по одному апгрейду за шаг, пока кому-то что-то по карману
+        self.buy_upgrades()
+
+    def buy_upgrades(self):
+        cost, value_table = self.tables['cost'], self.tables['value']
+        width = self.levels.shape[1]
+        # Кандидаты - те, кому по карману хотя бы самый дешёвый апгрейд
+        active = np.flatnonzero(self.cheapest <= self.money)
+        bought = np.zeros(self.n, dtype=bool)
+        while len(active):
+            affordable = self.next_cost.take(active, axis=0) <= self.money.take(active)[:, np.newaxis]
+            for a, threshold in self.gates:
+                affordable[:, self.n_equipment + a] &= self.reputation.take(active) >= threshold
+            value = self.next_value.take(active, axis=0)
+            value *= affordable
+
+            # Лучший апгрейд каждого кандидата; плоские индексы (игрок, апгрейд)
+            # в матрицах уровней дешевле двумерной адресации
+            best = value.argmax(axis=1)
+            buys = value.ravel().take(np.arange(len(active)) * width + best) > 0
+            active, best = active[buys], best[buys]
+            flat = active * width + best
+            level = self.levels.ravel().take(flat) + 1
+            self.levels.ravel().put(flat, level)
+            self.money[active] -= self.next_cost.ravel().take(flat)
+            self.next_cost.ravel().put(flat, cost[best, level])
+            self.next_value.ravel().put(flat, value_table[best, level])
+            bought[active] = True
+
+        if bought.any():
+            self.refresh(np.flatnonzero(bought))
+
+    def snapshot(self) -> np.ndarray:
+        """Метрики METRICS для всех игроков: (len(METRICS), n), float32"""
+        total = self.total_active_earnings + self.total_passive_earnings
+        share = np.divide(self.total_passive_earnings, total, out=np.zeros(self.n), where=total > 0)
+        return np.stack([self.money, self.reputation, self.beats_created, share]).astype(np.float32)
+
+    def simulate(self) -> Dict:
+        """Весь период; результат в формате economy_population.run_population"""
+        start = time.perf_counter()
+        percentiles = np.empty((len(PERCENTILES), self.days, len(METRICS)), dtype=np.float32)
+
+        for day in range(1, self.days + 1):
+            count = self.profile.get_session_count(day, self.config)
+            if count == 1:
+                hours = [self.rng.choice(SINGLE_SESSION_HOURS, self.n)]
+            else:
+                hours = [np.full(self.n, hour) for hour in SESSION_HOURS[min(count, 6)]]
+
+            for hour in hours:
+                current_time = (day - 1) * 24 * 60 + hour * 60
+                minutes_since_last = np.where(self.last_session_time > 0,
+                                              current_time - self.last_session_time, 0)
+                self.simulate_session(minutes_since_last)
+                self.last_session_time = current_time
+
+            percentiles[:, day - 1] = row_percentiles(self.snapshot())
+
+        elapsed = time.perf_counter() - start
+        return {
+            'profile': self.profile_name,
+            'runs': self.n,
+            'days': self.days,
+            'percentiles': percentiles,
+            'final': self.snapshot().T,
+            'elapsed': elapsed,
+            'runs_per_sec': self.n / elapsed if elapsed > 0 else float('inf'),
+        }
+
+
+def compare_with_scalar(profile_name: str, scalar_runs: int = 2000, vector_players: int = 100_000,
+                        seed: int = 0, days: int = 60, tolerance: float = 0.5,
+                        config: EconomyConfig = None) -> Dict:
+    """Сверяет векторизованный движок со скалярным EconomySimulator.
+
+    Для каждого дня и метрики медиана векторизованной популяции должна
+    попадать в коридор медианы скалярной: не дальше tolerance * (p90 - p10)
+    скалярного разброса (плюс 0.1% от значения - для почти детерминированных
+    метрик вроде числа битов). Возвращает пропускную способность обоих
+    движков; при расхождении бросает AssertionError.
+    """
+    scalar = run_population(profile_name, scalar_runs, seed, days, config=config)
+    vector = VectorizedEconomy(profile_name, vector_players, days, seed, config).simulate()
+
+    p10, p50, p90 = scalar['percentiles']
+    allowed = tolerance * (p90 - p10) + 1e-3 * np.abs(p50)
+    error = np.abs(vector['percentiles'][1] - p50)
+    if np.any(error > allowed):
+        day, metric = np.unravel_index(np.argmax(error - allowed), error.shape)
+        raise AssertionError(
+            f"{profile_name}: день {day + 1}, {METRICS[metric]}: медиана {vector['percentiles'][1, day, metric]:,.2f} "
+            f"против скалярной {p50[day, metric]:,.2f} (допуск {allowed[day, metric]:,.2f})"
+        )
+    return {'scalar': scalar['runs_per_sec'], 'vector': vector['runs_per_sec']}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('-n', '--players', type=int, default=100_000, help='игроков на профиль')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('--check', action='store_true',
+                        help='сверить со скалярным симулятором и сравнить скорость')
+    parser.add_argument('-o', '--output', help='сохранить перцентили в .npz (формат economy_population)')
+    parser.add_argument('--config', help='JSON-конфиг экономики (по умолчанию economy_config.json)')
+    args = parser.parse_args()
+    config = load_config(args.config) if args.config else None
+
+    if args.check:
+        base = config if config is not None else DEFAULT_CONFIG
+        checks = {base.name: config}
+        for name, overrides in CHECK_OVERRIDES.items():
+            checks[name] = EconomyConfig(with_overrides(base.raw, overrides), name)
+        print(f"{'Конфиг':<14} {'Профиль':<10} {'скалярный, игроков/с':>22} {'векторный, игроков/с':>22} "
+              f"{'ускорение':>10}")
+        for check_name, check_config in checks.items():
+            for profile_name in args.profiles:
+                speed = compare_with_scalar(profile_name, seed=args.seed, days=args.days, config=check_config)
+                print(f"{check_name:<14} {profile_name:<10} {speed['scalar']:>22,.0f} {speed['vector']:>22,.0f} "
+                      f"{speed['vector'] / speed['scalar']:>9.0f}x")
+        print("✅ Распределения совпадают со скалярной моделью")
+    else:
+        from economy_population import print_population, save_population
+        results = []
+        for profile_name in args.profiles:
+            result = VectorizedEconomy(profile_name, args.players, args.days, args.seed, config).simulate()
+            results.append(result)
+            print_population(result)
+        if args.output:
+            save_population(results, args.output, args.seed)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Split narrative-encyclopedia.html into lazily loaded fragments:
+1. Parse the <!-- Name --> comment markers into nested sections (byte offsets)
+2. Write each tab's content to fragments/<tab id>.html and a shell index.html
+   that fetches a tab the first time it is opened
+3. Write index.json: section offsets, titles and character references
+
+The build is incremental: only files whose content hash changed are rewritten.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List
+
+DEFAULT_SOURCE = 'narrative-encyclopedia.html'
+DEFAULT_OUTPUT = 'narrative-encyclopedia'
+INDEX_FILE = 'index.json'
+SHELL_FILE = 'index.html'
+
+# A marker is a comment alone on its line; its indentation gives the nesting level
+MARKER = re.compile(rb'^([ \t]*)<!-- (.+?) -->[ \t]*\r?$', re.MULTILINE)
+# Sections whose first element is a tab container become fragment files
+TAB = re.compile(rb'<div class="tab-content( active)?" id="([\w-]+)"')
+CHARACTER_CARD = b'class="character-card"'
+HEADING = re.compile(rb'<h[23][^>]*>(.*?)</h[23]>', re.DOTALL)
+TAG = re.compile(r'<[^>]+>')
+
+LOADER = '''
+    <script>
+        // Tabs are split into fragments (scripts/encyclopedia_fragments.py):
+        // fetch a tab's content the first time it is opened
+        const showTab = switchTab;
+        switchTab = async function (index) {
+            const tab = document.getElementById(`tab-${index}`);
+            if (tab.dataset.fragment && !tab.dataset.loaded) {
+                tab.dataset.loaded = 'true';
+                tab.innerHTML = await (await fetch(tab.dataset.fragment)).text();
+                document.dispatchEvent(new CustomEvent('fragmentloaded', { detail: tab.id }));
+            }
+            showTab(index);
+        };
+    </script>
+'''
+
+
+def indent_of(line: bytes) -> int:
+    return len(line) - len(line.lstrip(b' \t'))
+
+
+def parse_sections(data: bytes) -> List[Dict]:
+    """Marker sections in document order: {title, level, start, end} in bytes.
+
+    A section runs from its marker line to the next marker indented the same
+    or less, minus trailing blank lines and parent closing tags (lines
+    indented less than the marker). Sections nest like the markers do.
+    """
+    markers = [(m.start(), len(m.group(1)), m.group(2).decode('utf-8')) for m in MARKER.finditer(data)]
+    sections = []
+    for i, (start, indent, title) in enumerate(markers):
+        end = next((s for s, level, _ in markers[i + 1:] if level <= indent), len(data))
+        lines = data[start:end].splitlines(keepends=True)
+        while len(lines) > 1 and (not lines[-1].strip() or indent_of(lines[-1]) < indent):
+            lines.pop()
+        sections.append({'title': title, 'level': indent, 'start': start,
+                         'end': start + sum(len(line) for line in lines)})
+    return sections
+
+
+def character_names(data: bytes, sections: List[Dict]) -> List[str]:
+    """Characters are the sections that hold a character card"""
+    return [s['title'] for s in sections
+            if CHARACTER_CARD in b''.join(data[s['start']:s['end']].split(b'\n', 2)[1:2])]
+
+
+def describe(data: bytes, section: Dict, characters: List[str]) -> Dict:
+    """Index entry: title, first heading, offsets and character reference counts"""
+    body = data[section['start']:section['end']]
+    heading = HEADING.search(body)
+    text = body.decode('utf-8')
+    return {
+        'title': section['title'],
+        'level': section['level'],
+        'heading': TAG.sub('', heading.group(1).decode('utf-8')).strip() if heading else None,
+        'start': section['start'],
+        'end': section['end'],
+        'characters': {name: text.count(name) for name in characters if name in text},
+    }
+
+
+def sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def split_document(data: bytes) -> Dict:
+    """Source -> {'files': {relative path: bytes}, 'index': index without file hashes}"""
+    sections = parse_sections(data)
+    characters = character_names(data, sections)
+    files = {}
+    entries = []
+    shell = []
+    position = 0
+
+    for section in sections:
+        body = data[section['start']:section['end']]
+        lines = body.splitlines(keepends=True)
+        tab = TAB.search(lines[1]) if len(lines) > 2 else None
+        if tab is None or section['start'] < position:
+            continue
+        if lines[-1].strip() != b'</div>' or indent_of(lines[-1]) != indent_of(lines[1]):
+            raise ValueError(f"Section '{section['title']}' does not end with its tab's closing </div>")
+
+        tab_id = tab.group(2).decode('utf-8')
+        path = f'fragments/{tab_id}.html'
+        entry = describe(data, section, characters)
+        entry.update(id=tab_id, file=path, active=bool(tab.group(1)))
+        entry['subsections'] = [describe(data, s, characters) for s in sections
+                                if section['start'] < s['start'] < section['end']]
+        entries.append(entry)
+        files[path] = b''.join(lines[2:-1])
+
+        # The active tab stays inline for the first paint (and for file:// viewing)
+        shell.append(data[position:section['start']])
+        if entry['active']:
+            shell.append(body)
+        else:
+            opening = lines[1].replace(tab.group(0), tab.group(0) + f' data-fragment="{path}"'.encode('utf-8'))
+            shell += [lines[0], opening, lines[-1]]
+        position = section['end']
+
+    rest = data[position:]
+    body_end = rest.rfind(b'</body>')
+    if body_end < 0:
+        raise ValueError("Source has no </body> to add the fragment loader before")
+    shell += [rest[:body_end], LOADER.lstrip('\n').encode('utf-8'), rest[body_end:]]
+    files[SHELL_FILE] = b''.join(shell)
+    return {'files': files, 'index': {'characters': characters, 'sections': entries}}
+
+
+def load_index(output_dir: str) -> Dict:
+    path = os.path.join(output_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_section(output_dir: str, title: str) -> bytes:
+    """Bytes of one section of the source by index offsets, without rescanning it.
+
+    The index stores the source path relative to output_dir, so this works
+    from any working directory.
+    """
+    index = load_index(output_dir)
+    for entry in index['sections']:
+        for section in [entry] + entry['subsections']:
+            if section['title'] == title:
+                with open(os.path.join(output_dir, index['source']), 'rb') as f:
+                    f.seek(section['start'])
+                    return f.read(section['end'] - section['start'])
+    raise KeyError(f"No section '{title}' in {os.path.join(output_dir, INDEX_FILE)}")
+
+
+def write_atomic(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(path + '.tmp', path)
+
+
+def build(source: str, output_dir: str, force: bool = False) -> Dict[str, int]:
+    """Splits source into output_dir, rewriting only files whose hash changed"""
+    with open(source, 'rb') as f:
+        data = f.read()
+    # Relative to the index, not to the working directory the build ran from
+    source_ref = os.path.relpath(os.path.abspath(source), os.path.abspath(output_dir))
+    previous = load_index(output_dir)
+    hashes = previous.get('hashes', {})
+    if (not force and previous.get('source_sha256') == sha256(data) and previous.get('source') == source_ref
+            and all(os.path.exists(os.path.join(output_dir, path)) for path in hashes)):
+        return {'written': 0, 'unchanged': len(hashes), 'removed': 0}
+
+    result = split_document(data)
+    counts = {'written': 0, 'unchanged': 0, 'removed': 0}
+    new_hashes = {}
+    for path, content in result['files'].items():
+        new_hashes[path] = sha256(content)
+        target = os.path.join(output_dir, path)
+        if not force and hashes.get(path) == new_hashes[path] and os.path.exists(target):
+            counts['unchanged'] += 1
+            continue
+        write_atomic(target, content)
+        counts['written'] += 1
+
+    for path in set(hashes) - set(new_hashes):
+        target = os.path.join(output_dir, path)
+        if os.path.exists(target):
+            os.remove(target)
+            counts['removed'] += 1
+
+    index = {'source': source_ref, 'source_sha256': sha256(data), 'hashes': new_hashes, **result['index']}
+    write_atomic(os.path.join(output_dir, INDEX_FILE),
+                 json.dumps(index, indent=2, ensure_ascii=False).encode('utf-8'))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('source', nargs='?', default=DEFAULT_SOURCE)
+    parser.add_argument('-o', '--output-dir', default=DEFAULT_OUTPUT)
+    parser.add_argument('--force', action='store_true', help='rewrite every file even if unchanged')
+    args = parser.parse_args()
+
+    counts = build(args.source, args.output_dir, args.force)
+    print(f"📦 {args.output_dir}: ✏️  {counts['written']} written, ➖ {counts['unchanged']} unchanged, "
+          f"🗑  {counts['removed']} removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,136 @@
 #!/usr/bin/env python3
 """
-Script to fix narrative-encyclopedia.html:
-1. Remove Sofia and DJ Nova sections and references
-2. Add 4 new artists: Local Hero, Scene Leader, City Star, State Champion
-3. Keep all valuable content (Jesse Schell lenses, examples, quotes)
+Rename/remove engine for the narrative HTML files, driven by a rules file:
+1. Remove whole sections (e.g. Sofia and DJ Nova character cards)
+2. Rename literal references (Sofia -> Local Hero, DJ Nova -> City Star, ...)
+3. Report per-rule hit counts; --dry-run prints a unified diff instead of writing
+
+All rules are compiled into one alternation regex and applied in a single
+pass over each document, so a batch of N renames costs one scan, not N copies.
 """
 
+import argparse
+import difflib
+import json
+import os
 import re
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'encyclopedia_rules.json')
+DEFAULT_FILES = ['narrative-encyclopedia.html']
+
+
+class Rule:
+    """One rule of the rules file: a section removal or a literal rename.
+
+    Every rule starts with literal text, so its first character is known.
+    """
+
+    def __init__(self, name: str, literal: str, pattern: str, replacement: str = ''):
+        self.name = name
+        self.first = literal[0]
+        self.pattern = pattern
+        self.replacement = replacement
+
+
+def load_rules(path: str) -> Tuple[List[Rule], List[str]]:
+    """Rules file -> (rules in matching order, notes to print after the run).
+
+    "remove": [{"name", "start", "until"}] - from the literal start up to
+    (not including) the first match of the regex until; the section is dropped.
+    "rename": [{"from", "to", "followed_by"?}] - literal text; followed_by is
+    an optional regex the next characters must match (not consumed).
+    Removals are tried first at each position, then renames longest-first,
+    so a removed section is never renamed and "DJ Nova" wins over "DJ".
+    """
+    with open(path, encoding='utf-8') as f:
+        raw = json.load(f)
+
+    rules = []
+    for spec in raw.get('remove', []):
+        rules.append(Rule(spec['name'], spec['start'], f"{re.escape(spec['start'])}.*?(?={spec['until']})"))
+
+    renames = []
+    for spec in sorted(raw.get('rename', []), key=lambda spec: -len(spec['from'])):
+        pattern = re.escape(spec['from'])
+        if 'followed_by' in spec:
+            pattern += f"(?={spec['followed_by']})"
+        renames.append(Rule(spec.get('name', f"{spec['from']} -> {spec['to']}"), spec['from'], pattern, spec['to']))
+    rules += renames
+    return rules, raw.get('notes', [])
+
+
+def compile_rules(rules: List[Rule]) -> re.Pattern:
+    """All rules as one alternation; the matched rule is the named group r<index>.
+
+    The lookahead on the rules' first characters lets the scan skip positions
+    no rule can start at without trying every branch there (~3x faster).
+    """
+    if not rules:
+        raise ValueError("Rules file has no remove or rename rules")
+    first = ''.join(sorted({re.escape(rule.first) for rule in rules}))
+    branches = '|'.join(f'(?P<r{i}>{rule.pattern})' for i, rule in enumerate(rules))
+    return re.compile(f'(?=[{first}])(?:{branches})', re.DOTALL)
+
+
+def rewrite(content: str, rules: List[Rule], pattern: re.Pattern) -> Tuple[str, Dict[str, int]]:
+    """One pass over content -> (new content, hits per rule name)"""
+    hits = dict.fromkeys((rule.name for rule in rules), 0)
+
+    def replace(match: re.Match) -> str:
+        rule = rules[int(match.lastgroup[1:])]
+        hits[rule.name] += 1
+        return rule.replacement
+
+    return pattern.sub(replace, content), hits
+
 
 def main():
-    input_file = "/Users/alekseigakh/Desktop/Projects/producer-tycoon-game/narrative-encyclopedia.html"
-    output_file = "/Users/alekseigakh/Desktop/Projects/producer-tycoon-game/narrative-encyclopedia.html"
-
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Track changes
-    changes = []
-
-    # 1. Find and remove Sofia's entire character card section
-    # Pattern: <!-- Sofia --> ... next <!-- comment -->
-    sofia_pattern = r'<!-- Sofia -->.*?(?=<!-- [A-Z]|<!-- ГЛАВНЫЙ)'
-    sofia_match = re.search(sofia_pattern, content, re.DOTALL)
-    if sofia_match:
-        content = content.replace(sofia_match.group(0), '')
-        changes.append(f"✅ Removed Sofia character section ({len(sofia_match.group(0))} characters)")
-
-    # 2. Find and remove DJ Nova's entire character card section
-    djnova_pattern = r'<!-- DJ Nova -->.*?(?=<!-- [A-Z]|<!-- ГЛАВНЫЙ)'
-    djnova_match = re.search(djnova_pattern, content, re.DOTALL)
-    if djnova_match:
-        content = content.replace(djnova_match.group(0), '')
-        changes.append(f"✅ Removed DJ Nova character section ({len(djnova_match.group(0))} characters)")
-
-    # 3. Replace Sofia references with Local Hero
-    sofia_count = content.count('Sofia')
-    content = content.replace('Sofia:', 'Local Hero:')
-    content = content.replace('Sofia (', 'Local Hero (')
-    content = content.replace('Sofia ', 'Local Hero ')
-    content = content.replace('Sofia.', 'Local Hero.')
-    content = content.replace('Sofia\'', 'Local Hero\'')
-    content = content.replace('Sofia"', 'Local Hero"')
-    changes.append(f"✅ Replaced {sofia_count} Sofia references with Local Hero")
-
-    # 4. Replace DJ Nova references with City Star
-    djnova_count = content.count('DJ Nova')
-    content = content.replace('DJ Nova:', 'City Star:')
-    content = content.replace('DJ Nova (', 'City Star (')
-    content = content.replace('DJ Nova ', 'City Star ')
-    content = content.replace('DJ Nova.', 'City Star.')
-    content = content.replace('DJ Nova\'', 'City Star\'')
-    content = content.replace('DJ Nova"', 'City Star"')
-    changes.append(f"✅ Replaced {djnova_count} DJ Nova references with City Star")
-
-    # 5. Update character count from 6 to 8
-    content = content.replace('6 NPC персонажей', '8 NPC персонажей')
-    changes.append("✅ Updated character count from 6 to 8")
-
-    # Write output
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(content)
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('files', nargs='*', default=DEFAULT_FILES,
+                        help='HTML files to rewrite (default: narrative-encyclopedia.html)')
+    parser.add_argument('--rules', default=DEFAULT_RULES, help='JSON rules file')
+    parser.add_argument('--dry-run', action='store_true', help='print a unified diff, do not write')
+    args = parser.parse_args()
+
+    rules, notes = load_rules(args.rules)
+    pattern = compile_rules(rules)
+    totals = dict.fromkeys((rule.name for rule in rules), 0)
+    changed_files = 0
+
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        new_content, hits = rewrite(content, rules, pattern)
+        for name, count in hits.items():
+            totals[name] += count
+        if new_content == content:
+            print(f"➖ {path}: no matches")
+            continue
+
+        changed_files += 1
+        print(f"✏️  {path}: {sum(hits.values())} hits, {len(new_content) - len(content):+d} characters")
+        if args.dry_run:
+            sys.stdout.writelines(difflib.unified_diff(
+                content.splitlines(keepends=True), new_content.splitlines(keepends=True),
+                fromfile=path, tofile=f'{path} (rewritten)'))
+        else:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(new_content)
+            os.replace(path + '.tmp', path)
 
     # Report
-    print("\n🎯 Encyclopedia Character Fix Complete!\n")
-    for change in changes:
-        print(change)
-
-    print(f"\n📝 Updated file: {output_file}")
-    print("\n⚠️  Next steps (manual):")
-    print("1. Add detailed character cards for Local Hero, Scene Leader, City Star, State Champion")
-    print("2. Add their narrative scenes to Tab 3")
-    print("3. Update relationship web diagram")
-    print("4. Verify all Energy references are 150")
+    print(f"\n🎯 {'Dry run' if args.dry_run else 'Rewrite'} complete: "
+          f"{changed_files} of {len(args.files)} files changed\n")
+    for name, count in totals.items():
+        print(f"{'✅' if count else '  '} {count:>5}  {name}")
+
+    if notes and changed_files and not args.dry_run:
+        print("\n⚠️  Next steps (manual):")
+        for i, note in enumerate(notes, 1):
+            print(f"{i}. {note}")
+
 
 if __name__ == "__main__":
     main()